@@ -0,0 +1,137 @@
+import secrets
+import uuid
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from .models import User
+
+
+class ClaimsUser:
+    """
+    Stand-in for ``User`` built from the access token's claims.
+
+    ``id``/``pk`` and the ``email`` claim are answered from the token; any
+    other attribute loads the real row once and is read from it, so a view
+    that only filters by ``request.user.id`` never touches the user table.
+    If that load finds the account deleted or inactive, the failure is kept
+    in ``auth_failure`` for ``ClaimsAuthenticationMixin`` to answer with.
+    """
+
+    is_authenticated = True
+    is_anonymous = False
+    claim_fields = ("email",)
+    auth_failure = None
+
+    def __init__(self, token):
+        self.token = token
+        try:
+            self.id = self.pk = uuid.UUID(str(token[api_settings.USER_ID_CLAIM]))
+        except (KeyError, ValueError):
+            raise InvalidToken("Token contained no recognizable user identification")
+
+    @cached_property
+    def user(self):
+        user = User.objects.filter(pk=self.id).first()
+        if user is None:
+            self.auth_failure = AuthenticationFailed("User not found", code="user_not_found")
+        elif api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            self.auth_failure = AuthenticationFailed("User is inactive", code="user_inactive")
+        if self.auth_failure:
+            raise self.auth_failure
+        return user
+
+    def __getattr__(self, attr):
+        if attr in self.claim_fields and self.token.get(attr) is not None:
+            return self.token[attr]
+        return getattr(self.user, attr)
+
+    def __str__(self):
+        return self.token.get("email") or str(self.id)
+
+    def __eq__(self, other):
+        return getattr(other, "pk", None) == self.pk
+
+    def __hash__(self):
+        return hash(self.pk)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that trusts the signed claims instead of loading the
+    user row on every request. Only for read-only endpoints that query by
+    ``request.user.id``; a deactivated account keeps access to them until its
+    access token expires.
+    """
+
+    def get_user(self, validated_token):
+        return ClaimsUser(validated_token)
+
+
+class ClaimsAuthenticationMixin:
+    """
+    Authenticates an ``APIView`` with ``ClaimsJWTAuthentication``. The user row
+    is only loaded when the view first reads a non-claim attribute, which may
+    be inside the view's own ``except Exception``; a deleted or inactive
+    account found then is still answered with a 401, whatever the view did
+    with the exception.
+    """
+
+    authentication_classes = [ClaimsJWTAuthentication]
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        failure = getattr(request.user, "auth_failure", None)
+        if failure is not None:
+            response = self.handle_exception(failure)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+STREAM_TICKET_TIMEOUT = 30
+
+
+def _stream_ticket_key(ticket):
+    return f"stream_ticket:{ticket}"
+
+
+def issue_stream_ticket(user):
+    """
+    A random, single-use ticket that opens one notification stream for
+    ``user`` within STREAM_TICKET_TIMEOUT seconds. EventSource cannot send an
+    Authorization header, and an access token in the URL would end up in
+    access and proxy logs; a leaked ticket is useless once spent or expired.
+    """
+    ticket = secrets.token_urlsafe(32)
+    claims = {api_settings.USER_ID_CLAIM: str(user.id), "email": getattr(user, "email", None)}
+    cache.set(_stream_ticket_key(ticket), claims, timeout=STREAM_TICKET_TIMEOUT)
+    return ticket
+
+
+def redeem_stream_ticket(ticket):
+    """The ``ClaimsUser`` a ticket was issued for, or ``None``; the ticket is spent either way."""
+    key = _stream_ticket_key(ticket)
+    claims = cache.get(key)
+    # Only the caller whose delete removed the key may use it.
+    if claims is None or not cache.delete(key):
+        return None
+    return ClaimsUser(claims)
+
+
+def authenticate_stream_request(request):
+    """
+    Resolve the user of a plain Django request from a Bearer header or a
+    ``?ticket=`` from ``issue_stream_ticket``. Returns ``None`` when neither
+    is valid.
+    """
+    ticket = request.GET.get("ticket")
+    if ticket:
+        return redeem_stream_ticket(ticket)
+    authentication = ClaimsJWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header else None
+    if not raw_token:
+        return None
+    try:
+        return authentication.get_user(authentication.get_validated_token(raw_token))
+    except (InvalidToken, AuthenticationFailed):
+        return None
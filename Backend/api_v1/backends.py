@@ -0,0 +1,68 @@
+import time
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+PERMISSION_VERSION_KEY = "perms:version"
+
+
+def get_permission_version():
+    version = cache.get(PERMISSION_VERSION_KEY)
+    if version is None:
+        # Seed from the clock so a counter lost to eviction never reuses an old version.
+        version = int(time.time() * 1000)
+        if not cache.add(PERMISSION_VERSION_KEY, version, timeout=None):
+            version = cache.get(PERMISSION_VERSION_KEY, version)
+    return version
+
+
+def _bump():
+    try:
+        cache.incr(PERMISSION_VERSION_KEY)
+    except ValueError:
+        get_permission_version()
+
+
+def bump_permission_version():
+    """
+    Invalidate every cached permission set after a role or permission change.
+    The bump waits for the change to commit: bumped any earlier, a concurrent
+    request could cache the old permissions under the new version.
+    """
+    transaction.on_commit(_bump)
+
+
+def permission_cache_key(user_obj):
+    return f"perms:{user_obj.pk}:{user_obj.role_id}:{int(user_obj.is_superuser)}:{get_permission_version()}"
+
+
+class RoleModelBackend(ModelBackend):
+    """
+    ModelBackend that also grants the permissions of the Group linked to the
+    user's Role, so role permissions are stored once per role instead of being
+    copied onto every member.
+
+    The resolved permission set is kept in the shared cache, keyed by the
+    permission version counter, so a request that reloads the user does not
+    have to re-run the permission joins.
+    """
+
+    def _get_group_permissions(self, user_obj):
+        return Permission.objects.filter(
+            Q(group__user=user_obj) | Q(group__role__roles=user_obj)
+        )
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        if not hasattr(user_obj, "_perm_cache"):
+            key = permission_cache_key(user_obj)
+            perms = cache.get(key)
+            if perms is None:
+                perms = super().get_all_permissions(user_obj, obj)
+                cache.set(key, perms, getattr(settings, "PERMISSION_CACHE_TIMEOUT", 300))
+            user_obj._perm_cache = perms
+        return user_obj._perm_cache
@@ -0,0 +1,76 @@
+import gzip
+import json
+import os
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from api_v1.managers import current_audit_period, shift_period
+from api_v1.models import AuditLog, AuditLogArchive, AuditLogToken
+
+ARCHIVE_FIELDS = (
+    "id", "user_id", "action", "model_name", "object_id", "changes", "ip_address", "timestamp", "period",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Move AuditLog periods older than the retention window into gzip-compressed "
+        "JSONL files under MEDIA_ROOT/audit_archive and delete them from the table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--keep-months", type=int, default=settings.AUDIT_RETENTION_MONTHS,
+            help="Periods (months) to keep in the table, the current one included.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=2000)
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would be archived.")
+
+    def handle(self, *args, **options):
+        cutoff = shift_period(current_audit_period(), -(max(options["keep_months"], 1) - 1))
+        periods = (
+            AuditLog.objects.filter(period__lt=cutoff)
+            .values_list("period", flat=True).distinct().order_by("period")
+        )
+        for period in periods:
+            if options["dry_run"]:
+                count = AuditLog.objects.filter(period=period).count()
+                self.stdout.write(f"{period}: {count} rows would be archived")
+                continue
+            archive = self.archive_period(period, options["chunk_size"])
+            self.stdout.write(self.style.SUCCESS(f"{period}: archived {archive.row_count} rows to {archive.archive_file}"))
+
+    def archive_period(self, period, chunk_size):
+        directory = Path(settings.MEDIA_ROOT) / "audit_archive"
+        directory.mkdir(parents=True, exist_ok=True)
+        name = f"auditlog-{period}-{timezone.now():%Y%m%d%H%M%S}.jsonl.gz"
+        path = directory / name
+        partial = path.with_name(name + ".partial")
+
+        rows = AuditLog.objects.filter(period=period).order_by("id").values(*ARCHIVE_FIELDS)
+        row_count = 0
+        last_id = None
+        with gzip.open(partial, "wt", encoding="utf-8") as archive_file:
+            for row in rows.iterator(chunk_size=chunk_size):
+                archive_file.write(json.dumps(row, cls=DjangoJSONEncoder) + "\n")
+                row_count += 1
+                last_id = row["id"]
+        os.replace(partial, path)
+
+        # Only delete what made it into the file; rows written meanwhile stay for the next run.
+        if last_id is not None:
+            archived = AuditLog.objects.filter(period=period, id__lte=last_id)
+            while True:
+                ids = list(archived.values_list("id", flat=True)[:chunk_size])
+                if not ids:
+                    break
+                AuditLogToken.objects.filter(log_id__in=ids)._raw_delete(AuditLogToken.objects.db)
+                AuditLog.objects.filter(id__in=ids)._raw_delete(AuditLog.objects.db)
+
+        return AuditLogArchive.objects.create(
+            period=period,
+            row_count=row_count,
+            archive_file=str(Path("audit_archive") / name),
+        )
@@ -0,0 +1,55 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from api_v1.models import AuditLog, Centre
+from api_v1.utils import audit_track
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure write throughput with auditing off, with one audit insert per write "
+        "(the previous behaviour) and with the buffered writer. Run against a development database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=500, help="Rows to create, update and delete per mode.")
+
+    def handle(self, *args, **options):
+        count = options["count"]
+        label = Centre._meta.label
+        self.stdout.write(f"{count} creates + updates + deletes of {label} per mode")
+
+        for mode in ("off", "per-row", "buffered"):
+            last_log = AuditLog.objects.order_by("-id").values_list("id", flat=True).first() or 0
+            if mode == "off":
+                audit_track._excluded_models.add(label)
+            try:
+                elapsed, queries = self.run_workload(count, buffered=mode == "buffered")
+            finally:
+                audit_track._excluded_models.discard(label)
+            written = AuditLog.objects.filter(id__gt=last_log).count()
+            AuditLog.objects.filter(id__gt=last_log).delete()
+            self.stdout.write(
+                f"{mode:>9}: {elapsed:7.3f}s  {3 * count / elapsed:9.0f} writes/s  "
+                f"{queries:6d} queries  {written:6d} audit rows"
+            )
+
+    def run_workload(self, count, buffered):
+        connection.queries_log.clear()
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as captured:
+            if buffered:
+                with audit_track.audit_scope():
+                    self.write_rows(count)
+            else:
+                self.write_rows(count)
+        return time.perf_counter() - started, len(captured)
+
+    def write_rows(self, count):
+        centres = [Centre.objects.create(name=f"audit-benchmark-{i}") for i in range(count)]
+        for centre in centres:
+            centre.address = "benchmark"
+            centre.save()
+        for centre in centres:
+            centre.delete()
@@ -0,0 +1,44 @@
+import os
+import tempfile
+import time
+from django.core.management.base import BaseCommand
+from pypdf import PdfReader
+from api_v1.utils.pdf_report import write_table_pdf
+
+DEFAULT_FIELDS = ["membership_id", "name", "email", "mobile_number", "gender", "address1", "created_at"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Render synthetic member rows with the tabular PDF report engine, in-process "
+        "and with the process pool, and report pages per second."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument("--fields", nargs="+", default=DEFAULT_FIELDS)
+
+    def handle(self, *args, **options):
+        fields = options["fields"]
+        for count in options["rows"]:
+            for workers in sorted({1, options["workers"]}):
+                elapsed, pages, size = self.render(count, fields, workers)
+                self.stdout.write(
+                    f"{count:>7} rows  {workers:>2} worker(s): {elapsed:7.2f}s  {pages:6d} pages  "
+                    f"{pages / elapsed:8.1f} pages/s  {size / 1024 / 1024:6.1f} MB"
+                )
+
+    def rows(self, count, fields):
+        for i in range(count):
+            yield [f"{field}-{i}" for field in fields]
+
+    def render(self, count, fields, workers):
+        with tempfile.TemporaryFile() as file:
+            started = time.perf_counter()
+            write_table_pdf(self.rows(count, fields), fields, file, workers=workers)
+            elapsed = time.perf_counter() - started
+            size = file.tell()
+            file.seek(0)
+            pages = len(PdfReader(file).pages)
+        return elapsed, pages, size
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from api_v1.utils.dashboard_stats import rebuild_dashboard_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the DailyUserStat and DailyPaymentStat rollups behind the dashboard from "
+        "the User and Payment tables. Use it to backfill history, or to repair drift after "
+        "bulk writes (queryset.update, bulk_create) that bypass the model signals."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", help="Only rebuild days from this date (YYYY-MM-DD) on.")
+        parser.add_argument("--chunk-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        since = None
+        if options["since"]:
+            since = parse_date(options["since"])
+            if since is None:
+                raise CommandError("--since must be a date in YYYY-MM-DD format.")
+        user_days, payment_buckets = rebuild_dashboard_stats(since=since, chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {user_days} user days and {payment_buckets} payment buckets"
+        ))
@@ -0,0 +1,59 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+from api_v1.utils.reconciliation import (
+    RECONCILE_ABANDON_AFTER, RECONCILE_CHUNK_SIZE, RECONCILE_MAX_AGE, RECONCILE_MIN_AGE, RECONCILE_RATE,
+    RECONCILE_WORKERS, reconcile_pending_payments,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Settle payments still Pending from the gateway's record of their orders and write a "
+        "reconciliation report under MEDIA_ROOT/reports. --gateway-client swaps in another client "
+        "class; the in-memory FakeRazorpayClient only knows orders created in the same process, "
+        "so it is useful from tests or a shell session rather than from this command."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=RECONCILE_CHUNK_SIZE)
+        parser.add_argument("--workers", type=int, default=RECONCILE_WORKERS)
+        parser.add_argument("--rate", type=float, default=RECONCILE_RATE, help="Gateway requests per second; 0 for no limit.")
+        parser.add_argument(
+            "--min-age", type=int, default=int(RECONCILE_MIN_AGE.total_seconds() // 60),
+            help="Skip payments created less than this many minutes ago.",
+        )
+        parser.add_argument(
+            "--max-age", type=int, default=RECONCILE_MAX_AGE.days,
+            help="Skip payments created more than this many days ago.",
+        )
+        parser.add_argument(
+            "--abandon-after", type=int, default=int(RECONCILE_ABANDON_AFTER.total_seconds() // 3600),
+            help="Mark orders with no payment attempt after this many hours as Failed.",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Report what would change without writing it.")
+        parser.add_argument("--gateway-client", help="Dotted path of the client class to use instead of razorpay.Client.")
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1 or options["workers"] < 1:
+            raise CommandError("--chunk-size and --workers must be at least 1.")
+        client = import_string(options["gateway_client"])() if options["gateway_client"] else None
+        report = reconcile_pending_payments(
+            chunk_size=options["chunk_size"],
+            workers=options["workers"],
+            rate=options["rate"],
+            min_age=timedelta(minutes=options["min_age"]),
+            max_age=timedelta(days=options["max_age"]),
+            abandon_after=timedelta(hours=options["abandon_after"]),
+            dry_run=options["dry_run"],
+            client=client,
+        )
+        if report is None:
+            raise CommandError("Another reconciliation run is in progress.")
+        for error in report["errors"]:
+            self.stderr.write(f"{error['order_id']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {report['checked']} pending payments{' (dry run)' if options['dry_run'] else ''}: "
+            f"{report['success']} succeeded, {report['failed']} failed, {report['refunded']} refunded, "
+            f"{report['unchanged']} unchanged, {len(report['errors'])} errors. Report: {report['report_file']}"
+        ))
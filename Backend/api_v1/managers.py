@@ -1,6 +1,37 @@
+import datetime
+from django.conf import settings
 from django.contrib.auth.base_user import BaseUserManager
+from django.db import models
+from django.utils import timezone
+from .utils.sequences import next_value
 
-class UserManager(BaseUserManager):
+
+def bulk_write_sequence(model):
+    """Sequence counting the ``update()``/``bulk_update()`` calls that changed ``model`` rows."""
+    return f"bulk_writes:{model._meta.label_lower}"
+
+
+class UserQuerySet(models.QuerySet):
+    """
+    ``update()`` and ``bulk_update()`` bypass ``save()``, so ``updated_at``
+    keeps its old value; they advance ``bulk_write_sequence`` instead, in the
+    same transaction, for fingerprints such as ``report_data_version``.
+    """
+
+    def update(self, **kwargs):
+        rows = super().update(**kwargs)
+        if rows:
+            next_value(bulk_write_sequence(self.model))
+        return rows
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        rows = super().bulk_update(objs, fields, batch_size=batch_size)
+        if rows:
+            next_value(bulk_write_sequence(self.model))
+        return rows
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
     def create_user(self, email, password=None, **extra_fields):
         if not email:
             raise ValueError("The Email field must be set")
@@ -25,4 +56,51 @@ class UserManager(BaseUserManager):
         if extra_fields.get('is_superuser') is not True:
             raise ValueError('Superuser must have is_superuser=True.')
 
-        return self.create_user(email, password, **extra_fields)
\ No newline at end of file
+        return self.create_user(email, password, **extra_fields)
+
+
+def audit_period(moment):
+    """The YYYYMM period (UTC month) an audit entry written at ``moment`` belongs to."""
+    if timezone.is_aware(moment):
+        moment = moment.astimezone(datetime.timezone.utc)
+    return moment.year * 100 + moment.month
+
+
+def current_audit_period():
+    return audit_period(timezone.now())
+
+
+def shift_period(period, months):
+    year, month = divmod(period, 100)
+    index = year * 12 + (month - 1) + months
+    return (index // 12) * 100 + index % 12 + 1
+
+
+class AuditLogQuerySet(models.QuerySet):
+    """
+    AuditLog is partitioned logically by its ``period`` column (YYYYMM).
+    Filtering on it first keeps lookups on the leading (period, timestamp)
+    index instead of scanning every month ever recorded.
+    """
+
+    def for_periods(self, start=None, end=None):
+        queryset = self
+        if start is not None:
+            queryset = queryset.filter(period__gte=start)
+        if end is not None:
+            queryset = queryset.filter(period__lte=end)
+        return queryset
+
+    def hot(self, months=None):
+        """Entries of the most recent ``AUDIT_HOT_MONTHS`` periods, the current one included."""
+        months = months or getattr(settings, "AUDIT_HOT_MONTHS", 3)
+        return self.for_periods(start=shift_period(current_audit_period(), -(months - 1)))
+
+    def between(self, since=None, until=None):
+        """Timestamp range filter that also prunes to the periods it spans."""
+        queryset = self
+        if since is not None:
+            queryset = queryset.filter(period__gte=audit_period(since), timestamp__gte=since)
+        if until is not None:
+            queryset = queryset.filter(period__lte=audit_period(until), timestamp__lte=until)
+        return queryset
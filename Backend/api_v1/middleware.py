@@ -1,6 +1,7 @@
 
 
 from .thread import set_request_user, set_request_ip
+from .utils.audit_track import audit_scope
 
 class AuditMiddleware:
     def __init__(self, get_response):
@@ -10,11 +11,12 @@ class AuditMiddleware:
         user = getattr(request, 'user', None)
         ip = self.get_client_ip(request)
 
-        if user and user.is_authenticated:
-            set_request_user(user)
+        set_request_user(user if user and user.is_authenticated else None)
         set_request_ip(ip)
 
-        response = self.get_response(request)
+        # Audit entries committed while handling the request are written in one insert.
+        with audit_scope():
+            response = self.get_response(request)
         return response
 
     def get_client_ip(self, request):
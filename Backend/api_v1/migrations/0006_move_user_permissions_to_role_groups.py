@@ -0,0 +1,80 @@
+from django.db import migrations
+from django.db.models import Count
+
+
+def move_user_permissions_to_role_groups(apps, schema_editor):
+    """
+    Role permissions used to be copied onto every member's user_permissions.
+    Collapse them onto each role's linked Group, which RoleModelBackend reads.
+
+    Only permissions every member of the role holds are moved: a grant some
+    members lack was given to those users, not to the role, and moving it
+    would widen the role. Such grants stay on the users. Each role touched
+    gets an AuditLog entry listing what moved and, per permission, the
+    members who kept it as a direct grant.
+    """
+    db_alias = schema_editor.connection.alias
+    Role = apps.get_model("api_v1", "Role")
+    User = apps.get_model("api_v1", "User")
+    AuditLog = apps.get_model("api_v1", "AuditLog")
+    Group = apps.get_model("auth", "Group")
+    Permission = apps.get_model("auth", "Permission")
+    UserPermission = User.user_permissions.through
+    GroupPermission = Group.permissions.through
+
+    for role in Role.objects.using(db_alias).filter(group__isnull=True):
+        role.group, _ = Group.objects.using(db_alias).get_or_create(name=f"{role.id}_{role.name}")
+        role.save(update_fields=["group"])
+
+    entries = []
+    for role in Role.objects.using(db_alias).exclude(roles=None):
+        members = User.objects.using(db_alias).filter(role=role).count()
+        grants = UserPermission.objects.using(db_alias).filter(user__role=role)
+        holders = dict(
+            grants.values("permission_id").annotate(holders=Count("user_id", distinct=True))
+            .values_list("permission_id", "holders")
+        )
+        if not holders:
+            continue
+        shared = [permission_id for permission_id, count in holders.items() if count == members]
+        kept = [permission_id for permission_id, count in holders.items() if count < members]
+
+        GroupPermission.objects.using(db_alias).bulk_create(
+            [GroupPermission(group_id=role.group_id, permission_id=permission_id) for permission_id in shared],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        kept_users = {}
+        for permission_id, email in grants.filter(permission_id__in=kept).values_list("permission_id", "user__email"):
+            kept_users.setdefault(permission_id, []).append(email)
+        removed = grants.filter(permission_id__in=shared).count()
+        # Raw delete: the per-row audit signals would otherwise fire for every grant.
+        grants.filter(permission_id__in=shared)._raw_delete(db_alias)
+
+        codenames = dict(
+            Permission.objects.using(db_alias).filter(pk__in=holders).values_list("pk", "codename")
+        )
+        entries.append(AuditLog(
+            action="update",
+            model_name="Role",
+            object_id=str(role.pk),
+            changes={
+                "summary": f"Moved permissions shared by all {members} members of role '{role.name}' to its group",
+                "group_permissions_added": sorted(codenames[pk] for pk in shared),
+                "user_grants_removed": removed,
+                "kept_on_users": {codenames[pk]: sorted(kept_users[pk]) for pk in sorted(kept, key=codenames.get)},
+            },
+        ))
+    AuditLog.objects.using(db_alias).bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('api_v1', '0005_qualificationtype_type'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_user_permissions_to_role_groups, migrations.RunPython.noop),
+    ]
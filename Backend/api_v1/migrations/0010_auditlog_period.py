@@ -0,0 +1,42 @@
+import datetime
+from django.db import migrations, models
+from django.db.models.functions import ExtractMonth, ExtractYear
+import api_v1.managers
+
+
+def backfill_periods(apps, schema_editor):
+    AuditLog = apps.get_model("api_v1", "AuditLog")
+    AuditLog.objects.using(schema_editor.connection.alias).update(
+        period=ExtractYear("timestamp", tzinfo=datetime.timezone.utc) * 100
+        + ExtractMonth("timestamp", tzinfo=datetime.timezone.utc)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_v1', '0009_notification_inbox_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auditlog',
+            name='period',
+            field=models.PositiveIntegerField(default=api_v1.managers.current_audit_period, help_text='YYYYMM the entry was written in'),
+        ),
+        migrations.RunPython(backfill_periods, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['period', 'timestamp'], name='auditlog_period_ts_idx'),
+        ),
+        migrations.CreateModel(
+            name='AuditLogArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.PositiveIntegerField(db_index=True, help_text='YYYYMM')),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('archive_file', models.CharField(max_length=255)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
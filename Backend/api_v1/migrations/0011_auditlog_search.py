@@ -0,0 +1,35 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_v1', '0010_auditlog_period'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['model_name', 'timestamp'], name='auditlog_model_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['user', 'timestamp'], name='auditlog_user_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['object_id'], name='auditlog_object_idx'),
+        ),
+        migrations.CreateModel(
+            name='AuditLogToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64)),
+                ('log', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tokens', to='api_v1.auditlog')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['token', 'log'], name='auditlogtoken_token_log_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+def clear_tokens(apps, schema_editor):
+    # Entries are now also indexed by action, IP address and user; dropping the
+    # old tokens makes index_audit_logs rebuild every entry with them.
+    AuditLogToken = apps.get_model("api_v1", "AuditLogToken")
+    AuditLogToken.objects.using(schema_editor.connection.alias).all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_v1', '0017_outboundmessage_next_attempt_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_tokens, migrations.RunPython.noop),
+    ]
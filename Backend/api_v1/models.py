@@ -1,15 +1,22 @@
 from django.contrib.auth.base_user import BaseUserManager, AbstractBaseUser
 from django.contrib.auth.models import PermissionsMixin
-import random
 import uuid
 from django.contrib.auth.models import AbstractUser, Group, Permission
+from django.core.exceptions import FieldDoesNotExist
 from django.core.validators import MinValueValidator
 from django.db import models
 from django.utils import timezone
 from datetime import timedelta
 from django.db.models import SET_NULL, CASCADE
-from .managers import UserManager
+from .managers import AuditLogQuerySet, UserManager, current_audit_period
+from .utils.application_ids import generate_application_id
 from datetime import date
+from copy import deepcopy
+
+def _frozen(value):
+    # JSON values are mutated in place by views, so keep a private copy.
+    return deepcopy(value) if isinstance(value, (dict, list)) else value
+
 
 class Common(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
@@ -17,6 +24,48 @@ class Common(models.Model):
     class Meta:
         abstract = True
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Snapshot the loaded column values (attnames only) so the audit
+        # trail can diff a save without re-reading the row.
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = (tuple(field_names), tuple(_frozen(value) for value in values))
+        return instance
+
+    def concrete_attnames(self, names):
+        """Attnames of the concrete fields among ``names`` (field names or attnames)."""
+        attnames = {field.attname for field in self._meta.concrete_fields}
+        found = []
+        for name in names:
+            try:
+                attname = self._meta.get_field(name).attname
+            except FieldDoesNotExist:
+                continue
+            if attname in attnames:
+                found.append(attname)
+        return found
+
+    def take_snapshot(self, fields=None):
+        """
+        Record the current values as the baseline for the next change diff:
+        all loaded fields, or only ``fields`` after a partial save or refresh,
+        so values never written keep showing up as changes.
+        """
+        if fields is None:
+            deferred = self.get_deferred_fields()
+            names = [field.attname for field in self._meta.concrete_fields if field.attname not in deferred]
+            self._loaded_values = (tuple(names), tuple(_frozen(getattr(self, name)) for name in names))
+            return
+        snapshot = getattr(self, "_loaded_values", None)
+        values = dict(zip(*snapshot)) if snapshot else {}
+        for name in self.concrete_attnames(fields):
+            values[name] = _frozen(getattr(self, name))
+        self._loaded_values = (tuple(values), tuple(values.values()))
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self.take_snapshot(fields)
+
 
 
 class Role(Common):
@@ -115,10 +164,7 @@ class User(AbstractBaseUser, PermissionsMixin, Common):
 
     def generate_application_id(self):
         """Generates a unique application ID."""
-        while True:
-            app_id = f"APP{random.randint(100000, 999999)}"
-            if not User.objects.filter(application_id=app_id).exists():
-                return app_id
+        return generate_application_id()
 
     def __str__(self):
         return f"{self.email} - {self.name} ({self.application_id})"
@@ -178,6 +224,12 @@ class Payment(Common):
     # status = models.CharField(max_length=20, default="Pending")
     status = models.CharField(max_length=20, choices=[("Pending", "Pending"), ("Success", "Success"), ("Failed", "Failed")], default="Pending")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["order_id"], name="payment_order_idx"),
+            models.Index(fields=["status", "id"], name="payment_status_idx"),
+        ]
+
     def __str__(self):
         return f"{self.user} - {self.membership_type} - {self.amount} {self.currency} ({self.status})"
 
@@ -325,6 +377,17 @@ class AuditLog(models.Model):
     changes = models.JSONField(null=True, blank=True)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     timestamp = models.DateTimeField(auto_now_add=True)
+    period = models.PositiveIntegerField(default=current_audit_period, help_text="YYYYMM the entry was written in")
+
+    objects = AuditLogQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["period", "timestamp"], name="auditlog_period_ts_idx"),
+            models.Index(fields=["model_name", "timestamp"], name="auditlog_model_ts_idx"),
+            models.Index(fields=["user", "timestamp"], name="auditlog_user_ts_idx"),
+            models.Index(fields=["object_id"], name="auditlog_object_idx"),
+        ]
 
     def _str_(self):
         return f"{self.timestamp} | {self.user} | {self.action} | {self.model_name} [{self.object_id}]"
@@ -374,6 +437,11 @@ class Notification(Common):
     delivered = models.BooleanField(default=False) 
     delivered_at = models.DateTimeField(null=True, blank=True)
     timestamp = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["recipient", "is_read", "timestamp"], name="notification_inbox_idx"),
+        ]
     
 
     
@@ -391,7 +459,137 @@ class ApplicationVerificationStatus(Common):
 
 
 
+class OutboundMessage(Common):
+    CHANNEL_CHOICES = [
+        ('email', 'Email'),
+        ('sms', 'SMS'),
+    ]
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES, default='email')
+    recipients = models.JSONField(default=list)
+    subject = models.CharField(max_length=255, blank=True, default='')
+    body = models.TextField(blank=True, default='')
+    html_body = models.TextField(null=True, blank=True)
+    from_email = models.CharField(max_length=255, null=True, blank=True)
+    template_id = models.CharField(max_length=100, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued', db_index=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    # When the pending retry of a failed attempt is due; requeueing leaves it alone until then.
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    batch = models.UUIDField(null=True, blank=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.channel} to {', '.join(self.recipients)} [{self.status}]"
+
+
+class AuditLogToken(models.Model):
+    """Inverted index over AuditLog: one row per distinct search token of an entry."""
+    log = models.ForeignKey(AuditLog, on_delete=models.CASCADE, related_name="tokens")
+    token = models.CharField(max_length=64)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["token", "log"], name="auditlogtoken_token_log_idx"),
+        ]
+
+
+class AuditLogArchive(models.Model):
+    """AuditLog rows of one period moved out of the table into a compressed JSONL file."""
+    period = models.PositiveIntegerField(db_index=True, help_text="YYYYMM")
+    row_count = models.PositiveIntegerField(default=0)
+    archive_file = models.CharField(max_length=255)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.period}: {self.row_count} rows in {self.archive_file}"
+
+
+class ReportJob(Common):
+    """A report generated off the request path; its file is shared by every job with the same cache key."""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='report_jobs')
+    report_type = models.CharField(max_length=30, default='members')
+    format = models.CharField(max_length=10)
+    fields = models.JSONField(default=list)
+    filters = models.JSONField(default=dict)
+    cache_key = models.CharField(max_length=64, db_index=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    total_rows = models.PositiveIntegerField(default=0)
+    row_count = models.PositiveIntegerField(default=0)
+    report_file = models.CharField(max_length=255, null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.report_type} {self.format} report [{self.status}]"
+
+
+class DailyUserStat(models.Model):
+    """Users by signup day (local date), kept current by signals; feeds the dashboard."""
+    day = models.DateField(unique=True)
+    joined = models.IntegerField(default=0)
+    active = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.day}: {self.joined} joined, {self.active} active"
+
+
+class DailyPaymentStat(models.Model):
+    """Payments by creation day (local date), membership type and status, kept current by signals."""
+    day = models.DateField()
+    membership_type = models.CharField(max_length=50, blank=True, default='')
+    status = models.CharField(max_length=20)
+    count = models.IntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["day", "membership_type", "status"], name="dailypaymentstat_bucket_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.membership_type or '-'} {self.status}: {self.count} / {self.amount}"
+
+
+class SequenceCounter(models.Model):
+    """Last value handed out by a named sequence (receipt numbers, membership ids, ...)."""
+    name = models.CharField(max_length=100, unique=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
 
 
+class PaymentWebhookEvent(models.Model):
+    """A gateway webhook delivery, stored once per event id and applied to Payment in batches."""
+    STATUS_CHOICES = [
+        ('received', 'Received'),
+        ('applied', 'Applied'),
+        ('ignored', 'Ignored'),
+    ]
+    event_id = models.CharField(max_length=100, unique=True)
+    event = models.CharField(max_length=50)
+    order_id = models.CharField(max_length=100, null=True, blank=True)
+    payment_id = models.CharField(max_length=255, null=True, blank=True)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='received', db_index=True)
+    detail = models.CharField(max_length=255, null=True, blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
 
+    def __str__(self):
+        return f"{self.event} {self.event_id} [{self.status}]"
@@ -1,7 +1,10 @@
 from django.contrib.auth.password_validation import validate_password
 from django.contrib.admin.models import LogEntry
+from django.db import transaction
+from django.urls import reverse
 from rest_framework import serializers
 from .models import *
+from .utils.membership_ids import allocate_membership_id, claim_membership_ids
 # from .models import Title  # Adjust import as needed
 
 class PermissionSerializer(serializers.ModelSerializer):
@@ -181,35 +184,17 @@ class EmployeeSerializer(serializers.ModelSerializer):
         role = validated_data.get("role") or getattr(self, "_validated_role", None)
         validated_data["role"] = role
 
-        if not validated_data.get("membership_id"):
-            prefix = self.get_role_prefix(role)
-            if not prefix:
-                raise serializers.ValidationError(f"No prefix configured for role: {role.name}")
-
-            last_user = (
-                User.objects
-                .filter(membership_id__startswith=f"{prefix}-")
-                .order_by('-membership_id')
-                .first()
-            )
-
-            if last_user:
-                try:
-                    number_part = last_user.membership_id.split('-')[1]
-                    last_number = int(number_part)
-                except (IndexError, ValueError):
-                    last_number = 0
+        with transaction.atomic():
+            if validated_data.get("membership_id"):
+                claim_membership_ids([validated_data["membership_id"]])
             else:
-                last_number = 0
+                prefix = self.get_role_prefix(role)
+                if not prefix:
+                    raise serializers.ValidationError(f"No prefix configured for role: {role.name}")
 
-            while True:
-                last_number += 1
-                new_id = f"{prefix}-{last_number:06d}"
-                if not User.objects.filter(membership_id=new_id).exists():
-                    validated_data["membership_id"] = new_id
-                    break
+                validated_data["membership_id"] = allocate_membership_id(prefix)
 
-        return super().create(validated_data)
+            return super().create(validated_data)
 
     
     def to_representation(self, instance):
@@ -359,6 +344,7 @@ class ApproveMembershipSerializer(serializers.ModelSerializer):
         read_only_fields = ['submitted_at']
 
 
+from django.urls import reverse
 from rest_framework import serializers
 from .models import ConfigSetting
 from django.contrib.auth import get_user_model
@@ -389,6 +375,18 @@ class ConfigSerializer(serializers.ModelSerializer):
         fields = ['id',"role",'membership_id',"name"]
 
 
+class AuditLogSerializer(serializers.ModelSerializer):
+    user_name = serializers.CharField(source="user.name", read_only=True, default=None)
+    user_email = serializers.CharField(source="user.email", read_only=True, default=None)
+
+    class Meta:
+        model = AuditLog
+        fields = [
+            "id", "user", "user_name", "user_email", "action", "model_name",
+            "object_id", "changes", "ip_address", "timestamp",
+        ]
+
+
 class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model=Notification
@@ -398,4 +396,29 @@ class NotificationSerializer(serializers.ModelSerializer):
 class ApplicationVerificationStatusSerializer(serializers.ModelSerializer):
     class Meta:
         model=ApplicationVerificationStatus
-        fields='__all__'
\ No newline at end of file
+        fields='__all__'
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = [
+            "id", "report_type", "format", "fields", "filters", "status", "total_rows",
+            "row_count", "progress", "error", "created_at", "completed_at", "download_url",
+        ]
+
+    def get_progress(self, obj):
+        if obj.status == "completed":
+            return 100
+        if not obj.total_rows:
+            return 0
+        return min(99, obj.row_count * 100 // obj.total_rows)
+
+    def get_download_url(self, obj):
+        if obj.status != "completed" or not obj.report_file:
+            return None
+        url = f"{reverse('export-members')}?job={obj.pk}"
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
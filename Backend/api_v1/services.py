@@ -17,10 +17,12 @@ def send_membership_otp(phone: str,membership_id: str,membership_type: str):
     template_id = settings.SMS_API_CONFIG["MEMBERSHIP_TEMPLATE_ID"]
     return _send_sms(phone, message, template_id)
 
+def verification_otp_message(otp: str):
+    return f"Welcome to IETE Membership Registration. Your OTP is {otp}, valid for 5 minutes."
+
 def send_verification_otp(phone: str, otp: str):
-    message = f"Welcome to IETE Membership Registration. Your OTP is {otp}, valid for 5 minutes."
     template_id = settings.SMS_API_CONFIG["TEMPLATE_ID"]
-    return _send_sms(phone, message, template_id)
+    return _send_sms(phone, verification_otp_message(otp), template_id)
 
 def _send_sms(phone: str, message: str,template_id: str = None):
     config = settings.SMS_API_CONFIG
@@ -1,9 +1,12 @@
 
-from django.db.models.signals import pre_save, post_save, post_delete
+from django.contrib.auth.models import Group, Permission
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
 from django.dispatch import receiver
-from django.forms.models import model_to_dict
-from django.utils.timezone import now
-from .models import AuditLog
+from .models import Notification, Payment, User
+from .backends import bump_permission_version
+from .utils.audit_track import audit_values, is_audited, record_audit, snapshot_audit_values
+from .utils.dashboard_stats import apply_stat_change, loaded_stat_values, saved_stat_values, stat_values
+from .utils.notification import invalidate_unread_count, publish_notification
 from .thread import get_request_user, get_request_ip
 from datetime import date, datetime
 from decimal import Decimal
@@ -29,66 +32,63 @@ def sanitize_dict(data):
     else:
         return safe_serialize(data)
 
-# ---------- Step 1: Cache old instance for update comparison ----------
+# ---------- Step 1: Capture old values for update comparison ----------
 @receiver(pre_save)
-def cache_old_instance(sender, instance, **kwargs):
-    if sender.__name__ == 'AuditLog':
+def cache_old_instance(sender, instance, raw=False, **kwargs):
+    if raw or not is_audited(sender):
         return
-    if instance.pk:
-        try:
-            instance._old_instance = sender.objects.get(pk=instance.pk)
-        except sender.DoesNotExist:
-            instance._old_instance = None
+    instance._audit_old_values = None
+    if instance._state.adding and (instance.pk is None or sender._meta.pk.has_default()):
+        return  # will be inserted
+    instance._audit_old_values = snapshot_audit_values(instance)
+    if instance._audit_old_values is None and instance.pk:
+        # Not loaded through Common.from_db (or loaded with deferred fields).
+        old = sender._base_manager.filter(pk=instance.pk).first()
+        if old is not None:
+            instance._audit_old_values = audit_values(old)
 
 # ---------- Step 2: Log create and update ----------
 @receiver(post_save)
-def log_save(sender, instance, created, **kwargs):
-    if sender.__name__ == 'AuditLog':
+def log_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or not is_audited(sender):
         return
 
-    user = get_request_user()
-    ip = get_request_ip()
-    changes = {}
+    old_values = getattr(instance, '_audit_old_values', None)
+    new_values = audit_values(instance)
+    if update_fields is not None:
+        # Only these columns were written; the rest stay pending for a later save.
+        saved = {sender._meta.get_field(name).name for name in update_fields}
+        new_values = {field: value for field, value in new_values.items() if field in saved}
 
-    old = getattr(instance, '_old_instance', None)
-    is_create = created and not old
-    is_update = not created and old
-
-    if is_create:
+    if created and old_values is None:
         action = 'create'
-        new_data = model_to_dict(instance)
-        changes = sanitize_dict(new_data)
-
-    elif is_update:
+        changes = sanitize_dict(new_values)
+    elif not created and old_values is not None:
         action = 'update'
-        old_data = model_to_dict(old)
-        new_data = model_to_dict(instance)
-        for field in new_data:
-            old_val = old_data.get(field)
-            new_val = new_data.get(field)
-            if old_val != new_val:
-                changes[field] = {
-                    "from": safe_serialize(old_val),
-                    "to": safe_serialize(new_val)
-                }
-        if not changes:
-            changes = None
+        changes = {
+            field: {"from": safe_serialize(old_values.get(field)), "to": safe_serialize(value)}
+            for field, value in new_values.items()
+            if old_values.get(field) != value
+        } or None
     else:
         return  # no changes or invalid state
 
-    AuditLog.objects.create(
-        user=user,
+    if hasattr(instance, 'take_snapshot'):
+        instance.take_snapshot(update_fields)
+
+    record_audit(
+        user=get_request_user(),
         action=action,
         model_name=sender.__name__,
         object_id=str(instance.pk),
         changes=changes,
-        ip_address=ip
+        ip_address=get_request_ip(),
     )
 
 # ---------- Step 3: Log delete ----------
 @receiver(post_delete)
 def log_delete(sender, instance, **kwargs):
-    if sender.__name__ == "AuditLog":
+    if not is_audited(sender):
         return  # Prevent recursive logging
 
     user = getattr(instance, 'modified_by', None) or get_request_user()
@@ -107,7 +107,7 @@ def log_delete(sender, instance, **kwargs):
     if user_info:
         summary_text += f" by user {user_info['name']} <{user_info['email']}>"
 
-    AuditLog.objects.create(
+    record_audit(
         user=user,
         action='delete',
         model_name=sender.__name__,
@@ -115,3 +115,83 @@ def log_delete(sender, instance, **kwargs):
         changes={"summary": summary_text, "user": sanitize_dict(user_info)},
         ip_address=get_request_ip(),
     )
+
+
+# ---------- Log role permission changes ----------
+@receiver(m2m_changed, sender=Group.permissions.through)
+def log_group_permissions(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        related = instance.group_set if reverse else instance.permissions
+        instance._audit_cleared_pks = set(related.values_list('pk', flat=True))
+        return
+    if action == 'post_clear':
+        pk_set = getattr(instance, '_audit_cleared_pks', set())
+    elif action not in ('post_add', 'post_remove'):
+        return
+    if not pk_set:
+        return
+
+    change = 'added' if action == 'post_add' else 'removed'
+    if reverse:
+        # permission.group_set.add(...): one entry per group touched.
+        pairs = [(group_id, [instance.codename]) for group_id in sorted(pk_set)]
+    else:
+        codenames = sorted(Permission.objects.filter(pk__in=pk_set).values_list('codename', flat=True))
+        pairs = [(instance.pk, codenames)]
+    for group_id, codenames in pairs:
+        record_audit(
+            user=get_request_user(),
+            action='update',
+            model_name=Group.__name__,
+            object_id=str(group_id),
+            changes={"permissions": {change: codenames}},
+            ip_address=get_request_ip(),
+        )
+
+
+# ---------- Permission cache invalidation ----------
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_permission_cache(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        bump_permission_version()
+
+
+# ---------- Notification unread counter and live push ----------
+@receiver(post_save, sender=Notification)
+@receiver(post_delete, sender=Notification)
+def invalidate_notification_count(sender, instance, **kwargs):
+    invalidate_unread_count(instance.recipient_id)
+
+
+@receiver(post_save, sender=Notification)
+def push_notification(sender, instance, created, **kwargs):
+    if created:
+        publish_notification(instance)
+
+
+# ---------- Dashboard rollups ----------
+@receiver(pre_save, sender=User)
+@receiver(pre_save, sender=Payment)
+def capture_stat_values(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    instance._stat_old_values = None if instance._state.adding else loaded_stat_values(instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Payment)
+def update_dashboard_stats(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    old_values = getattr(instance, '_stat_old_values', None)
+    values = saved_stat_values(instance, old_values, update_fields)
+    apply_stat_change(sender.__name__, old_values, values)
+    instance._stat_saved_values = values
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Payment)
+def remove_dashboard_stats(sender, instance, **kwargs):
+    apply_stat_change(sender.__name__, stat_values(instance), None)
@@ -1,17 +1,162 @@
+import logging
+from datetime import timedelta
+from celery import shared_task
+from django.core.mail import get_connection
+from django.db.models import Q
 from django.utils import timezone
-from .models import Proposer
-from django.core.mail import send_mail
+from .models import OutboundMessage, Proposer, ReportJob
 from django.conf import settings
+from .utils.audit_track import index_pending_audit_logs
+from .utils.outbound import claim_outbound_message, queue_email, send_outbound_message
+from .utils.payment_gateway import apply_webhook_events
+from .utils.reconciliation import reconcile_pending_payments
+from .utils.reports import purge_report_files, requeue_stale_report_jobs, run_report_job
 
+logger = logging.getLogger(__name__)
+
+BATCH_RETRY_DELAY = 30
+
+
+@shared_task
 def auto_expire_proposers():
     now = timezone.now()
-    expired = Proposer.objects.filter(status='pending', expiry_date__lt=now)
+    expired = Proposer.objects.filter(status='pending', expiry_date__lt=now).select_related('user')
     for p in expired:
         p.status = 'expired'
         p.save()
-        send_mail(
+        queue_email(
             "Membership Proposer Expired",
             f"Your proposer {p.name} did not respond in time. Status: expired.",
             settings.DEFAULT_FROM_EMAIL,
-            [p.user.email]
+            [p.user.email],
         )
+
+
+@shared_task(bind=True, max_retries=settings.OUTBOUND_MAX_RETRIES)
+def deliver_outbound_message(self, message_id):
+    message = claim_outbound_message(message_id)
+    if message is None:
+        return  # already delivered, failed for good, or being sent by another worker
+
+    try:
+        send_outbound_message(message)
+    except Exception as exc:
+        message.attempts += 1
+        message.last_error = str(exc)
+        if message.attempts > self.max_retries:
+            message.status = "failed"
+            message.save(update_fields=["attempts", "last_error", "status", "updated_at"])
+            logger.error(f"Giving up on outbound {message.channel} {message.pk}: {exc}")
+            return
+        # Exponential backoff: 30s, 1m, 2m, 4m ... capped at an hour.
+        countdown = min(30 * 2 ** (message.attempts - 1), 3600)
+        message.status = "queued"
+        message.next_attempt_at = timezone.now() + timedelta(seconds=countdown)
+        message.save(update_fields=["attempts", "last_error", "status", "next_attempt_at", "updated_at"])
+        raise self.retry(exc=exc, countdown=countdown)
+
+    message.attempts += 1
+    message.status = "sent"
+    message.sent_at = timezone.now()
+    message.last_error = None
+    message.save(update_fields=["attempts", "status", "sent_at", "last_error", "updated_at"])
+
+
+@shared_task
+def deliver_outbound_batch(batch_id):
+    """Send every message of a notification batch over one SMTP connection."""
+    claimed = OutboundMessage.objects.filter(batch=batch_id, status="queued").update(
+        status="sending", updated_at=timezone.now()
+    )
+    if not claimed:
+        return
+    messages = list(OutboundMessage.objects.filter(batch=batch_id, status="sending"))
+
+    connection = get_connection()
+    try:
+        connection.open()
+        open_error = None
+    except Exception as exc:
+        open_error = exc
+
+    retry = []
+    try:
+        for message in messages:
+            message.attempts += 1
+            message.updated_at = timezone.now()
+            try:
+                if open_error and message.channel == "email":
+                    raise open_error
+                send_outbound_message(message, connection=connection)
+            except Exception as exc:
+                message.status = "queued"
+                message.last_error = str(exc)
+                message.next_attempt_at = timezone.now() + timedelta(seconds=BATCH_RETRY_DELAY)
+                retry.append(message)
+            else:
+                message.status = "sent"
+                message.sent_at = timezone.now()
+                message.last_error = None
+    finally:
+        connection.close()
+
+    OutboundMessage.objects.bulk_update(
+        messages, ["attempts", "status", "sent_at", "last_error", "next_attempt_at", "updated_at"]
+    )
+    # Failed messages fall back to individual delivery with its retry/backoff.
+    for message in retry:
+        deliver_outbound_message.apply_async((message.pk,), countdown=BATCH_RETRY_DELAY)
+
+
+@shared_task
+def requeue_outbound_messages(stale_minutes=10):
+    """
+    Re-dispatch messages whose task was lost (broker down at enqueue time, or a
+    worker died mid-send) so the table, not the broker, is the source of truth.
+    """
+    cutoff = timezone.now() - timedelta(minutes=stale_minutes)
+    OutboundMessage.objects.filter(
+        status="sending", updated_at__lt=cutoff - timedelta(minutes=stale_minutes)
+    ).update(status="queued", updated_at=timezone.now())
+
+    # Rows waiting out a retry backoff already have a task scheduled; only
+    # take them once that retry is overdue, or they would get a second chain.
+    stale = OutboundMessage.objects.filter(status="queued", updated_at__lt=cutoff).filter(
+        Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lt=cutoff)
+    )
+    for message_id in stale.values_list("id", flat=True).iterator():
+        deliver_outbound_message.delay(message_id)
+
+
+@shared_task
+def index_audit_logs():
+    return index_pending_audit_logs()
+
+
+@shared_task
+def generate_report(job_id):
+    claimed = ReportJob.objects.filter(pk=job_id, status="queued").update(status="running", updated_at=timezone.now())
+    if not claimed:
+        return  # already picked up by another worker
+    run_report_job(ReportJob.objects.get(pk=job_id))
+
+
+@shared_task
+def requeue_report_jobs():
+    requeue_stale_report_jobs()
+    purge_report_files()
+
+
+@shared_task
+def apply_payment_webhooks(max_batches=20):
+    """Drain received webhook events a batch at a time."""
+    for _ in range(max_batches):
+        if not apply_webhook_events():
+            break
+
+
+@shared_task
+def reconcile_payments():
+    """Settle payments still Pending from the gateway's records; returns the report file."""
+    report = reconcile_pending_payments()
+    return report and report["report_file"]
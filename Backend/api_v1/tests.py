@@ -1,3 +1,911 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import importlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from types import SimpleNamespace
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from decimal import Decimal
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.apps import apps
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connection, connections, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from pypdf import PdfReader
+from rest_framework.response import Response
+from rest_framework_simplejwt.tokens import AccessToken
+from .models import (
+    ApproveMembership, AuditLog, AuditLogArchive, AuditLogToken, DailyPaymentStat, DailyUserStat, Document,
+    Experience, Notification, OutboundMessage, Payment, PaymentWebhookEvent, Proposer, Qualification,
+    QualificationBranch, QualificationType, ReportJob, Role, SequenceCounter, User,
+)
+from .authentication import issue_stream_ticket, redeem_stream_ticket
+from .backends import bump_permission_version, get_permission_version
+from .managers import audit_period, current_audit_period, shift_period
+from .serializers import AuditLogSerializer, ReportJobSerializer
+from .tasks import requeue_outbound_messages
+from .utils.application_ids import APPLICATION_ID_SEQUENCE, APPLICATION_ID_SPACE, application_id_for, permute
+from .utils.applications import applicant_queryset, build_applicant_dossier, with_dossier_relations
+from .utils.audit_track import audit_scope, index_pending_audit_logs, record_audit, search_audit_logs, tokenize
+from .utils.dashboard_stats import add_stat_rows, rebuild_dashboard_stats
+from .utils.export_data import export_rows, export_to_tempfile, keyset_values
+from .utils.fake_gateway import FakeRazorpayClient, webhook_delivery
+from .utils.membership_ids import allocate_membership_id, claim_membership_ids
+from .utils.notification import notify_users_for_role
+from .utils.outbound import notification_batch, queue_email
+from .utils.payment_gateway import apply_webhook_events
+from .utils.pdf_report import TableLayout, write_table_pdf
+from .utils.pubsub import RedisBroker, user_channel
+from .utils.reconciliation import RECONCILE_LOCK_KEY, reconcile_pending_payments
+from .utils.receipt_no import generate_receipt_number
+from .utils.reports import (
+    REPORT_FILE_MAX_AGE, member_report_queryset, purge_report_files, report_data_version, report_file_path,
+    request_member_report, requeue_stale_report_jobs, run_report_job,
+)
+from .views import route_audit_logs
 
-# Create your tests here.
+
+@override_settings(RAZORPAY_WEBHOOK_SECRET="whsec_test", RAZORPAY_KEY_SECRET="key_secret_test")
+class RazorpayWebhookTests(TestCase):
+    def setUp(self):
+        FakeRazorpayClient.reset()
+        self.gateway = FakeRazorpayClient()
+        self.user = User.objects.create(email="member@example.com", name="Member")
+        order = self.gateway.order.create({"amount": 100000, "receipt": "rcpt_1"})
+        self.payment = Payment.objects.create(
+            user=self.user, order_id=order["id"], receipt="rcpt_1",
+            amount=Decimal("1000"), membership_type="Life",
+        )
+
+    def deliver(self, event, gateway_payment, **kwargs):
+        body, headers = webhook_delivery(event, gateway_payment, **kwargs)
+        return self.client.post(reverse("razorpay-webhook"), body, content_type="application/json", **headers)
+
+    def test_bad_signature_is_rejected(self):
+        captured = self.gateway.capture(self.payment.order_id)
+        response = self.deliver("payment.captured", captured, secret="not-the-secret")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(PaymentWebhookEvent.objects.exists())
+
+    def test_redelivered_event_is_a_duplicate(self):
+        captured = self.gateway.capture(self.payment.order_id)
+        self.assertEqual(self.deliver("payment.captured", captured, event_id="evt_1").json(), {"status": "queued"})
+        self.assertEqual(self.deliver("payment.captured", captured, event_id="evt_1").json(), {"status": "duplicate"})
+        self.assertEqual(PaymentWebhookEvent.objects.count(), 1)
+
+    def test_capture_is_final(self):
+        captured = self.gateway.capture(self.payment.order_id)
+        self.deliver("payment.captured", captured)
+        self.deliver("payment.failed", self.gateway.fail(self.payment.order_id))
+        apply_webhook_events()
+
+        self.payment.refresh_from_db()
+        self.assertEqual((self.payment.status, self.payment.payment_id), ("Success", captured["id"]))
+        self.assertEqual(
+            list(PaymentWebhookEvent.objects.order_by("id").values_list("status", flat=True)),
+            ["applied", "ignored"],
+        )
+
+        # A later batch does not reopen it either.
+        self.deliver("payment.failed", self.gateway.fail(self.payment.order_id))
+        apply_webhook_events()
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, "Success")
+
+    def test_one_email_and_audit_entry_per_transition(self):
+        self.deliver("payment.failed", self.gateway.fail(self.payment.order_id))
+        captured = self.gateway.capture(self.payment.order_id)
+        self.deliver("payment.captured", captured)
+        self.deliver("order.paid", captured)
+        # Audit entries are written once the batch commits; the broker is not needed for that.
+        with mock.patch("api_v1.tasks.deliver_outbound_batch.delay"), self.captureOnCommitCallbacks(execute=True):
+            apply_webhook_events()
+
+        self.assertEqual(
+            list(OutboundMessage.objects.values_list("subject", "recipients")),
+            [("Payment Confirmation", ["member@example.com"])],
+        )
+        changes = AuditLog.objects.filter(
+            model_name="Payment", object_id=str(self.payment.pk), action="update",
+        ).values_list("changes", flat=True)
+        # Pending -> Failed and Failed -> Success land in one batch, so they share one row.
+        self.assertEqual(len(changes), 1)
+        self.assertEqual(changes[0]["status"], {"from": "Pending", "to": "Success"})
+
+    def test_verify_after_webhook_sends_nothing_more(self):
+        captured = self.gateway.capture(self.payment.order_id)
+        self.deliver("payment.captured", captured)
+        apply_webhook_events()
+
+        with mock.patch("api_v1.views.razorpay_client", self.gateway):
+            ok = self.client.post(reverse("verify-payment"), {
+                "razorpay_order_id": self.payment.order_id,
+                "razorpay_payment_id": captured["id"],
+                "razorpay_signature": self.gateway.checkout_signature(captured),
+            }, content_type="application/json")
+            forged = self.client.post(reverse("verify-payment"), {
+                "razorpay_order_id": self.payment.order_id,
+                "razorpay_payment_id": captured["id"],
+                "razorpay_signature": "forged",
+            }, content_type="application/json")
+
+        self.assertEqual((ok.status_code, forged.status_code), (200, 400))
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, "Success")
+        self.assertEqual(OutboundMessage.objects.count(), 1)
+
+
+class PaymentReconciliationTests(TestCase):
+    def setUp(self):
+        FakeRazorpayClient.reset()
+        self.gateway = FakeRazorpayClient()
+        self.user = User.objects.create(email="member@example.com", name="Member")
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+    def pending(self, age=timedelta(hours=2), order_id=None):
+        order_id = order_id or self.gateway.order.create({"amount": 100000})["id"]
+        payment = Payment.objects.create(
+            user=self.user, order_id=order_id, receipt=order_id, amount=Decimal("1000"), membership_type="Life",
+        )
+        Payment.objects.filter(pk=payment.pk).update(created_at=timezone.now() - age)
+        return payment
+
+    def test_settles_from_gateway_state(self):
+        captured = self.pending()
+        capture = self.gateway.capture(captured.order_id)
+        declined = self.pending()
+        self.gateway.fail(declined.order_id)
+        refunded = self.pending()
+        self.gateway.payment.refund(self.gateway.capture(refunded.order_id)["id"])
+        waiting = self.pending()
+        abandoned = self.pending(age=timedelta(days=2))
+        unknown = self.pending(order_id="order_unknown")
+        too_recent = self.pending(age=timedelta(minutes=5))
+        self.gateway.capture(too_recent.order_id)
+
+        report = reconcile_pending_payments(client=self.gateway, chunk_size=2, rate=0)
+
+        statuses = dict(Payment.objects.values_list("pk", "status"))
+        self.assertEqual(statuses, {
+            captured.pk: "Success", declined.pk: "Failed", refunded.pk: "Pending", waiting.pk: "Pending",
+            abandoned.pk: "Failed", unknown.pk: "Pending", too_recent.pk: "Pending",
+        })
+        captured.refresh_from_db()
+        self.assertEqual(captured.payment_id, capture["id"])
+        self.assertEqual(
+            {key: report[key] for key in ("checked", "success", "failed", "refunded", "unchanged")},
+            {"checked": 6, "success": 1, "failed": 2, "refunded": 1, "unchanged": 1},
+        )
+        self.assertEqual([error["order_id"] for error in report["errors"]], ["order_unknown"])
+        # Only the capture is confirmed; the refunded order is neither revenue nor mailed.
+        self.assertEqual(OutboundMessage.objects.count(), 1)
+
+    def test_dry_run_writes_nothing(self):
+        payment = self.pending()
+        self.gateway.capture(payment.order_id)
+        report = reconcile_pending_payments(client=self.gateway, rate=0, dry_run=True)
+        self.assertEqual(report["success"], 1)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, "Pending")
+
+    def test_one_run_at_a_time(self):
+        cache.set(RECONCILE_LOCK_KEY, "other-run")
+        self.addCleanup(cache.delete, RECONCILE_LOCK_KEY)
+        self.assertIsNone(reconcile_pending_payments(client=self.gateway))
+
+
+class NotificationStreamTests(TestCase):
+    def test_ticket_opens_one_stream(self):
+        user = User.objects.create(email="member@example.com", name="Member")
+        ticket = issue_stream_ticket(user)
+        self.assertEqual(redeem_stream_ticket(ticket).id, user.id)
+        self.assertIsNone(redeem_stream_ticket(ticket))
+
+    def test_delta_cursor_holds_back_recent_rows(self):
+        user = User.objects.create(email="member@example.com", name="Member")
+        old, recent = (Notification.objects.create(recipient=user, message=text) for text in ("old", "recent"))
+        Notification.objects.filter(pk=old.pk).update(timestamp=timezone.now() - timedelta(minutes=5))
+
+        data = self.client.get(
+            reverse("notifications"), {"since_id": 0}, HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}",
+        ).json()
+        self.assertEqual([row["id"] for row in data["results"]], [old.pk, recent.pk])
+        # The recent row could still be overtaken by a lower id committing late.
+        self.assertEqual(data["since_id"], old.pk)
+
+    def test_stream_refused_under_wsgi(self):
+        response = self.client.get(reverse("notifications-stream"))
+        self.assertEqual(response.status_code, 503)
+
+
+class ClaimsAuthenticationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="member@example.com", name="Member", is_active=True)
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {AccessToken.for_user(self.user)}"}
+
+    def test_claims_request_skips_user_query(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("notifications-unread-count"), **self.auth)
+        self.assertEqual(response.json(), {"unread_count": 0})
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn(User._meta.db_table, queries[0]["sql"])
+        with self.assertNumQueries(0):
+            self.client.get(reverse("notifications-unread-count"), **self.auth)
+
+    def test_deleted_user_gets_401_through_view_except(self):
+        user_id = self.user.pk
+        User.objects.filter(pk=user_id).delete()
+        # The tracker reads the user inside its own ``except Exception``.
+        response = self.client.get(reverse("application-tracker"), **self.auth)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()["code"], "user_not_found")
+
+    def test_inactive_user_gets_401(self):
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        response = self.client.post(reverse("notifications-stream-ticket"), **self.auth)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()["code"], "user_inactive")
+
+
+class RedisBrokerTests(SimpleTestCase):
+    """Runs against the Redis at REDIS_TEST_URL; skipped when none answers."""
+
+    url = os.environ.get("REDIS_TEST_URL", "redis://localhost:6379/15")
+
+    def setUp(self):
+        import redis
+
+        try:
+            redis.Redis.from_url(self.url).ping()
+        except redis.RedisError:
+            self.skipTest(f"no Redis at {self.url}")
+
+    def test_event_reaches_a_subscriber_of_another_broker(self):
+        subscriber, publisher = RedisBroker(self.url), RedisBroker(self.url)
+        channel = user_channel(uuid.uuid4())
+
+        async def receive():
+            async with subscriber.subscribe(channel) as queue:
+                self.assertEqual(publisher.subscribed([channel, "user:nobody"]), {channel})
+                publisher.publish(channel, {"type": "notification", "data": {"id": 1}})
+                return await asyncio.wait_for(queue.get(), 5)
+
+        self.assertEqual(async_to_sync(receive)(), {"type": "notification", "data": {"id": 1}})
+        self.assertFalse(publisher.has_subscribers(channel))
+
+
+class NotificationBroadcastTests(TestCase):
+    def setUp(self):
+        self.role = Role.objects.create(name="Fellow")
+        for i in range(3):
+            User.objects.create(email=f"fellow{i}@example.com", name=f"Fellow {i}", role=self.role)
+        self.admin = User.objects.create(
+            email="admin@example.com", name="Admin", is_active=True, is_staff=True, is_superuser=True,
+        )
+        AuditLog.objects.all().delete()
+
+    def test_broadcast_writes_one_summary_entry(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("notifications-broadcast"), {"role": "Fellow", "message": "AGM on Friday"},
+                content_type="application/json", HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.admin)}",
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["recipients"], 3)
+        self.assertEqual(Notification.objects.filter(recipient__role=self.role).count(), 3)
+        entry = AuditLog.objects.get(model_name="Notification")
+        self.assertEqual((entry.object_id, entry.changes["recipients"]), (f"role:{self.role.pk}", 3))
+
+    def test_broadcast_queries_do_not_grow_per_recipient(self):
+        # The savepoint pair, the recipients, one insert, and the summary entry on commit.
+        with self.assertNumQueries(5), self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(notify_users_for_role(self.role, "AGM on Friday"), 3)
+        self.assertEqual(AuditLog.objects.filter(model_name="Notification").count(), 1)
+
+
+class PermissionVersionTests(TestCase):
+    def test_bump_waits_for_commit(self):
+        version = get_permission_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_permission_version()
+            self.assertEqual(get_permission_version(), version)
+        self.assertEqual(get_permission_version(), version + 1)
+
+
+class DashboardStatsTests(TestCase):
+    def test_bulk_created_users_are_counted(self):
+        users = User.objects.bulk_create([
+            User(email=f"import{i}@example.com", name=f"Import {i}", is_active=bool(i % 2)) for i in range(5)
+        ])
+        add_stat_rows("User", users)
+        counted = list(DailyUserStat.objects.values_list("day", "joined", "active"))
+        rebuild_dashboard_stats()
+        self.assertEqual(counted, list(DailyUserStat.objects.values_list("day", "joined", "active")))
+        self.assertEqual(counted[0][1:], (5, 2))
+
+
+class AuditSnapshotTests(TestCase):
+    def setUp(self):
+        user = User.objects.create(email="member@example.com", name="Member")
+        self.pk = Payment.objects.create(
+            user=user, order_id="order_1", receipt="R1", amount=Decimal("1000"), membership_type="Life",
+        ).pk
+
+    def saved_changes(self, payment, **kwargs):
+        AuditLog.objects.all().delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            payment.save(**kwargs)
+        return AuditLog.objects.get(model_name="Payment").changes
+
+    def test_diff_comes_from_the_loaded_snapshot(self):
+        payment = Payment.objects.get(pk=self.pk)
+        payment.receipt = "R2"
+        with self.assertNumQueries(1):
+            payment.save()
+        self.assertEqual(self.saved_changes(payment), None)
+        payment.receipt = "R3"
+        self.assertEqual(self.saved_changes(payment), {"receipt": {"from": "R2", "to": "R3"}})
+
+    def test_deferred_fields_fall_back_to_the_database(self):
+        payment = Payment.objects.only("id", "receipt").get(pk=self.pk)
+        payment.receipt = "R2"
+        self.assertEqual(self.saved_changes(payment), {"receipt": {"from": "R1", "to": "R2"}})
+
+    def test_unsaved_fields_stay_pending_after_a_partial_save(self):
+        payment = Payment.objects.get(pk=self.pk)
+        payment.receipt, payment.status = "R2", "Failed"
+        self.assertEqual(
+            self.saved_changes(payment, update_fields=["receipt"]), {"receipt": {"from": "R1", "to": "R2"}},
+        )
+        self.assertEqual(self.saved_changes(payment), {"status": {"from": "Pending", "to": "Failed"}})
+
+    def test_partial_refresh_keeps_other_changes_pending(self):
+        payment = Payment.objects.get(pk=self.pk)
+        payment.status = "Failed"
+        payment.refresh_from_db(fields=["receipt"])
+        self.assertEqual(self.saved_changes(payment), {"status": {"from": "Pending", "to": "Failed"}})
+
+    def test_partial_save_rolls_up_only_the_saved_columns(self):
+        payment = Payment.objects.get(pk=self.pk)
+        payment.status, payment.membership_type = "Success", "Annual"
+        payment.save(update_fields=["status"])
+        self.assertEqual(
+            list(DailyPaymentStat.objects.filter(count__gt=0).values_list("membership_type", "status")),
+            [("Life", "Success")],
+        )
+        payment.save()
+        self.assertEqual(
+            list(DailyPaymentStat.objects.filter(count__gt=0).values_list("membership_type", "status")),
+            [("Annual", "Success")],
+        )
+
+
+@mock.patch("api_v1.tasks.generate_report.delay")
+class ReportJobTests(TestCase):
+    def stale_job(self, status, age):
+        job, _ = request_member_report(None, "csv", ["email"], {})
+        ReportJob.objects.filter(pk=job.pk).update(status=status, updated_at=timezone.now() - age)
+        return job
+
+    def test_stale_queued_job_is_redispatched(self, delay):
+        job = self.stale_job("queued", timedelta(hours=1))
+        self.assertEqual(requeue_stale_report_jobs(), (1, 0))
+        delay.assert_called_once_with(job.pk)
+        # Dispatched again, it counts as fresh for identical requests.
+        self.assertEqual(request_member_report(None, "csv", ["email"], {}), (job, False))
+
+    def test_stale_running_job_fails_and_stops_deduping(self, delay):
+        job = self.stale_job("running", timedelta(hours=2))
+        new_job, created = request_member_report(None, "csv", ["email"], {})
+        self.assertTrue(created)
+        self.assertNotEqual(new_job.pk, job.pk)
+        self.assertEqual(requeue_stale_report_jobs(), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+
+    def test_bulk_writes_change_the_data_version(self, delay):
+        user = User.objects.create(email="member@example.com", name="Member")
+        queryset = member_report_queryset({})
+        version = report_data_version(queryset)
+        # update() leaves updated_at as it was.
+        User.objects.filter(pk=user.pk).update(name="Renamed")
+        self.assertNotEqual(report_data_version(queryset), version)
+
+        version = report_data_version(queryset)
+        user.city = "Pune"
+        User.objects.bulk_update([user], ["city"])
+        self.assertNotEqual(report_data_version(queryset), version)
+
+        version = report_data_version(queryset)
+        User.objects.filter(pk=None).update(name="Nobody")
+        self.assertEqual(report_data_version(queryset), version)
+
+    def test_old_report_files_are_purged(self, delay):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        User.objects.create(email="member@example.com", name="Member")
+        with override_settings(MEDIA_ROOT=media_root):
+            old, _ = request_member_report(None, "csv", ["email"], {})
+            recent, _ = request_member_report(None, "excel", ["email"], {})
+            for job in (old, recent):
+                run_report_job(job)
+            old_path = report_file_path(old)
+            written = (timezone.now() - REPORT_FILE_MAX_AGE - timedelta(hours=1)).timestamp()
+            os.utime(old_path, (written, written))
+
+            self.assertEqual(purge_report_files(), 1)
+            self.assertFalse(os.path.exists(old_path))
+            self.assertIsNotNone(report_file_path(recent))
+            old.refresh_from_db()
+            self.assertIsNone(old.report_file)
+            self.assertIsNone(ReportJobSerializer(old).data["download_url"])
+            # Asking again generates the report anew.
+            self.assertTrue(request_member_report(None, "csv", ["email"], {})[1])
+
+
+class AuditLogSerializerTests(TestCase):
+    def test_user_fields(self):
+        user = User.objects.create(email="admin@example.com", name="Admin")
+        logs = [
+            AuditLog.objects.create(user=user, action="update", model_name="User", object_id=str(user.pk)),
+            AuditLog.objects.create(user=None, action="update", model_name="Payment", object_id="1"),
+        ]
+        data = AuditLogSerializer(logs, many=True).data
+        self.assertEqual((data[0]["user_name"], data[0]["user_email"]), ("Admin", "admin@example.com"))
+        self.assertEqual((data[1]["user_name"], data[1]["user_email"]), (None, None))
+
+
+class AuditBufferTests(TestCase):
+    def record(self, object_id):
+        record_audit(action="update", model_name="Payment", object_id=object_id)
+
+    def test_rolled_back_writes_leave_no_entry(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.record("1")
+                raise RuntimeError
+            self.record("2")
+        self.assertEqual(list(AuditLog.objects.values_list("object_id", flat=True)), ["2"])
+
+    def test_nested_scopes_flush_once_at_the_outermost_exit(self):
+        with mock.patch.object(AuditLog.objects, "bulk_create", wraps=AuditLog.objects.bulk_create) as bulk_create:
+            with audit_scope():
+                with audit_scope():
+                    with self.captureOnCommitCallbacks(execute=True):
+                        self.record("1")
+                        self.record("2")
+                self.assertFalse(AuditLog.objects.exists())
+            self.assertEqual(AuditLog.objects.count(), 2)
+        bulk_create.assert_called_once()
+
+    @mock.patch("api_v1.utils.audit_track.AUDIT_FLUSH_THRESHOLD", 2)
+    def test_threshold_flushes_inside_a_scope(self):
+        with audit_scope():
+            with self.captureOnCommitCallbacks(execute=True):
+                for object_id in "123":
+                    self.record(object_id)
+            self.assertEqual(AuditLog.objects.count(), 2)
+        self.assertEqual(AuditLog.objects.count(), 3)
+
+    def test_failed_insert_is_logged_not_raised(self):
+        with mock.patch.object(AuditLog.objects, "bulk_create", side_effect=DatabaseError("disk full")):
+            with self.assertLogs("api_v1.utils.audit_track", "ERROR") as logs, audit_scope():
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.record("1")
+                    self.record("2")
+        self.assertIn("Failed to write 2 audit log entries", logs.output[0])
+        self.assertFalse(AuditLog.objects.exists())
+
+
+class AuditPeriodTests(TestCase):
+    def entry(self, months_ago):
+        period = shift_period(current_audit_period(), -months_ago)
+        log = AuditLog.objects.create(action="update", model_name="Payment", object_id=str(months_ago))
+        timestamp = datetime(period // 100, period % 100, 15, tzinfo=dt_timezone.utc)
+        AuditLog.objects.filter(pk=log.pk).update(period=period, timestamp=timestamp)
+        log.refresh_from_db()
+        return log
+
+    def object_ids(self, queryset):
+        return sorted(int(object_id) for object_id in queryset.values_list("object_id", flat=True))
+
+    def test_period_is_the_utc_month(self):
+        log = AuditLog.objects.create(action="create", model_name="Payment", object_id="1")
+        self.assertEqual(log.period, current_audit_period())
+        # 03:00 on 1 February in India is still January in UTC.
+        ist = dt_timezone(timedelta(hours=5, minutes=30))
+        self.assertEqual(audit_period(datetime(2026, 2, 1, 3, 0, tzinfo=ist)), 202601)
+        self.assertEqual(shift_period(202601, -1), 202512)
+        self.assertEqual(shift_period(202512, 2), 202602)
+
+    @override_settings(AUDIT_HOT_MONTHS=3)
+    def test_default_routing_reads_only_the_hot_periods(self):
+        for months_ago in (0, 2, 3):
+            self.entry(months_ago)
+        self.assertEqual(self.object_ids(route_audit_logs({})), [0, 2])
+        self.assertEqual(self.object_ids(route_audit_logs({"period": "all"})), [0, 2, 3])
+
+    def test_date_bounds_prune_to_the_periods_they_span(self):
+        logs = [self.entry(months_ago) for months_ago in (1, 2, 3)]
+        since, until = logs[1].timestamp.date(), logs[0].timestamp.date()
+        queryset = route_audit_logs({"since": since.isoformat(), "until": until.isoformat()})
+        sql = str(queryset.query)
+        self.assertIn(f'"period" >= {logs[1].period}', sql)
+        self.assertIn(f'"period" <= {logs[0].period}', sql)
+        self.assertEqual(self.object_ids(queryset), [1, 2])
+        self.assertEqual(self.object_ids(route_audit_logs({"period": str(logs[2].period)})), [3])
+
+    @override_settings(AUDIT_RETENTION_MONTHS=12)
+    def test_archive_moves_only_periods_past_retention(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        old, kept, current = self.entry(12), self.entry(11), self.entry(0)
+        index_pending_audit_logs()
+
+        with override_settings(MEDIA_ROOT=media_root):
+            call_command("archive_audit_logs", keep_months=12, stdout=StringIO())
+
+        self.assertEqual(self.object_ids(AuditLog.objects.all()), [0, 11])
+        self.assertFalse(AuditLogToken.objects.filter(log_id=old.pk).exists())
+        archive = AuditLogArchive.objects.get()
+        self.assertEqual((archive.period, archive.row_count), (old.period, 1))
+        with gzip.open(os.path.join(media_root, archive.archive_file), "rt") as file:
+            self.assertEqual([json.loads(line)["id"] for line in file], [old.pk])
+
+
+class AuditSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="treasurer@example.com", name="Asha Rao")
+        self.failed = AuditLog.objects.create(
+            user=self.user, action="delete", model_name="Payment", object_id="7",
+            changes={"status": {"from": "Pending", "to": "Failed"}}, ip_address="10.0.0.5",
+        )
+        self.pending = AuditLog.objects.create(
+            action="update", model_name="Payout", object_id="8", changes={"status": "Pending"},
+        )
+        self.assertEqual(index_pending_audit_logs(), 2)
+
+    def search(self, query):
+        return list(search_audit_logs(AuditLog.objects.order_by("id"), query))
+
+    def test_tokenize_keeps_dotted_values_whole_and_split(self):
+        self.assertEqual(
+            tokenize("Sent to A.Rao@example.com"), {"sent", "to", "a.rao@example.com", "a", "rao", "example", "com"},
+        )
+
+    def test_exact_and_prefix_terms(self):
+        self.assertEqual(self.search("failed"), [self.failed])
+        self.assertEqual(self.search("pay"), [])
+        self.assertEqual(self.search("pay*"), [self.failed, self.pending])
+
+    def test_every_term_must_match(self):
+        self.assertEqual(self.search("pending"), [self.failed, self.pending])
+        self.assertEqual(self.search("pending delete"), [self.failed])
+
+    def test_action_ip_and_user_are_searchable(self):
+        for query in ("delete", "10.0.0.5", "treasurer@example.com", "asha"):
+            self.assertEqual(self.search(query), [self.failed], query)
+
+    def test_late_commits_within_the_lookback_are_indexed(self):
+        # An entry that committed after a higher id had already been indexed.
+        AuditLogToken.objects.filter(log=self.failed).delete()
+        with mock.patch("api_v1.utils.audit_track.AUDIT_INDEX_LOOKBACK", 0):
+            self.assertEqual(index_pending_audit_logs(), 0)
+        self.assertEqual(index_pending_audit_logs(), 1)
+        self.assertEqual(self.search("failed"), [self.failed])
+
+
+class OutboundQueueTests(TestCase):
+    def test_send_otp_is_queued(self):
+        response = self.client.post(reverse("send-otp"), {"phone": "9999999999"}, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        message = OutboundMessage.objects.get()
+        self.assertEqual((message.channel, message.recipients, message.status), ("sms", ["9999999999"], "queued"))
+
+    @mock.patch("api_v1.tasks.deliver_outbound_message.delay")
+    def test_requeue_skips_messages_waiting_for_a_retry(self, delay):
+        old = timezone.now() - timedelta(hours=1)
+        lost = OutboundMessage.objects.create(recipients=["a@example.com"], subject="Lost")
+        backing_off = OutboundMessage.objects.create(
+            recipients=["b@example.com"], subject="Retrying", attempts=6,
+            next_attempt_at=timezone.now() + timedelta(minutes=30),
+        )
+        OutboundMessage.objects.update(updated_at=old)
+        requeue_outbound_messages()
+        delay.assert_called_once_with(lost.pk)
+
+    @mock.patch("api_v1.tasks.deliver_outbound_batch.delay")
+    def test_batch_is_discarded_when_the_view_fails(self, delay):
+        @notification_batch()
+        def view(status_code):
+            queue_email("Approved", "Welcome", None, ["member@example.com"])
+            return Response(status=status_code)
+
+        view(400)
+        self.assertFalse(OutboundMessage.objects.exists())
+        view(200)
+        self.assertEqual(OutboundMessage.objects.get().subject, "Approved")
+
+
+class KeysetValuesTests(TestCase):
+    def test_pages_through_ties_in_order(self):
+        now = timezone.now()
+        for i in range(7):
+            AuditLog.objects.create(action="update", model_name="User", object_id=str(i))
+        # Several entries share a timestamp, so the id breaks ties across chunks.
+        AuditLog.objects.filter(object_id__in=["1", "2", "3", "4"]).update(timestamp=now)
+        expected = list(AuditLog.objects.order_by("-timestamp", "-id").values_list("id", flat=True))
+        rows = list(keyset_values(AuditLog.objects.all(), ("-timestamp", "-id"), 2, "id", "object_id"))
+        self.assertEqual([row["id"] for row in rows], expected)
+
+    def test_member_export_rows(self):
+        for i in range(5):
+            User.objects.create(email=f"m{i}@example.com", name=f"Member {i}")
+        queryset = member_report_queryset({})
+        self.assertEqual(
+            list(export_rows(queryset, ["email", "name"], chunk_size=2)),
+            list(queryset.values_list("email", "name")),
+        )
+
+
+class RolePermissionTests(TestCase):
+    def test_migration_moves_only_grants_every_member_holds(self):
+        migration = importlib.import_module("api_v1.migrations.0006_move_user_permissions_to_role_groups")
+        shared = Permission.objects.get(codename="view_payment")
+        partial = Permission.objects.get(codename="delete_payment")
+        role = Role.objects.create(name="Treasurer")
+        alice = User.objects.create(email="alice@example.com", name="Alice", role=role)
+        bob = User.objects.create(email="bob@example.com", name="Bob", role=role)
+        alice.user_permissions.add(shared, partial)
+        bob.user_permissions.add(shared)
+        AuditLog.objects.all().delete()
+
+        migration.move_user_permissions_to_role_groups(apps, SimpleNamespace(connection=connection))
+
+        role.refresh_from_db()
+        self.assertEqual(list(role.group.permissions.all()), [shared])
+        self.assertEqual(list(alice.user_permissions.all()), [partial])
+        self.assertFalse(bob.user_permissions.exists())
+        entry = AuditLog.objects.get(model_name="Role")
+        self.assertEqual(entry.changes["group_permissions_added"], ["view_payment"])
+        self.assertEqual(entry.changes["kept_on_users"], {"delete_payment": ["alice@example.com"]})
+
+        admin = User.objects.create(
+            email="admin@example.com", name="Admin", is_active=True, is_staff=True, is_superuser=True,
+        )
+        response = self.client.get(
+            reverse("permission-matrix"), {"models": "payment"},
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(admin)}",
+        )
+        rows = {row["id"]: row for row in response.data["permissions"]}
+        self.assertEqual(
+            (rows["payment-view_payment"]["roles"]["Treasurer"], rows["payment-view_payment"]["user_grants"]),
+            (True, {}),
+        )
+        self.assertEqual(
+            (rows["payment-delete_payment"]["roles"]["Treasurer"], rows["payment-delete_payment"]["user_grants"]),
+            (False, {"Treasurer": 1}),
+        )
+
+    def test_group_permission_changes_are_audited(self):
+        group = Group.objects.create(name="auditors")
+        permission = Permission.objects.get(codename="view_payment")
+        with self.captureOnCommitCallbacks(execute=True):
+            group.permissions.add(permission)
+        with self.captureOnCommitCallbacks(execute=True):
+            group.permissions.clear()
+        changes = AuditLog.objects.filter(model_name="Group", object_id=str(group.pk)).order_by("id")
+        self.assertEqual(
+            [entry.changes for entry in changes],
+            [{"permissions": {"added": ["view_payment"]}}, {"permissions": {"removed": ["view_payment"]}}],
+        )
+
+
+@mock.patch("api_v1.utils.pdf_report.PAGES_PER_CHUNK", 1)
+@mock.patch("api_v1.utils.pdf_report.os.cpu_count", return_value=8)
+class PdfReportWorkerTests(TestCase):
+    rows = [[f"Member {i}", f"member{i}@example.com"] for i in range(200)]
+
+    @override_settings(PDF_REPORT_MAX_WORKERS=1)
+    @mock.patch("api_v1.utils.pdf_report.ProcessPoolExecutor")
+    def test_pool_size_is_capped_by_the_setting(self, pool, cpu_count):
+        with tempfile.TemporaryFile() as file:
+            write_table_pdf(self.rows, ["name", "email"], file)
+        pool.assert_not_called()
+
+    @mock.patch("api_v1.utils.pdf_report.ProcessPoolExecutor")
+    def test_request_exports_render_in_process(self, pool, cpu_count):
+        export_to_tempfile(self.rows, ["name", "email"], "pdf").close()
+        pool.assert_not_called()
+
+    def test_pool_output_is_merged_in_page_order(self, cpu_count):
+        fields = ["name", "email"]
+        per_page = TableLayout(fields).rows_per_page
+        rows = [[f"Member {i}", f"member{i}@example.com"] for i in range(per_page * 4 + 1)]
+        with tempfile.TemporaryFile() as file:
+            with mock.patch("api_v1.utils.pdf_report.ProcessPoolExecutor", wraps=ProcessPoolExecutor) as pool:
+                write_table_pdf(rows, fields, file, workers=2)
+            self.assertEqual(pool.call_args.kwargs["max_workers"], 2)
+            file.seek(0)
+            pages = PdfReader(file).pages
+            self.assertEqual(len(pages), 5)
+            for number, page in enumerate(pages, start=1):
+                text = page.extract_text()
+                self.assertIn(f"Page {number}", text)
+                self.assertIn(f"Member {(number - 1) * per_page}", text)
+
+
+class MembershipIdTests(TestCase):
+    def test_imported_ids_move_the_counter_past_them(self):
+        self.assertEqual(allocate_membership_id("FM"), "FM-000001")
+        claim_membership_ids(["FM-000050", "FM-000010", "not-an-id"])
+        self.assertEqual(allocate_membership_id("FM"), "FM-000051")
+
+    def test_claim_seeds_a_new_counter_and_never_moves_it_back(self):
+        User.objects.create(email="old@example.com", name="Old", membership_id="AM-000020")
+        claim_membership_ids(["AM-000007"])
+        self.assertEqual(allocate_membership_id("AM"), "AM-000021")
+
+
+class ApplicationIdTests(TestCase):
+    def test_counters_map_to_unique_seven_digit_ids(self):
+        # Both ends of the space, where cycle walking takes over from the plain network.
+        counters = [*range(1, 10_001), *range(APPLICATION_ID_SPACE - 9_999, APPLICATION_ID_SPACE + 1)]
+        ids = {application_id_for(counter, secret="test-secret") for counter in counters}
+        self.assertEqual(len(ids), len(counters))
+        for app_id in ids:
+            self.assertRegex(app_id, r"^APP[1-9]\d{6}$")
+
+    def test_permutation_depends_on_the_secret(self):
+        first = [permute(n, secret="one") for n in range(20)]
+        self.assertNotEqual(first, [permute(n, secret="two") for n in range(20)])
+        self.assertEqual(first, [permute(n, secret="one") for n in range(20)])
+
+    def test_out_of_range_values_raise(self):
+        for number in (-1, APPLICATION_ID_SPACE):
+            with self.assertRaises(ValueError):
+                permute(number, secret="test-secret")
+        with self.assertRaises(ValueError):
+            application_id_for(APPLICATION_ID_SPACE + 1, secret="test-secret")
+
+    def test_new_ids_never_collide_with_six_digit_ids(self):
+        legacy = {f"APP{number}" for number in (100000, 543210, 999999)}
+        for app_id in legacy:
+            User.objects.create(email=f"{app_id}@example.com", name="Legacy", application_id=app_id)
+        SequenceCounter.objects.create(name=APPLICATION_ID_SEQUENCE, value=APPLICATION_ID_SPACE - 50)
+
+        issued = {User(email="new@example.com").generate_application_id() for _ in range(50)}
+        self.assertEqual(len(issued), 50)
+        self.assertFalse(issued & legacy)
+        for app_id in issued:
+            self.assertRegex(app_id, r"^APP\d{7}$")
+        with self.assertRaises(ValueError):
+            User(email="new@example.com").generate_application_id()
+
+
+class PermissionMatrixTests(TestCase):
+    def test_matrix_query_count_does_not_grow_with_roles_or_users(self):
+        admin = User.objects.create(
+            email="admin@example.com", name="Admin", is_active=True, is_staff=True, is_superuser=True,
+        )
+        permissions = list(Permission.objects.filter(content_type__app_label="api_v1"))
+        grants = []
+        for i in range(50):
+            group = Group.objects.create(name=f"role-{i}")
+            Role.objects.create(name=f"Role {i}", group=group)
+            grants += [Group.permissions.through(group=group, permission=p) for p in permissions[i % 2::2]]
+        Group.permissions.through.objects.bulk_create(grants)
+        User.objects.bulk_create(
+            [User(email=f"member{i}@example.com", name=f"Member {i}") for i in range(10000)], batch_size=1000,
+        )
+
+        # The user behind the token, the allowed models, the permissions, the
+        # roles, every (role, permission) grant in one join and the members'
+        # direct grants in one aggregate.
+        with self.assertNumQueries(6):
+            response = self.client.get(
+                reverse("permission-matrix"), HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(admin)}",
+            )
+        self.assertEqual(response.status_code, 200)
+        first = f"{permissions[0].content_type.model}-{permissions[0].codename}"
+        row = next(row for row in response.data["permissions"] if row["id"] == first)
+        self.assertTrue(row["roles"]["Role 0"])
+        self.assertFalse(row["roles"]["Role 1"])
+
+
+class ApplicationDossierTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create(
+            email="admin@example.com", name="Admin", membership_id="ADM1",
+            is_active=True, is_staff=True, is_superuser=True,
+        )
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {AccessToken.for_user(self.admin)}"}
+
+    def dossier(self, user_id):
+        return self.client.get(reverse("application-list"), {"user_id": user_id}, **self.auth)
+
+    def test_dossier_of_an_applicant(self):
+        applicant = User.objects.create(email="applicant@example.com", name="Applicant", is_active=True)
+        self.assertEqual(self.dossier(applicant.pk).status_code, 200)
+
+    def test_malformed_id_is_a_bad_request(self):
+        self.assertEqual(self.dossier("not-a-uuid").status_code, 400)
+
+    def test_only_applicants_are_served(self):
+        self.assertEqual(self.dossier(self.admin.pk).status_code, 404)
+
+    def test_dossier_query_count_does_not_grow_with_the_page(self):
+        degree = QualificationType.objects.create(name="B.Tech")
+        branch = QualificationBranch.objects.create(qualification_type=degree, name="ECE")
+        for i in range(5):
+            applicant = User.objects.create(email=f"applicant{i}@example.com", name=f"Applicant {i}", is_active=True)
+            for year in (2018, 2020):
+                Qualification.objects.create(
+                    user=applicant, qualification_type=degree, qualification_branch=branch,
+                    institute_name="Institute", year_of_passing=year, percentage_cgpa="8.0",
+                )
+            Experience.objects.create(user=applicant, organization_name="Org", start_date="2021-01-01")
+            Proposer.objects.create(
+                user=applicant, name="Proposer", membership_no="M1", mobile_no=9999999999, email="p@example.com",
+            )
+            Document.objects.create(user=applicant)
+            ApproveMembership.objects.create(applicant=applicant)
+
+        # The applicants, then one query each for qualifications, experiences,
+        # proposers, documents and approvals.
+        with self.assertNumQueries(6):
+            dossiers = [build_applicant_dossier(a) for a in with_dossier_relations(applicant_queryset())]
+        self.assertEqual(len(dossiers), 5)
+        self.assertEqual([q["branch"] for q in dossiers[0]["academic"]], ["ECE", "ECE"])
+
+
+class ReceiptNumberConcurrencyTests(TransactionTestCase):
+    THREADS = 8
+    PER_THREAD = 25
+
+    def setUp(self):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            # Shared-cache in-memory SQLite fails concurrent writers at once instead of making them wait.
+            self.skipTest("needs a database that queues concurrent writers")
+
+    def allocate_receipts(self, numbers, errors, start):
+        try:
+            start.wait()
+            for _ in range(self.PER_THREAD):
+                numbers.append(generate_receipt_number())
+        except Exception as e:
+            errors.append(e)
+        finally:
+            connections.close_all()
+
+    def test_concurrent_receipt_numbers_are_unique_and_gap_free(self):
+        numbers, errors = [], []
+        start = threading.Barrier(self.THREADS)
+        threads = [
+            threading.Thread(target=self.allocate_receipts, args=(numbers, errors, start))
+            for _ in range(self.THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        total = self.THREADS * self.PER_THREAD
+        self.assertEqual(len(set(numbers)), total)
+        self.assertEqual(sorted(int(number[1:]) for number in numbers), list(range(1, total + 1)))
@@ -69,6 +69,8 @@ urlpatterns = [
     path('membership/status/', ApprovalStatus.as_view(),name='approve-status'),
     
     path('members/reports/', MemberReportView.as_view(), name='export-members'),
+    path('members/reports/jobs/', ReportJobAPIView.as_view(), name='report-jobs'),
+    path('members/reports/jobs/<uuid:pk>/', ReportJobStatusAPIView.as_view(), name='report-job-status'),
     
 
 
@@ -91,9 +93,18 @@ urlpatterns = [
     path("roles/<uuid:role_id>/", RoleAPIView.as_view(), name="role"),
     path('roles/', RoleAPIView.as_view()),
     path('logs/', AdminLogListAPIView.as_view(), name='admin-logs'),
+    path('audit-logs/', AuditLogListAPIView.as_view(), name='audit-logs'),
     
+    path('payments/webhook/razorpay/', RazorpayWebhookAPIView.as_view(), name='razorpay-webhook'),
     path('payments/pending-verify/', PendingPaymentsAPIView.as_view(), name='payment-reciept'),
     path('payment-receipt/', PaymentReceiptsAPIView.as_view(), name='payment-reciept'),
+
+    path('notifications/', NotificationInboxAPIView.as_view(), name='notifications'),
+    path('notifications/unread-count/', NotificationUnreadCountAPIView.as_view(), name='notifications-unread-count'),
+    path('notifications/mark-read/', NotificationMarkReadAPIView.as_view(), name='notifications-mark-read'),
+    path('notifications/broadcast/', NotificationBroadcastAPIView.as_view(), name='notifications-broadcast'),
+    path('notifications/stream/ticket/', NotificationStreamTicketAPIView.as_view(), name='notifications-stream-ticket'),
+    path('notifications/stream/', notification_stream, name='notifications-stream'),
 ]
 
 
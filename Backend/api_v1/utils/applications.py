@@ -0,0 +1,302 @@
+# utils/applications.py
+from django.db.models import Case, CharField, OuterRef, Prefetch, Q, Subquery, Value, When
+from rest_framework.exceptions import ValidationError
+import uuid
+from ..models import ApplicationVerificationStatus, ApproveMembership, Document, Experience, Proposer, Qualification, User
+
+
+VERIFICATION_STEPS = [
+    "personal_details", "qualification", "experience", "proposer",
+    "membership", "documents", "payment", "eligibility",
+]
+
+ELIGIBILITY_STATUSES = ["Approved", "Rejected", "Pending"]
+
+DOCUMENT_FIELDS = [
+    ("Aadhar Front", "aadhar_front"),
+    ("Aadhar Back", "aadhar_back"),
+    ("Passport", "passport"),
+    ("Profile Photo", "profile_photo"),
+    ("Signature", "signature"),
+]
+
+
+def applicant_queryset():
+    """Users still in the review queue: active and not yet given a membership id."""
+    return User.objects.filter(is_active=True, membership_id__isnull=True)
+
+
+def parse_user_id(value, name="user_id"):
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        raise ValidationError({name: "Must be a valid UUID."})
+
+
+def with_dossier_relations(queryset):
+    """
+    Attach every relation the applicant dossier reads, so building a page of
+    dossiers costs a fixed number of queries regardless of its size.
+    """
+    return queryset.select_related(
+        "membership_fee", "applicationverificationstatus"
+    ).prefetch_related(
+        Prefetch(
+            "qualifications",
+            queryset=Qualification.objects.select_related("qualification_type", "qualification_branch").order_by("pk"),
+        ),
+        Prefetch("experiences", queryset=Experience.objects.order_by("pk")),
+        Prefetch("proposer", queryset=Proposer.objects.order_by("pk")),
+        Prefetch("document", queryset=Document.objects.order_by("pk")),
+        Prefetch("membership_application", queryset=ApproveMembership.objects.order_by("pk")),
+    )
+
+
+def with_eligibility_status(queryset):
+    """Annotate the status the dossier derives from the applicant's first approval record."""
+    first_approval = ApproveMembership.objects.filter(applicant=OuterRef("pk")).order_by("pk")
+    return queryset.annotate(
+        first_approval_approved=Subquery(first_approval.values("approved")[:1]),
+        first_approval_rejected=Subquery(first_approval.values("rejected")[:1]),
+    ).annotate(
+        eligibility_status=Case(
+            When(first_approval_approved=True, then=Value("Approved")),
+            When(first_approval_rejected=True, then=Value("Rejected")),
+            default=Value("Pending"),
+            output_field=CharField(),
+        )
+    )
+
+
+def _int_param(params, name):
+    value = params.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValidationError({name: "Must be an integer id."})
+
+
+def filter_applicants(queryset, params):
+    """Apply the review-queue filters from the query string in SQL."""
+    centre = _int_param(params, "centre")
+    if centre is not None:
+        queryset = queryset.filter(centre_id=centre)
+
+    sub_centre = _int_param(params, "sub_centre")
+    if sub_centre is not None:
+        queryset = queryset.filter(sub_centre_id=sub_centre)
+
+    step = params.get("step")
+    if step:
+        if step not in VERIFICATION_STEPS:
+            raise ValidationError({"step": f"Must be one of {', '.join(VERIFICATION_STEPS)}."})
+        step_status = params.get("step_status", "completed")
+        if step_status not in ("completed", "pending"):
+            raise ValidationError({"step_status": "Must be 'completed' or 'pending'."})
+        completed = Q(**{f"applicationverificationstatus__{step}": True})
+        queryset = queryset.filter(completed if step_status == "completed" else ~completed)
+
+    payment_status = params.get("payment_status")
+    if payment_status:
+        # Applicants without a recorded status are reported as "Pending" by the dossier.
+        condition = Q(payment_details__status=payment_status)
+        if payment_status == "Pending":
+            condition |= Q(payment_details__status__isnull=True)
+        queryset = queryset.filter(condition)
+
+    eligibility_status = params.get("eligibility_status")
+    if eligibility_status:
+        if eligibility_status not in ELIGIBILITY_STATUSES:
+            raise ValidationError({"eligibility_status": f"Must be one of {', '.join(ELIGIBILITY_STATUSES)}."})
+        queryset = with_eligibility_status(queryset).filter(eligibility_status=eligibility_status)
+
+    return queryset
+
+
+def with_summary_relations(queryset):
+    """Load only the columns the review-queue list renders."""
+    return with_eligibility_status(
+        queryset.select_related("membership_fee", "centre", "sub_centre", "applicationverificationstatus").only(
+            "id", "application_id", "name", "email", "mobile_number", "payment_details", "created_at",
+            "membership_fee__membership_type", "centre__name", "sub_centre__name",
+            *(f"applicationverificationstatus__{step}" for step in VERIFICATION_STEPS),
+        )
+    )
+
+
+def _first(items):
+    return items[0] if items else None
+
+
+def _latest_created(items):
+    return max((item.created_at for item in items), default=None)
+
+
+def _verification(applicant):
+    try:
+        return applicant.applicationverificationstatus
+    except ApplicationVerificationStatus.DoesNotExist:
+        return None
+
+
+def build_applicant_dossier(applicant):
+    """Serialise one applicant loaded through ``with_dossier_relations``."""
+    qualifications = list(applicant.qualifications.all())
+    experiences = list(applicant.experiences.all())
+    proposers = list(applicant.proposer.all())
+    doc = _first(applicant.document.all())
+    approval = _first(applicant.membership_application.all())
+    verification = _verification(applicant)
+
+    payment_details = applicant.payment_details or {}
+    transaction_id = payment_details.get("txn_id")
+    payment_status = payment_details.get("status", "Pending")
+
+    latest_qualification = _latest_created(qualifications)
+    latest_experience = _latest_created(experiences)
+
+    def step(name):
+        return getattr(verification, name) if verification else False
+
+    return {
+        "id": applicant.application_id,
+        "user_id": str(applicant.id),
+        "name": applicant.name,
+        "email": applicant.email,
+        "phone": applicant.mobile_number,
+        "address": f"{applicant.address1 or ''}, {applicant.address2 or ''}, {applicant.address3 or ''}".strip(', '),
+        "gender": applicant.gender,
+        "date_of_birth": str(applicant.date_of_birth) if applicant.date_of_birth else None,
+        "city": applicant.city,
+        "state": applicant.state,
+        "country": applicant.country,
+        "pincode": applicant.pincode,
+        "from_india": applicant.from_india,
+        "spouse_name": applicant.spouse_name,
+        "father_name": applicant.father_name,
+        "mother_name": applicant.mother_name,
+
+        "academic": [
+            {
+                "degree": q.qualification_type.name if q.qualification_type else "",
+                "branch": q.qualification_branch.name if q.qualification_branch else "",
+                "institute": q.institute_name,
+                "board": q.board_university,
+                "year": q.year_of_passing,
+                "percentage_cgpa": q.percentage_cgpa,
+                "document": q.document.url if q.document else ""
+            } for q in qualifications
+        ],
+        "experience": [
+            {
+                "organization_name": e.organization_name,
+                "job_title": e.job_title,
+                "employee_type": e.employee_type,
+                "work_type": e.work_type,
+                "start_date": str(e.start_date),
+                "end_date": str(e.end_date) if e.end_date else None,
+                "currently_working": e.currently_working,
+                "total_experience": e.total_experience,
+            } for e in experiences
+        ],
+        "proposers": [
+            {
+                "name": p.name,
+                "email": p.email,
+                "mobile_no": p.mobile_no,
+                "membership_no": p.membership_no,
+            } for p in proposers
+        ],
+        "membership": {
+            "plan": applicant.membership_fee.membership_type if applicant.membership_fee else "N/A",
+            "startDate": str(applicant.created_at.date())
+        },
+        "documents": [
+            {
+                "name": label,
+                "url": getattr(doc, field).url if doc and getattr(doc, field) else "",
+                "uploadedAt": str(doc.updated_at.date()) if doc and getattr(doc, field) else None
+            } for label, field in DOCUMENT_FIELDS
+        ],
+        "eligibility": {
+            "status": (
+                "Approved" if approval and approval.approved else
+                "Rejected" if approval and approval.rejected else
+                "Pending"
+            ),
+            "notes": applicant.eligibility or ""
+        },
+        "payment": {
+            "status": payment_status,
+            "transaction_id": transaction_id,
+            "amount": payment_details.get("amount"),
+            "method": payment_details.get("method"),
+            "timestamp": str(applicant.updated_at),
+        },
+        "applicationSteps": {
+            "personalDetails": {
+                "completed": step("personal_details"),
+                "timestamp": str(applicant.created_at)
+            },
+            "qualification": {
+                "completed": step("qualification"),
+                "timestamp": str(latest_qualification) if latest_qualification else None
+            },
+            "experience": {
+                "completed": step("experience"),
+                "timestamp": str(latest_experience) if latest_experience else None
+            },
+            "proposer": {
+                "completed": step("proposer"),
+                "timestamp": None
+            },
+            "membershipSelection": {
+                "completed": step("membership"),
+                "timestamp": str(applicant.updated_at)
+            },
+            "documents": {
+                "completed": step("documents"),
+                "timestamp": str(doc.updated_at) if doc else None
+            },
+            "eligibilityCheck": {
+                "completed": step("eligibility"),
+                "timestamp": str(approval.updated_at) if approval else None
+            },
+            "payment": {
+                "completed": step("payment"),
+                "timestamp": str(applicant.updated_at),
+                "status": payment_status,
+                "transactionId": transaction_id
+            },
+            "formPreview": {
+                "completed": False,
+                "timestamp": None
+            }
+        }
+    }
+
+
+def build_applicant_summary(applicant):
+    """Serialise one applicant loaded through ``with_summary_relations``."""
+    verification = _verification(applicant)
+    payment_details = applicant.payment_details or {}
+
+    return {
+        "id": applicant.application_id,
+        "user_id": str(applicant.id),
+        "name": applicant.name,
+        "email": applicant.email,
+        "phone": applicant.mobile_number,
+        "centre": applicant.centre.name if applicant.centre else None,
+        "sub_centre": applicant.sub_centre.name if applicant.sub_centre else None,
+        "membership": {
+            "plan": applicant.membership_fee.membership_type if applicant.membership_fee else "N/A",
+            "startDate": str(applicant.created_at.date())
+        },
+        "eligibility": {"status": applicant.eligibility_status},
+        "payment": {"status": payment_details.get("status", "Pending")},
+        "completedSteps": [step for step in VERIFICATION_STEPS if verification and getattr(verification, step)],
+        "created_at": str(applicant.created_at),
+    }
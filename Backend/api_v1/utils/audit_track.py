@@ -1,3 +1,29 @@
+import logging
+import re
+import threading
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+AUDIT_FLUSH_THRESHOLD = 500
+AUDIT_MAX_TOKENS = 100
+AUDIT_INDEX_LOOKBACK = 10000
+_TOKEN_RE = re.compile(r"[\w@.:-]+")
+# Structure of update diffs and empty values, present in nearly every entry.
+_STOP_TOKENS = {"from", "to", "none", "null"}
+_INDEXED_FIELDS = ("id", "action", "model_name", "object_id", "changes", "ip_address", "user__email", "user__name")
+
+# Models whose writes are never audited, by "app_label.ModelName".
+_excluded_models = {
+    "api_v1.AuditLog", "api_v1.AuditLogArchive", "api_v1.AuditLogToken", "api_v1.OutboundMessage",
+    "api_v1.ReportJob", "api_v1.DailyUserStat", "api_v1.DailyPaymentStat",
+    "api_v1.SequenceCounter", "api_v1.PaymentWebhookEvent",
+    "migrations.Migration",
+}
+
+_state = threading.local()
 
 
 def get_model_diff(old_obj, new_obj, exclude_fields=None):
@@ -15,3 +41,190 @@ def get_model_diff(old_obj, new_obj, exclude_fields=None):
             changes[field_name] = {"from": old_value, "to": new_value}
 
     return changes
+
+
+def exclude_from_audit(*models):
+    """Opt models (classes or "app_label.ModelName" labels) out of the audit trail."""
+    for model in models:
+        _excluded_models.add(model if isinstance(model, str) else model._meta.label)
+
+
+def is_audited(model):
+    label = model._meta.label
+    return label not in _excluded_models and label not in getattr(settings, "AUDIT_EXCLUDED_MODELS", ())
+
+
+def audit_values(instance):
+    """
+    Editable concrete field values keyed by field name, the same shape as
+    ``model_to_dict`` but without the per-relation queries for many-to-many fields.
+    """
+    return {
+        field.name: field.value_from_object(instance)
+        for field in instance._meta.concrete_fields
+        if field.editable
+    }
+
+
+def snapshot_audit_values(instance):
+    """
+    ``audit_values`` of the instance as it was loaded from the database, taken
+    from the snapshot ``Common.from_db`` keeps. ``None`` when there is no
+    snapshot or it misses a field (deferred loading), so the caller fetches.
+    """
+    snapshot = getattr(instance, "_loaded_values", None)
+    if snapshot is None:
+        return None
+    loaded = dict(zip(*snapshot))
+    values = {}
+    for field in instance._meta.concrete_fields:
+        if not field.editable:
+            continue
+        if field.attname not in loaded:
+            return None
+        values[field.name] = loaded[field.attname]
+    return values
+
+
+def _buffer():
+    if not hasattr(_state, "entries"):
+        _state.entries = []
+        _state.scopes = 0
+    return _state.entries
+
+
+def record_audit(**fields):
+    """
+    Queue an AuditLog entry. It joins the buffer only once the surrounding
+    transaction commits, so rolled-back writes leave no trail; outside an
+    ``audit_scope`` the buffer is written straight away.
+    """
+    from ..models import AuditLog
+
+    entry = AuditLog(**fields)
+    transaction.on_commit(lambda: _committed(entry))
+
+
+def _committed(entry):
+    entries = _buffer()
+    entries.append(entry)
+    if not _state.scopes or len(entries) >= AUDIT_FLUSH_THRESHOLD:
+        flush_audit_buffer()
+
+
+def flush_audit_buffer():
+    from ..models import AuditLog
+
+    entries = _buffer()
+    if not entries:
+        return
+    _state.entries = []
+    try:
+        if len(entries) == 1:
+            entries[0].save()
+        else:
+            AuditLog.objects.bulk_create(entries)
+    except Exception:
+        logger.exception(f"Failed to write {len(entries)} audit log entries")
+
+
+@contextmanager
+def audit_scope():
+    """Buffer committed audit entries until the block exits, then write them in one insert."""
+    _buffer()
+    _state.scopes += 1
+    try:
+        yield
+    finally:
+        _state.scopes -= 1
+        if not _state.scopes:
+            flush_audit_buffer()
+
+
+def _walk_text(value):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield str(key)
+            yield from _walk_text(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _walk_text(item)
+    elif value is not None:
+        yield str(value)
+
+
+def tokenize(text):
+    """Lower-cased search tokens; dotted or dashed values are kept whole and split."""
+    tokens = set()
+    for word in _TOKEN_RE.findall(text.lower()):
+        word = word.strip(".:-")
+        if not word:
+            continue
+        tokens.add(word[:64])
+        for part in re.split(r"[@.:-]+", word):
+            if part:
+                tokens.add(part[:64])
+    return tokens
+
+
+def audit_log_tokens(log):
+    """
+    Tokens an entry is findable by: its model, action, object id, IP address,
+    the acting user's email and name, and up to ``AUDIT_MAX_TOKENS`` more
+    from the keys and values in ``changes``.
+    """
+    tokens = {log.model_name.lower(), log.action.lower()}
+    for text in (log.object_id, log.ip_address, *((log.user.email, log.user.name) if log.user_id else ())):
+        tokens |= tokenize(text or "")
+    found = set()
+    for text in _walk_text(log.changes):
+        found |= tokenize(text)
+        if len(found) >= AUDIT_MAX_TOKENS:
+            break
+    return sorted(tokens - _STOP_TOKENS) + sorted(found - tokens - _STOP_TOKENS)[:AUDIT_MAX_TOKENS]
+
+
+def index_pending_audit_logs(batch_size=1000, max_batches=50):
+    """
+    Add search tokens for AuditLog rows written since the last run. Runs off
+    the request path (Celery beat) so the buffered audit insert stays a single
+    statement. Every entry gets at least its model token, so entries without
+    tokens are exactly the unindexed ones.
+    """
+    from django.db.models import Exists, Max, OuterRef
+    from ..models import AuditLog, AuditLogToken
+
+    indexed = 0
+    for _ in range(max_batches):
+        watermark = AuditLogToken.objects.aggregate(last=Max("log_id"))["last"] or 0
+        # Look back past the watermark for ids that committed out of order.
+        logs = list(
+            AuditLog.objects.filter(id__gt=max(watermark - AUDIT_INDEX_LOOKBACK, 0))
+            .exclude(Exists(AuditLogToken.objects.filter(log_id=OuterRef("id"))))
+            .select_related("user").order_by("id").only(*_INDEXED_FIELDS)[:batch_size]
+        )
+        if not logs:
+            break
+        AuditLogToken.objects.bulk_create(
+            [AuditLogToken(log_id=log.id, token=token) for log in logs for token in audit_log_tokens(log)],
+            batch_size=5000,
+        )
+        indexed += len(logs)
+    return indexed
+
+
+def search_audit_logs(queryset, query):
+    """
+    Narrow ``queryset`` to entries containing every term of ``query``; a
+    trailing ``*`` makes a term a prefix match.
+    """
+    from ..models import AuditLogToken
+
+    for term in query.lower().split():
+        prefix = term.endswith("*")
+        term = term.rstrip("*").strip(".:-")[:64]
+        if not term:
+            continue
+        tokens = AuditLogToken.objects.filter(**{"token__startswith" if prefix else "token": term})
+        queryset = queryset.filter(id__in=tokens.values("log_id"))
+    return queryset
@@ -0,0 +1,224 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+# Columns each rolled-up model contributes from, by model name.
+STAT_FIELDS = {
+    "User": ("created_at", "is_active"),
+    "Payment": ("created_at", "membership_type", "status", "amount"),
+}
+
+
+def stat_day(value):
+    return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+
+
+def stat_values(instance):
+    return {name: getattr(instance, name) for name in STAT_FIELDS[type(instance).__name__]}
+
+
+def saved_stat_values(instance, old_values, update_fields=None):
+    """The rolled-up columns as a save just wrote them: only ``update_fields`` change on a partial save."""
+    values = stat_values(instance)
+    if update_fields is None or old_values is None:
+        return values
+    saved = {instance._meta.get_field(name).name for name in update_fields}
+    return {name: values[name] if name in saved else old_values[name] for name in values}
+
+
+def loaded_stat_values(instance):
+    """
+    The rolled-up columns as they are in the database: as of this instance's
+    last save, else from the snapshot ``Common.from_db`` keeps, else fetched
+    when the instance was not loaded with all of them.
+    """
+    saved = getattr(instance, "_stat_saved_values", None)
+    if saved is not None:
+        return saved
+    names = STAT_FIELDS[type(instance).__name__]
+    snapshot = getattr(instance, "_loaded_values", None)
+    loaded = dict(zip(*snapshot)) if snapshot else {}
+    if all(name in loaded for name in names):
+        return {name: loaded[name] for name in names}
+    return type(instance)._base_manager.filter(pk=instance.pk).values(*names).first()
+
+
+def _contribution(model_name, values):
+    """The (stat model, bucket, counters) a row with these values adds to."""
+    from ..models import DailyPaymentStat, DailyUserStat
+
+    if values is None or values["created_at"] is None:
+        return None
+    day = stat_day(values["created_at"])
+    if model_name == "User":
+        return DailyUserStat, {"day": day}, {"joined": 1, "active": int(bool(values["is_active"]))}
+    return (
+        DailyPaymentStat,
+        {"day": day, "membership_type": values["membership_type"] or "", "status": values["status"]},
+        {"count": 1, "amount": Decimal(values["amount"] or 0)},
+    )
+
+
+def _bump(model, bucket, deltas):
+    updated = model.objects.filter(**bucket).update(**{name: F(name) + delta for name, delta in deltas.items()})
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**bucket, **deltas)
+    except IntegrityError:
+        # Created concurrently since the update above.
+        model.objects.filter(**bucket).update(**{name: F(name) + delta for name, delta in deltas.items()})
+
+
+def apply_stat_change(model_name, old_values, new_values):
+    """Move a row's contribution from its old bucket to its new one; ``None`` for a side that does not exist."""
+    old = _contribution(model_name, old_values)
+    new = _contribution(model_name, new_values)
+    if old == new:
+        return
+    if old is not None:
+        model, bucket, deltas = old
+        _bump(model, bucket, {name: -delta for name, delta in deltas.items()})
+    if new is not None:
+        model, bucket, deltas = new
+        _bump(model, bucket, deltas)
+
+
+def add_stat_rows(model_name, instances):
+    """
+    Count rows inserted with ``bulk_create``, which skips the save signals,
+    with one counter update per bucket.
+    """
+    totals = {}
+    for instance in instances:
+        stat = _contribution(model_name, stat_values(instance))
+        if stat is None:
+            continue
+        model, bucket, deltas = stat
+        key = (model, tuple(bucket.items()))
+        totals.setdefault(key, dict.fromkeys(deltas, 0))
+        for name, delta in deltas.items():
+            totals[key][name] += delta
+    for (model, bucket), deltas in totals.items():
+        _bump(model, dict(bucket), deltas)
+
+
+def rebuild_dashboard_stats(since=None, chunk_size=5000):
+    """
+    Recompute the rollups from the User and Payment tables, for every day or
+    from ``since`` on. Rows are streamed and counted in Python so the day
+    boundaries follow TIME_ZONE without database time zone tables.
+    """
+    from ..models import DailyPaymentStat, DailyUserStat, Payment, User
+
+    users = defaultdict(lambda: {"joined": 0, "active": 0})
+    payments = defaultdict(lambda: {"count": 0, "amount": Decimal(0)})
+
+    user_rows = User.objects.all()
+    payment_rows = Payment.objects.all()
+    if since is not None:
+        start = timezone.make_aware(datetime.combine(since, time.min))
+        user_rows = user_rows.filter(created_at__gte=start)
+        payment_rows = payment_rows.filter(created_at__gte=start)
+
+    for values in user_rows.values(*STAT_FIELDS["User"]).iterator(chunk_size=chunk_size):
+        stat = _contribution("User", values)
+        if stat:
+            _, bucket, deltas = stat
+            for name, delta in deltas.items():
+                users[bucket["day"]][name] += delta
+    for values in payment_rows.values(*STAT_FIELDS["Payment"]).iterator(chunk_size=chunk_size):
+        stat = _contribution("Payment", values)
+        if stat:
+            _, bucket, deltas = stat
+            for name, delta in deltas.items():
+                payments[tuple(bucket.values())][name] += delta
+
+    with transaction.atomic():
+        stale_users = DailyUserStat.objects.all()
+        stale_payments = DailyPaymentStat.objects.all()
+        if since is not None:
+            stale_users = stale_users.filter(day__gte=since)
+            stale_payments = stale_payments.filter(day__gte=since)
+        stale_users.delete()
+        stale_payments.delete()
+        DailyUserStat.objects.bulk_create(
+            [DailyUserStat(day=day, **counters) for day, counters in users.items()], batch_size=1000,
+        )
+        DailyPaymentStat.objects.bulk_create(
+            [
+                DailyPaymentStat(day=day, membership_type=membership_type, status=status, **counters)
+                for (day, membership_type, status), counters in payments.items()
+            ],
+            batch_size=1000,
+        )
+    return len(users), len(payments)
+
+
+def _today_start():
+    return timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+
+
+def dashboard_stats():
+    """
+    Dashboard figures from the rollups of past days plus a live aggregate of
+    today's rows, so the signal-maintained current day never has to be trusted
+    and the expensive scans only ever touch one day of data.
+    """
+    from ..models import DailyPaymentStat, DailyUserStat, Payment, User
+
+    today = timezone.localdate()
+    first_of_this_month = today.replace(day=1)
+    first_of_last_month = (first_of_this_month - timedelta(days=1)).replace(day=1)
+    today_start = _today_start()
+
+    past_users = DailyUserStat.objects.filter(day__lt=today)
+    totals = past_users.aggregate(joined=Sum("joined"), active=Sum("active"))
+    todays_users = User.objects.filter(created_at__gte=today_start)
+    joined_today = todays_users.count()
+    active_today = todays_users.filter(is_active=True).count()
+
+    last_month_users = past_users.filter(
+        day__gte=first_of_last_month, day__lt=first_of_this_month,
+    ).aggregate(total=Sum("joined"))["total"] or 0
+    new_users_this_month = (
+        past_users.filter(day__gte=first_of_this_month).aggregate(total=Sum("joined"))["total"] or 0
+    ) + joined_today
+
+    breakdown = defaultdict(lambda: {"total_amount": Decimal(0), "count": 0})
+    past_payments = (
+        DailyPaymentStat.objects.filter(day__lt=today)
+        .values("membership_type", "status")
+        .annotate(total_amount=Sum("amount"), count=Sum("count"))
+    )
+    todays_payments = (
+        Payment.objects.filter(created_at__gte=today_start)
+        .values("membership_type", "status")
+        .annotate(total_amount=Sum("amount"), count=Count("id"))
+    )
+    for row in list(past_payments) + list(todays_payments):
+        key = (row["membership_type"] or None, row["status"])
+        breakdown[key]["total_amount"] += row["total_amount"] or 0
+        breakdown[key]["count"] += row["count"] or 0
+
+    revenue_breakdown = [
+        {"membership_type": membership_type, "status": status, **values}
+        for (membership_type, status), values in sorted(
+            breakdown.items(), key=lambda item: (item[0][0] or "", item[0][1]),
+        )
+        if values["count"]
+    ]
+    total_revenue = sum(row["total_amount"] for row in revenue_breakdown if row["status"] == "Success")
+
+    return {
+        "total_users": (totals["joined"] or 0) + joined_today,
+        "active_users": (totals["active"] or 0) + active_today,
+        "total_revenue": total_revenue,
+        "last_month_users": last_month_users,
+        "new_users_this_month": new_users_this_month,
+        "revenue_breakdown": revenue_breakdown,
+    }
@@ -1,95 +1,125 @@
-import csv, io, os, xlsxwriter
-from django.conf import settings
+import csv, tempfile, xlsxwriter
 from datetime import datetime
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.units import inch
+from functools import partial
+from django.db.models import Q
+from .pdf_report import write_table_pdf
 
+EXPORT_CHUNK_SIZE = 2000
 
+EXPORT_FORMATS = {
+    "csv": ("csv", "text/csv"),
+    "excel": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "pdf": ("pdf", "application/pdf"),
+}
 
 
 def get_filename(ext):
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    folder = os.path.join(settings.MEDIA_ROOT, "reports")
-    os.makedirs(folder, exist_ok=True)
-    filename = f"members_{timestamp}.{ext}"
-    filepath = os.path.join(folder, filename)
-    return filepath, filename
-
-
-def generate_csv_response(queryset, fields):
-    buffer = io.StringIO()
-    writer = csv.writer(buffer)
+    return f"members_{timestamp}.{ext}"
+
+
+def _after(ordering, key):
+    """Rows that sort after ``key`` under ``ordering``: (a > x) or (a = x and b > y) ..."""
+    condition = Q()
+    for i, name in enumerate(ordering):
+        equal = {earlier.lstrip("-"): value for earlier, value in zip(ordering[:i], key[:i])}
+        lookup = f"{name.lstrip('-')}__{'lt' if name.startswith('-') else 'gt'}"
+        condition |= Q(**equal, **{lookup: key[i]})
+    return condition
+
+
+def keyset_values(queryset, ordering, chunk_size, *fields, **expressions):
+    """
+    ``queryset.values(*fields, **expressions)`` in ``ordering``, fetched
+    ``chunk_size`` rows per query, each query starting after the last row of
+    the previous one. Unlike ``iterator()``, this keeps memory flat on MySQL,
+    whose client library buffers a query's whole result set. The ordering
+    columns must be non-null and unique together; they are added to the rows
+    when not among ``fields``.
+    """
+    keys = [name.lstrip("-") for name in ordering]
+    rows = queryset.order_by(*ordering).values(*fields, *(key for key in keys if key not in fields), **expressions)
+    chunk = list(rows[:chunk_size])
+    while chunk:
+        yield from chunk
+        if len(chunk) < chunk_size:
+            return
+        chunk = list(rows.filter(_after(ordering, [chunk[-1][key] for key in keys]))[:chunk_size])
+
+
+def export_rows(queryset, fields, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Row tuples of ``fields`` in the queryset's ordering, read with
+    ``keyset_values`` instead of as model instances. The primary key is
+    appended to the ordering so the keyset is unique.
+    """
+    ordering = tuple(queryset.query.order_by)
+    if not any(name.lstrip("-") in ("pk", "id") for name in ordering):
+        ordering += ("pk",)
+    for row in keyset_values(queryset, ordering, chunk_size, *fields):
+        yield tuple(row[field] for field in fields)
+
+
+def _cell(value):
+    return "" if value is None else str(value)
+
+
+class Echo:
+    """File-like object whose ``write`` hands the value back, for feeding csv.writer output to a generator."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows, fields):
+    """Yield the CSV export line by line, ready for a ``StreamingHttpResponse``."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([_cell(value) for value in row])
+
+
+def write_csv(rows, fields, file):
+    writer = csv.writer(file)
     writer.writerow(fields)
+    for row in rows:
+        writer.writerow([_cell(value) for value in row])
 
-    for obj in queryset:
-        writer.writerow([getattr(obj, field, "") for field in fields])
-
-    buffer.seek(0)
-    byte_buffer = io.BytesIO(buffer.getvalue().encode('utf-8'))
-    path, filename = get_filename("csv")
-    with open(path, "wb") as f:
-        f.write(byte_buffer.getvalue())
-
-    return byte_buffer, filename
 
-
-def generate_excel_response(queryset, fields):
-    output = io.BytesIO()
-    workbook = xlsxwriter.Workbook(output, {'in_memory': True})
+def write_excel(rows, fields, file):
+    # constant_memory flushes each row to disk once the next one starts, so
+    # the workbook never holds more than a single row.
+    workbook = xlsxwriter.Workbook(file, {"constant_memory": True})
     sheet = workbook.add_worksheet()
 
-    for i, field in enumerate(fields):
-        sheet.write(0, i, field)
+    for c, field in enumerate(fields):
+        sheet.write_string(0, c, field)
 
-    for r, obj in enumerate(queryset, start=1):
-        for c, field in enumerate(fields):
-            sheet.write(r, c, str(getattr(obj, field, "")))
+    for r, row in enumerate(rows, start=1):
+        for c, value in enumerate(row):
+            sheet.write_string(r, c, _cell(value))
 
     workbook.close()
-    output.seek(0)
-    path, filename = get_filename("xlsx")
-    with open(path, "wb") as f:
-        f.write(output.getvalue())
-
-    return output, filename
-
-
-def generate_pdf_response(queryset, fields):
-    buffer = io.BytesIO()
-    p = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-
-    x_start = inch
-    y = height - inch
-    line_height = 14
-    section_spacing = 10
-
-    for index, obj in enumerate(queryset, start=1):
-        p.setFont("Helvetica-Bold", 12)
-        p.drawString(x_start, y, f"Member {index}")
-        y -= line_height
-
-        p.setFont("Helvetica", 10)
-        for field in fields:
-            label = field.replace('_', ' ').capitalize()
-            value = str(getattr(obj, field, ''))
-            p.drawString(x_start, y, f"{label}: {value}")
-            y -= line_height
-
-            if y < inch:
-                p.showPage()
-                y = height - inch
-
-        y -= section_spacing
-        if y < inch:
-            p.showPage()
-            y = height - inch
-
-    p.save()
-    buffer.seek(0)
-    
-    path, filename = get_filename("pdf")
-    with open(path, "wb") as f:
-        f.write(buffer.getvalue())
-    
+
+
+def write_pdf(rows, fields, file, workers=None):
+    write_table_pdf(([_cell(value) for value in row] for row in rows), fields, file, workers=workers)
+
+
+def export_to_tempfile(rows, fields, export_format):
+    """
+    Write an Excel or PDF export to an anonymous temporary file and return it
+    rewound. The file is removed as soon as it is closed, which
+    ``FileResponse`` does once the download has been sent. PDFs are drawn
+    in-process: a web worker must not start a process pool per request, so
+    large reports go through the report job instead.
+    """
+    writer = {"excel": write_excel, "pdf": partial(write_pdf, workers=1)}[export_format]
+    file = tempfile.TemporaryFile()
+    try:
+        writer(rows, fields, file)
+        file.seek(0)
+    except Exception:
+        file.close()
+        raise
+    return file
@@ -0,0 +1,179 @@
+"""
+In-memory stand-in for ``razorpay.Client`` for local development and
+exercising the payment flows without the network. Enable it with
+``PAYMENT_GATEWAY_CLIENT = "api_v1.utils.fake_gateway.FakeRazorpayClient"``.
+
+State is shared by every instance in the process, so orders created through
+the views can be paid, failed and delivered as webhooks from a shell::
+
+    gateway = FakeRazorpayClient()
+    payment = gateway.capture(order_id)
+    body, headers = webhook_delivery("payment.captured", payment)
+"""
+import hashlib
+import hmac
+import itertools
+import json
+import threading
+import uuid
+from django.conf import settings
+from .payment_gateway import webhook_signature
+
+_lock = threading.Lock()
+_orders = {}
+_payments = {}
+_refunds = {}
+_ids = itertools.count(1)
+
+
+def _new_id(prefix):
+    return f"{prefix}_fake{next(_ids):010d}"
+
+
+class FakeGatewayError(Exception):
+    pass
+
+
+class _Orders:
+    def create(self, data):
+        order = {
+            "id": _new_id("order"),
+            "entity": "order",
+            "amount": data["amount"],
+            "amount_paid": 0,
+            "currency": data.get("currency", "INR"),
+            "receipt": data.get("receipt"),
+            "status": "created",
+        }
+        with _lock:
+            _orders[order["id"]] = order
+        return dict(order)
+
+    def fetch(self, order_id):
+        try:
+            return dict(_orders[order_id])
+        except KeyError:
+            raise FakeGatewayError(f"The id provided does not exist: {order_id}")
+
+    def payments(self, order_id):
+        self.fetch(order_id)
+        items = [dict(p) for p in _payments.values() if p["order_id"] == order_id]
+        return {"entity": "collection", "count": len(items), "items": items}
+
+
+class _Payments:
+    def fetch(self, payment_id):
+        try:
+            return dict(_payments[payment_id])
+        except KeyError:
+            raise FakeGatewayError(f"The id provided does not exist: {payment_id}")
+
+    def refund(self, payment_id, data=None):
+        payment = self.fetch(payment_id)
+        if payment["status"] != "captured":
+            raise FakeGatewayError("Only captured payments can be refunded")
+        refund = {
+            "id": _new_id("rfnd"),
+            "entity": "refund",
+            "payment_id": payment_id,
+            "amount": (data or {}).get("amount", payment["amount"]),
+            "currency": payment["currency"],
+            "status": "processed",
+        }
+        with _lock:
+            _refunds[refund["id"]] = refund
+            _payments[payment_id]["status"] = "refunded"
+        return dict(refund)
+
+
+class _Refunds:
+    def fetch(self, refund_id):
+        try:
+            return dict(_refunds[refund_id])
+        except KeyError:
+            raise FakeGatewayError(f"The id provided does not exist: {refund_id}")
+
+
+class _Utility:
+    def verify_payment_signature(self, params):
+        import razorpay
+
+        expected = hmac.new(
+            settings.RAZORPAY_KEY_SECRET.encode(),
+            f"{params['razorpay_order_id']}|{params['razorpay_payment_id']}".encode(),
+            hashlib.sha256,
+        ).hexdigest()
+        if not hmac.compare_digest(expected, params.get("razorpay_signature") or ""):
+            raise razorpay.errors.SignatureVerificationError("Razorpay Signature Verification Failed")
+        return True
+
+
+class FakeRazorpayClient:
+    """The subset of ``razorpay.Client`` the views use, plus helpers to move orders along."""
+
+    def __init__(self, *args, **kwargs):
+        self.order = _Orders()
+        self.payment = _Payments()
+        self.refund = _Refunds()
+        self.utility = _Utility()
+
+    def _attempt(self, order_id, status, **extra):
+        order = self.order.fetch(order_id)
+        payment = {
+            "id": _new_id("pay"),
+            "entity": "payment",
+            "order_id": order_id,
+            "amount": order["amount"],
+            "currency": order["currency"],
+            "status": status,
+            **extra,
+        }
+        with _lock:
+            _payments[payment["id"]] = payment
+            if status == "captured":
+                _orders[order_id].update(status="paid", amount_paid=order["amount"])
+            else:
+                _orders[order_id]["status"] = "attempted"
+        return dict(payment)
+
+    def capture(self, order_id):
+        """Simulate the customer paying the order."""
+        return self._attempt(order_id, "captured")
+
+    def fail(self, order_id, reason="payment_failed"):
+        """Simulate a declined payment attempt on the order."""
+        return self._attempt(order_id, "failed", error_reason=reason)
+
+    def checkout_signature(self, payment):
+        """The ``razorpay_signature`` checkout hands the browser for a payment."""
+        return hmac.new(
+            settings.RAZORPAY_KEY_SECRET.encode(),
+            f"{payment['order_id']}|{payment['id']}".encode(),
+            hashlib.sha256,
+        ).hexdigest()
+
+    @staticmethod
+    def reset():
+        with _lock:
+            _orders.clear()
+            _payments.clear()
+            _refunds.clear()
+
+
+def webhook_delivery(event, payment, secret=None, event_id=None):
+    """
+    Body and signed headers of a webhook delivery for ``payment`` (as
+    returned by ``capture``/``fail``). Headers are in WSGI form, ready to
+    pass as extra arguments to Django's test client.
+    """
+    body = json.dumps({
+        "entity": "event",
+        "event": event,
+        "contains": ["payment"],
+        "payload": {"payment": {"entity": payment}},
+    }).encode()
+    headers = {
+        "HTTP_X_RAZORPAY_SIGNATURE": webhook_signature(body, secret or settings.RAZORPAY_WEBHOOK_SECRET),
+        "HTTP_X_RAZORPAY_EVENT_ID": event_id or f"evt_{uuid.uuid4().hex[:14]}",
+    }
+    return body, headers
@@ -0,0 +1,48 @@
+from .sequences import advance_to, reserve_values
+
+
+def membership_sequence(prefix):
+    return f"membership:{prefix}"
+
+
+def _highest_membership_number(prefix):
+    """Largest number already issued under ``prefix``; seeds the counter on first use."""
+    from ..models import User
+
+    highest = 0
+    issued = User.objects.filter(membership_id__startswith=f"{prefix}-").values_list("membership_id", flat=True)
+    for membership_id in issued.iterator(chunk_size=5000):
+        try:
+            highest = max(highest, int(membership_id[len(prefix) + 1:]))
+        except ValueError:
+            continue
+    return highest
+
+
+def allocate_membership_ids(prefix, count=1):
+    """
+    Reserve ``count`` consecutive membership ids (``<prefix>-000123``) in one
+    locked counter update. No existence probes: every id comes from the
+    counter, which starts after the highest id issued before it existed.
+    """
+    first = reserve_values(membership_sequence(prefix), count, initial=lambda: _highest_membership_number(prefix))
+    return [f"{prefix}-{number:06d}" for number in range(first, first + count)]
+
+
+def allocate_membership_id(prefix):
+    return allocate_membership_ids(prefix)[0]
+
+
+def claim_membership_ids(membership_ids):
+    """
+    Advance each prefix's counter past explicitly supplied ids
+    (``<prefix>-<number>``, e.g. from an import), so later allocations do
+    not collide with them. Call inside the transaction that saves them.
+    """
+    highest = {}
+    for membership_id in membership_ids:
+        prefix, _, number = (membership_id or "").rpartition("-")
+        if prefix and number.isdigit():
+            highest[prefix] = max(highest.get(prefix, 0), int(number))
+    for prefix, number in highest.items():
+        advance_to(membership_sequence(prefix), number, initial=lambda prefix=prefix: _highest_membership_number(prefix))
@@ -1,29 +1,136 @@
 # utils/notifications.py
 
-from django.core.mail import send_mail
+from itertools import islice
 from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
 from api_v1.models import Notification
+from api_v1.thread import get_request_ip, get_request_user
+from .audit_track import record_audit
+from .outbound import notification_batch, queue_email
+from .pubsub import get_broker, publish_to_users, user_channel
 
+BROADCAST_CHUNK_SIZE = 1000
+UNREAD_COUNT_TIMEOUT = 300
+
+
+def _unread_count_key(user_id):
+    return f"notifications:unread:{user_id}"
+
+
+def get_unread_count(user_id):
+    key = _unread_count_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(recipient_id=user_id, is_read=False).count()
+        cache.set(key, count, UNREAD_COUNT_TIMEOUT)
+    return count
+
+
+def invalidate_unread_count(*user_ids):
+    keys = [_unread_count_key(user_id) for user_id in user_ids]
+    cache.delete_many(keys)
+    # A read before the change commits would cache the old count again.
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def notification_event(notification):
+    return {
+        "id": notification.id,
+        "message": notification.message,
+        "sender": str(notification.sender_id) if notification.sender_id else None,
+        "is_read": notification.is_read,
+        "timestamp": notification.timestamp.isoformat() if notification.timestamp else None,
+    }
+
+
+def publish_notification(notification):
+    """Push a new notification to the recipient's open streams once it is committed."""
+    if not get_broker().has_subscribers(user_channel(notification.recipient_id)):
+        return
+    event = notification_event(notification)
+    transaction.on_commit(lambda: publish_to_users([notification.recipient_id], "notification", event))
+
+
+def publish_bulk_created(notifications):
+    """
+    ``publish_notification`` for rows saved with ``bulk_create``. Backends
+    that do not return ids from bulk inserts (MySQL) leave ``id`` unset, so
+    for recipients with an open stream it is read back: the newest matching
+    row for each, which this transaction just inserted.
+    """
+    channels = get_broker().subscribed({user_channel(n.recipient_id) for n in notifications})
+    live = [n for n in notifications if user_channel(n.recipient_id) in channels]
+    missing = [n for n in live if n.pk is None]
+    if missing:
+        ids = dict(
+            Notification.objects.filter(
+                recipient_id__in={n.recipient_id for n in missing},
+                sender_id=missing[0].sender_id,
+                message=missing[0].message,
+            ).values("recipient_id").annotate(last_id=Max("id")).values_list("recipient_id", "last_id")
+        )
+        for notification in missing:
+            notification.pk = ids.get(notification.recipient_id)
+    for notification in live:
+        if notification.pk is not None:
+            publish_notification(notification)
 
 
 def notify_user(user, message,subject=None):
     Notification.objects.create(recipient=user, message=message)
     if user.email:
-        send_mail(
+        queue_email(
             subject=subject or "Notification from Membership System",
             message=message,
             from_email=settings.DEFAULT_FROM_EMAIL,
             recipient_list=[user.email],
-            fail_silently=True  
         )
         
         
 
-def notify_users_for_role(role, message):
-    users = role.roles.all()  
-    for user in users:
-        Notification.objects.create(
-            recipient=user,
-            message=message
-        )
+def notify_users_for_role(role, message, sender=None, chunk_size=BROADCAST_CHUNK_SIZE):
+    """
+    Broadcast an in-app notification to every user of ``role``.
+
+    Recipients are streamed with ``iterator()`` and inserted with
+    ``bulk_create`` one chunk at a time, so neither the recipient list nor the
+    rows are held in memory and no per-row save signals fire. A single
+    summary AuditLog entry (role, recipient count, message) stands in for
+    the per-row audit trail. Returns the number of notifications created.
+    """
+    recipient_ids = role.roles.values_list("id", flat=True).iterator(chunk_size=chunk_size)
+    sender_id = getattr(sender, "pk", None)
+    created = 0
+
+    with transaction.atomic():
+        while True:
+            chunk = [
+                Notification(recipient_id=recipient_id, sender_id=sender_id, message=message)
+                for recipient_id in islice(recipient_ids, chunk_size)
+            ]
+            if not chunk:
+                break
+            Notification.objects.bulk_create(chunk)
+            created += len(chunk)
+            invalidate_unread_count(*(notification.recipient_id for notification in chunk))
+            publish_bulk_created(chunk)
+
+        if created:
+            user = get_request_user()
+            record_audit(
+                user=user if getattr(user, "pk", None) else None,
+                action="create",
+                model_name=Notification.__name__,
+                object_id=f"role:{role.pk}",
+                changes={
+                    "summary": f"Broadcast notification to {created} users of role '{role.name}'",
+                    "role": str(role.pk),
+                    "recipients": created,
+                    "message": message,
+                },
+                ip_address=get_request_ip(),
+            )
 
+    return created
@@ -0,0 +1,147 @@
+# utils/outbound.py
+import logging
+import threading
+import uuid
+from functools import wraps
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.db import transaction
+from django.utils import timezone
+from ..models import OutboundMessage
+
+logger = logging.getLogger(__name__)
+
+_batch = threading.local()
+
+
+def _dispatch(message):
+    from ..tasks import deliver_outbound_message
+
+    # A broker outage must not fail the request; the row stays queued and
+    # requeue_outbound_messages picks it up later.
+    transaction.on_commit(lambda: deliver_outbound_message.delay(message.pk), robust=True)
+
+
+def _enqueue(outbound):
+    pending = getattr(_batch, "messages", None)
+    if pending is not None:
+        pending.append(outbound)
+        return outbound
+    outbound.save()
+    _dispatch(outbound)
+    return outbound
+
+
+class NotificationBatch:
+    """
+    Collect every message queued inside the block and hand them to a single
+    task that sends them over one SMTP connection after commit. Nested
+    batches join the outermost one. Messages are dropped if the block raises,
+    and, when decorating a view, if it returns a non-2xx response.
+    """
+
+    def __enter__(self):
+        self._outermost = getattr(_batch, "messages", None) is None
+        if self._outermost:
+            _batch.messages = []
+        self._start = len(_batch.messages)
+        return self
+
+    def discard(self):
+        """Drop the messages queued since this block was entered."""
+        del _batch.messages[self._start:]
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self._outermost:
+            return
+        messages = _batch.messages
+        _batch.messages = None
+        if exc_type is None and messages:
+            _save_batch(messages)
+
+    def __call__(self, func):
+        @wraps(func)
+        def inner(*args, **kwargs):
+            with NotificationBatch() as batch:
+                response = func(*args, **kwargs)
+                if not 200 <= getattr(response, "status_code", 200) < 300:
+                    batch.discard()
+                return response
+        return inner
+
+
+def notification_batch():
+    """Usable as a context manager or as a decorator: ``@notification_batch()``."""
+    return NotificationBatch()
+
+
+def _save_batch(messages):
+    from ..tasks import deliver_outbound_batch
+
+    batch_id = uuid.uuid4()
+    for outbound in messages:
+        outbound.batch = batch_id
+    OutboundMessage.objects.bulk_create(messages)
+    transaction.on_commit(lambda: deliver_outbound_batch.delay(str(batch_id)), robust=True)
+
+
+def queue_email(subject, message, from_email, recipient_list, html_message=None):
+    """
+    Record an email and hand it to the outbound workers once the surrounding
+    transaction commits. Takes the same arguments as ``send_mail``.
+    """
+    recipients = [email for email in recipient_list if email]
+    if not recipients:
+        return None
+    return _enqueue(OutboundMessage(
+        channel="email",
+        recipients=recipients,
+        subject=subject or "",
+        body=message or "",
+        html_body=html_message,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+    ))
+
+
+def queue_sms(phone, message, template_id=None):
+    """Record an SMS and hand it to the outbound workers once the transaction commits."""
+    return _enqueue(OutboundMessage(
+        channel="sms",
+        recipients=[str(phone)],
+        body=message,
+        template_id=template_id,
+    ))
+
+
+def send_outbound_message(outbound, connection=None):
+    """Deliver one message over its channel. Raises on any transport failure."""
+    if outbound.channel == "sms":
+        from ..services import _send_sms
+
+        response = _send_sms(outbound.recipients[0], outbound.body, outbound.template_id)
+        if response.get("status") == "error":
+            raise RuntimeError(response.get("message"))
+        return
+
+    email = EmailMultiAlternatives(
+        subject=outbound.subject,
+        body=outbound.body,
+        from_email=outbound.from_email,
+        to=outbound.recipients,
+        connection=connection,
+    )
+    if outbound.html_body:
+        if outbound.body:
+            email.attach_alternative(outbound.html_body, "text/html")
+        else:
+            email.body = outbound.html_body
+            email.content_subtype = "html"
+    email.send()
+
+
+def claim_outbound_message(message_id):
+    """Atomically move a queued message to ``sending`` so only one worker delivers it."""
+    claimed = OutboundMessage.objects.filter(pk=message_id, status="queued").update(
+        status="sending", updated_at=timezone.now()
+    )
+    return OutboundMessage.objects.get(pk=message_id) if claimed else None
@@ -0,0 +1,228 @@
+import hashlib
+import hmac
+import json
+import logging
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_BATCH_SIZE = 500
+# Webhook event -> Payment status it moves the order to.
+WEBHOOK_TRANSITIONS = {
+    "payment.captured": "Success",
+    "order.paid": "Success",
+    "payment.failed": "Failed",
+}
+# Statuses a payment may move to; a captured payment is final, a failed
+# attempt can still be followed by a successful one on the same order.
+ALLOWED_TRANSITIONS = {
+    "Pending": {"Success", "Failed"},
+    "Failed": {"Success"},
+    "Success": set(),
+}
+
+
+def get_gateway_client():
+    """
+    The payment gateway client: ``razorpay.Client`` with the configured keys,
+    or the class named by PAYMENT_GATEWAY_CLIENT (e.g. the local fake in
+    ``api_v1.utils.fake_gateway``).
+    """
+    path = getattr(settings, "PAYMENT_GATEWAY_CLIENT", None)
+    if path:
+        return import_string(path)()
+    import razorpay
+
+    return razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
+
+
+def webhook_signature(body, secret):
+    return hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def verify_webhook_signature(body, signature, secret=None):
+    secret = secret or getattr(settings, "RAZORPAY_WEBHOOK_SECRET", None)
+    if not secret or not signature:
+        return False
+    return hmac.compare_digest(webhook_signature(body, secret), signature)
+
+
+def parse_webhook(body, event_id=None):
+    """
+    The fields of a webhook delivery worth indexing. Deliveries without an
+    ``X-Razorpay-Event-Id`` header are identified by a hash of their body.
+    Raises ``ValueError`` for anything that is not a webhook payload.
+    """
+    payload = json.loads(body)
+    if not isinstance(payload, dict) or not payload.get("event"):
+        raise ValueError("Not a webhook payload")
+    entities = payload.get("payload") or {}
+    payment = (entities.get("payment") or {}).get("entity") or {}
+    order = (entities.get("order") or {}).get("entity") or {}
+    return {
+        "event_id": event_id or hashlib.sha256(body).hexdigest(),
+        "event": payload["event"][:50],
+        "order_id": payment.get("order_id") or order.get("id"),
+        "payment_id": payment.get("id"),
+        "payload": payload,
+    }
+
+
+def record_webhook_event(fields):
+    """
+    Store a delivery unless its event id was seen before, and schedule the
+    batch task. The short countdown lets a burst of deliveries share a batch.
+    Returns ``(event, created)``.
+    """
+    from ..models import PaymentWebhookEvent
+    from ..tasks import apply_payment_webhooks
+
+    event_id = fields.pop("event_id")
+    event, created = PaymentWebhookEvent.objects.get_or_create(event_id=event_id, defaults=fields)
+    if created:
+        # A broker outage must not fail the delivery; the beat schedule picks the event up.
+        transaction.on_commit(
+            lambda: apply_payment_webhooks.apply_async(countdown=settings.PAYMENT_WEBHOOK_BATCH_DELAY),
+            robust=True,
+        )
+    return event, created
+
+
+def check_transition(payment, target):
+    """``None`` when ``payment`` may move to ``target``, else the reason it may not."""
+    if payment.status == target:
+        return f"Already {target}"
+    if target not in ALLOWED_TRANSITIONS.get(payment.status, ()):
+        return f"Cannot move from {payment.status} to {target}"
+    return None
+
+
+def _transition(payment, event):
+    target = WEBHOOK_TRANSITIONS.get(event.event)
+    if target is None:
+        return None, f"Unhandled event {event.event}"
+    if payment is None:
+        return None, "Unknown order"
+    reason = check_transition(payment, target)
+    return (None, reason) if reason else (target, None)
+
+
+def move_payment(payment, target, payment_id, before, now):
+    """Apply a checked transition in memory, remembering the payment's values from before the first one."""
+    from .dashboard_stats import stat_values
+
+    before.setdefault(payment.pk, stat_values(payment) | {"payment_id": payment.payment_id})
+    payment.status = target
+    payment.payment_id = payment_id or payment.payment_id
+    payment.updated_at = now
+
+
+def save_payment_transitions(payments, before, user=None, ip_address=None):
+    """
+    Write payments moved with ``move_payment`` in one ``bulk_update`` and
+    produce what the model signals would have: dashboard rollup changes,
+    audit entries and confirmation emails. Call inside ``audit_scope()`` and
+    ``notification_batch()`` so those are written in bulk too.
+    """
+    from ..models import Payment
+    from .audit_track import record_audit
+    from .dashboard_stats import apply_stat_change, stat_values
+    from .outbound import queue_email
+    from .payment_verify import payment_confirmation_email
+
+    changed = [payment for payment in payments if payment.pk in before]
+    Payment.objects.bulk_update(changed, ["status", "payment_id", "updated_at"])
+
+    for payment in changed:
+        old = before[payment.pk]
+        apply_stat_change("Payment", old, stat_values(payment))
+        record_audit(
+            user=user,
+            action="update",
+            model_name="Payment",
+            object_id=str(payment.pk),
+            changes={
+                field: {"from": old[field], "to": getattr(payment, field)}
+                for field in ("status", "payment_id")
+                if old[field] != getattr(payment, field)
+            },
+            ip_address=ip_address,
+        )
+        if payment.status == "Success" and payment.user.email:
+            subject, message = payment_confirmation_email(payment)
+            queue_email(subject, message, settings.DEFAULT_FROM_EMAIL, [payment.user.email])
+    return changed
+
+
+def settle_payment(order_id, target, payment_id, user=None, ip_address=None):
+    """
+    Move the payment of ``order_id`` to ``target`` for the browser's verify
+    call, under the same row lock and transition rules as webhook batches so
+    the two cannot race. Returns ``(payment, changed)``; nothing is written or
+    sent when the transition is not allowed (e.g. the webhook got there
+    first). Raises ``Payment.DoesNotExist``.
+    """
+    from ..models import Payment
+    from .audit_track import audit_scope
+    from .outbound import notification_batch
+
+    with audit_scope(), notification_batch(), transaction.atomic():
+        payment = (
+            Payment.objects.select_for_update().select_related("user")
+            .filter(order_id=order_id).order_by("id").first()
+        )
+        if payment is None:
+            raise Payment.DoesNotExist(f"No payment for order {order_id}")
+        if check_transition(payment, target):
+            return payment, False
+        before = {}
+        move_payment(payment, target, payment_id, before, timezone.now())
+        save_payment_transitions([payment], before, user=user, ip_address=ip_address)
+    return payment, True
+
+
+def apply_webhook_events(batch_size=WEBHOOK_BATCH_SIZE):
+    """
+    Apply up to ``batch_size`` received events, oldest first, to their
+    payments with one ``bulk_update`` each for payments and events. Rows are
+    locked (``skip_locked`` for events) so concurrent workers take disjoint
+    batches and cannot race the browser's verify call.
+    Returns the number of events processed.
+    """
+    from ..models import Payment, PaymentWebhookEvent
+    from .audit_track import audit_scope
+    from .outbound import notification_batch
+
+    with audit_scope(), notification_batch(), transaction.atomic():
+        events = list(
+            PaymentWebhookEvent.objects.select_for_update(skip_locked=True)
+            .filter(status="received").order_by("id")[:batch_size]
+        )
+        if not events:
+            return 0
+
+        payments = {}
+        order_ids = {event.order_id for event in events if event.order_id}
+        for payment in Payment.objects.select_for_update().filter(order_id__in=order_ids).select_related("user").order_by("id"):
+            payments.setdefault(payment.order_id, payment)
+
+        now = timezone.now()
+        before = {}
+        for event in events:
+            payment = payments.get(event.order_id)
+            target, reason = _transition(payment, event)
+            event.processed_at = now
+            if target is None:
+                event.status, event.detail = "ignored", reason
+                continue
+            move_payment(payment, target, event.payment_id, before, now)
+            event.status, event.detail = "applied", f"Payment {payment.pk} -> {target}"
+
+        changed = save_payment_transitions(payments.values(), before)
+        PaymentWebhookEvent.objects.bulk_update(events, ["status", "detail", "processed_at"])
+
+    logger.info(f"Applied {len(changed)} payment transitions from {len(events)} webhook events")
+    return len(events)
@@ -80,6 +80,21 @@ Website: https://www.iete.org
 
 
 
+def payment_confirmation_email(payment):
+    subject = "Payment Confirmation"
+    message = (
+        f"Dear {payment.user.name or 'Valued Member'},\n\n"
+        f"Thank you for your payment. Your membership application has been successfully processed.\n\n"
+        f"Payment Details:\n"
+        f"- Amount: {payment.amount} {payment.currency}\n"
+        f"- Membership Type: {payment.membership_type}\n"
+        f"- Order ID: {payment.order_id}\n"
+        f"- Payment ID: {payment.payment_id}\n\n"
+        f"If you have any questions, please contact us at {settings.DEFAULT_FROM_EMAIL}.\n\n"
+        f"Best regards,\nYour Organization Team"
+    )
+    return subject, message
+
 
 # Approval Email-
 def membership_finalized_email(applicant_name, membership_id, role_name):
@@ -0,0 +1,151 @@
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+from django.conf import settings
+from pypdf import PdfWriter
+from reportlab.lib.pagesizes import landscape, letter
+from reportlab.lib.units import inch
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = landscape(letter)
+MARGIN = 0.5 * inch
+ROW_HEIGHT = 13
+HEADER_HEIGHT = 18
+FONT = "Helvetica"
+HEADER_FONT = "Helvetica-Bold"
+# Pages rendered per pool task: large enough to amortise pickling the rows,
+# small enough that a chunk's PDF stays a few hundred KB.
+PAGES_PER_CHUNK = 50
+
+
+class TableLayout:
+    """Column geometry of a tabular report; plain data so it pickles cheaply to workers."""
+
+    def __init__(self, fields, title="Member Report"):
+        self.title = title
+        self.labels = [field.replace('_', ' ').capitalize() for field in fields]
+        self.font_size = 8 if len(fields) <= 10 else 6
+        width, height = PAGE_SIZE
+        self.column_width = (width - 2 * MARGIN) / max(len(fields), 1)
+        usable = height - 2 * MARGIN - HEADER_HEIGHT * 2
+        self.rows_per_page = max(int(usable // ROW_HEIGHT), 1)
+        self.rows_per_chunk = self.rows_per_page * PAGES_PER_CHUNK
+
+    def fit(self, text, font=FONT):
+        limit = self.column_width - 4
+        if stringWidth(text, font, self.font_size) <= limit:
+            return text
+        # Cut to the estimated fit, then trim until the ellipsis fits too.
+        text = text[:max(int(limit // (self.font_size * 0.45)), 1)]
+        while text and stringWidth(text + "…", font, self.font_size) > limit:
+            text = text[:-1]
+        return text + "…"
+
+
+def _draw_header(p, layout, page_number):
+    width, height = PAGE_SIZE
+    top = height - MARGIN
+    p.setFont(HEADER_FONT, 11)
+    p.drawString(MARGIN, top - 12, layout.title)
+    p.setFont(FONT, 8)
+    p.drawRightString(width - MARGIN, top - 12, f"Page {page_number}")
+
+    y = top - HEADER_HEIGHT - 12
+    p.setFillGray(0.85)
+    p.rect(MARGIN, y - 4, width - 2 * MARGIN, ROW_HEIGHT + 2, stroke=0, fill=1)
+    p.setFillGray(0)
+    p.setFont(HEADER_FONT, layout.font_size)
+    for c, label in enumerate(layout.labels):
+        p.drawString(MARGIN + c * layout.column_width + 2, y, layout.fit(label, HEADER_FONT))
+    return y - ROW_HEIGHT - 2
+
+
+def render_table_pages(file, layout, rows, first_page=1):
+    """
+    Draw ``rows`` (sequences of cell strings) as table pages on ``file``,
+    numbering pages from ``first_page`` and repeating the column header on each.
+    """
+    p = canvas.Canvas(file, pagesize=PAGE_SIZE, pageCompression=1)
+    page_number = first_page
+    y = _draw_header(p, layout, page_number)
+    on_page = 0
+    for row in rows:
+        if on_page == layout.rows_per_page:
+            p.showPage()
+            page_number += 1
+            y = _draw_header(p, layout, page_number)
+            on_page = 0
+        p.setFont(FONT, layout.font_size)
+        for c, value in enumerate(row):
+            p.drawString(MARGIN + c * layout.column_width + 2, y, layout.fit(value))
+        y -= ROW_HEIGHT
+        on_page += 1
+    p.showPage()
+    p.save()
+
+
+def _render_chunk(layout, rows, first_page, directory):
+    fd, path = tempfile.mkstemp(suffix=".pdf", dir=directory)
+    with os.fdopen(fd, "wb") as file:
+        render_table_pages(file, layout, rows, first_page)
+    return path
+
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def _can_fork():
+    # Celery prefork children are daemonic and may not start processes of their own.
+    return not multiprocessing.current_process().daemon
+
+
+def write_table_pdf(rows, fields, file, workers=None):
+    """
+    Render ``rows`` into a tabular PDF on ``file``. Page ranges of
+    ``PAGES_PER_CHUNK`` pages are drawn in a process pool and the partial
+    documents concatenated in order, with at most two chunks per worker in
+    flight. ``workers`` defaults to the CPU count capped at
+    ``PDF_REPORT_MAX_WORKERS``. Reports of a single chunk, or where processes
+    cannot be started, are drawn in-process in one pass.
+    """
+    layout = TableLayout(fields)
+    workers = workers or min(os.cpu_count() or 1, getattr(settings, "PDF_REPORT_MAX_WORKERS", 2))
+    chunks = _chunks(rows, layout.rows_per_chunk)
+    head = list(islice(chunks, 2))
+
+    if len(head) >= 2 and workers > 1 and not _can_fork():
+        logger.warning("Rendering a multi-chunk PDF in one process: this worker may not start processes")
+        workers = 1
+    if len(head) < 2 or workers == 1:
+        render_table_pages(file, layout, chain.from_iterable(chain(head, chunks)))
+        return
+
+    directory = tempfile.mkdtemp(prefix="report-")
+    try:
+        pending, paths = deque(), []
+        # spawn rather than fork: the parent is usually a threaded server or worker.
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            # Every chunk but the last fills exactly PAGES_PER_CHUNK pages.
+            for index, chunk in enumerate(chain(head, chunks)):
+                if len(pending) >= workers * 2:
+                    paths.append(pending.popleft().result())
+                pending.append(pool.submit(_render_chunk, layout, chunk, index * PAGES_PER_CHUNK + 1, directory))
+            paths.extend(future.result() for future in pending)
+
+        writer = PdfWriter()
+        for path in paths:
+            writer.append(path)
+        writer.write(file)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
@@ -1,5 +1,5 @@
-from django.core.mail import send_mail
 from django.conf import settings
+from .outbound import queue_email
 
 
 def send_proposer_invitation(proposer, applicant_name):
@@ -18,7 +18,7 @@ def send_proposer_invitation(proposer, applicant_name):
     <p>If no action is taken, this request will automatically expire.</p>
     """
 
-    send_mail(
+    queue_email(
         subject,
         '',
         settings.DEFAULT_FROM_EMAIL,
@@ -0,0 +1,152 @@
+# utils/pubsub.py
+import asyncio
+import json
+import logging
+import threading
+from contextlib import asynccontextmanager
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class InProcessBroker:
+    """
+    Fan events out to subscribers living in this process.
+
+    ``publish`` may be called from any thread (sync views run in a thread
+    pool under ASGI); events are handed to each subscriber's event loop with
+    ``call_soon_threadsafe``. Only reaches clients connected to the same
+    process: meant for tests and a single-process development server.
+    """
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def has_subscribers(self, channel):
+        return bool(self._subscribers.get(channel))
+
+    def subscribed(self, channels):
+        """The subset of ``channels`` with at least one subscriber."""
+        return {channel for channel in channels if self._subscribers.get(channel)}
+
+    def publish(self, channel, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(self._offer, queue, event)
+
+    @staticmethod
+    def _offer(queue, event):
+        # A client too slow to drain its queue misses events rather than
+        # growing memory without bound.
+        if not queue.full():
+            queue.put_nowait(event)
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+        """Yield an ``asyncio.Queue`` receiving the channel's events until the block exits."""
+        queue = asyncio.Queue(self.queue_size)
+        subscriber = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscriber)
+        try:
+            yield queue
+        finally:
+            with self._lock:
+                channel_subscribers = self._subscribers.get(channel, set())
+                channel_subscribers.discard(subscriber)
+                if not channel_subscribers:
+                    self._subscribers.pop(channel, None)
+
+
+class RedisBroker:
+    """
+    Fan events out through Redis pub/sub, so a write in any process (WSGI
+    workers, Celery tasks) reaches streams held open by any ASGI process.
+
+    Live events are best effort: when Redis is unreachable, publishing is
+    logged and skipped and clients catch up from the inbox.
+    """
+
+    def __init__(self, url=None, queue_size=100, prefix="pubsub:"):
+        import redis
+
+        self.url = url or settings.PUBSUB_URL
+        self.queue_size = queue_size
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(self.url)
+
+    def has_subscribers(self, channel):
+        return bool(self.subscribed([channel]))
+
+    def subscribed(self, channels):
+        """The subset of ``channels`` with at least one subscriber, in any process."""
+        channels = list(channels)
+        if not channels:
+            return set()
+        try:
+            counts = self._client.pubsub_numsub(*(self.prefix + channel for channel in channels))
+        except Exception:
+            logger.exception("Could not count pub/sub subscribers")
+            return set()
+        return {channel for channel, (_, count) in zip(channels, counts) if count}
+
+    def publish(self, channel, event):
+        try:
+            self._client.publish(self.prefix + channel, json.dumps(event, cls=DjangoJSONEncoder))
+        except Exception:
+            logger.exception(f"Could not publish to {channel}")
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+        """Yield an ``asyncio.Queue`` receiving the channel's events until the block exits."""
+        import redis.asyncio
+
+        queue = asyncio.Queue(self.queue_size)
+        client = redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(self.prefix + channel)
+
+        async def relay():
+            async for message in pubsub.listen():
+                # A client too slow to drain its queue misses events.
+                if message["type"] == "message" and not queue.full():
+                    queue.put_nowait(json.loads(message["data"]))
+
+        reader = asyncio.create_task(relay())
+        try:
+            yield queue
+        finally:
+            reader.cancel()
+            try:
+                await reader
+            except (asyncio.CancelledError, Exception):
+                pass
+            await pubsub.aclose()
+            await client.aclose()
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = import_string(getattr(settings, "PUBSUB_BACKEND", "api_v1.utils.pubsub.RedisBroker"))()
+    return _broker
+
+
+def user_channel(user_id):
+    return f"user:{user_id}"
+
+
+def publish_to_users(user_ids, event_type, data):
+    """Push an event to every listed user that has an open stream."""
+    broker = get_broker()
+    event = {"type": event_type, "data": data}
+    for channel in broker.subscribed(user_channel(user_id) for user_id in user_ids):
+        broker.publish(channel, event)
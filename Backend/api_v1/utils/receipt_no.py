@@ -1,15 +1,21 @@
-from datetime import datetime
-from django.db.models import Count  
+from django.conf import settings
+from django.utils import timezone
 from ..models import Payment
+from .sequences import allocate
 import random
 
 def generate_receipt_number():
-    now = datetime.now()
+    now = timezone.localtime()
     current_year = now.year
     current_month_letter = now.strftime("%b")[0].upper()
 
-    yearly_count = Payment.objects.filter(created_at__year=current_year).count()
-    next_number = yearly_count + 1
+    # Per-year counter; the first allocation of a year continues from the
+    # payments already created that year.
+    next_number = allocate(
+        f"receipt:{current_year}",
+        block_size=getattr(settings, "RECEIPT_NUMBER_BLOCK_SIZE", 1),
+        initial=lambda: Payment.objects.filter(created_at__year=current_year).count(),
+    )
 
     padded_number = str(next_number).zfill(5)
     return f"{current_month_letter}{padded_number}"
@@ -17,4 +23,3 @@ def generate_receipt_number():
 
 def generate_otp(length=6):
     return ''.join(str(random.randint(0, 9)) for _ in range(length))
-
@@ -0,0 +1,199 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from .payment_gateway import check_transition, get_gateway_client, move_payment, save_payment_transitions
+
+logger = logging.getLogger(__name__)
+
+RECONCILIATION_DIR = "reports"
+RECONCILE_CHUNK_SIZE = 200
+RECONCILE_WORKERS = 8
+# Razorpay allows a few hundred requests a minute per key; stay well under it.
+RECONCILE_RATE = 5.0
+# Payments younger than this may still be in the customer's checkout.
+RECONCILE_MIN_AGE = timedelta(minutes=30)
+# Orders still without a payment attempt this long after creation are marked
+# Failed so they stop being re-checked every run; a later capture still wins.
+RECONCILE_ABANDON_AFTER = timedelta(days=1)
+# Older Pending payments are left to manual review instead of being re-checked every run.
+RECONCILE_MAX_AGE = timedelta(days=30)
+REFUNDED_DETAIL = "Refunded at the gateway"
+RECONCILE_LOCK_KEY = "reconcile_payments:lock"
+# Long enough to outlast a run; the lock is released as soon as the run ends.
+RECONCILE_LOCK_TIMEOUT = 6 * 60 * 60
+
+
+class RateLimiter:
+    """Spaces calls from any number of threads at least ``1 / rate`` seconds apart."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            at = max(self._next, now)
+            self._next = at + self.interval
+        if at > now:
+            time.sleep(at - now)
+
+
+def gateway_outcome(items, abandoned=False):
+    """
+    What the gateway's payment attempts on an order say about it:
+    ``(status, payment_id, detail)`` with ``status`` None when the order
+    should stay Pending. ``abandoned`` orders without attempts are Failed.
+    """
+    by_status = {}
+    for item in items:
+        by_status.setdefault(item.get("status"), item)
+    if "captured" in by_status:
+        return "Success", by_status["captured"]["id"], "Gateway payment captured"
+    if "refunded" in by_status:
+        # Money came back to the customer: neither revenue nor a failure; left for the refund flow.
+        return None, None, REFUNDED_DETAIL
+    if not items:
+        if abandoned:
+            return "Failed", None, "Abandoned checkout, no payment attempts"
+        return None, None, "No payment attempts"
+    if "authorized" in by_status:
+        return None, None, "Authorized, awaiting capture"
+    if set(by_status) == {"failed"}:
+        return "Failed", items[-1]["id"], f"{len(items)} failed attempt(s)"
+    return None, None, f"Attempts in progress ({', '.join(sorted(map(str, by_status)))})"
+
+
+def _fetch(client, limiter, order_id):
+    limiter.wait()
+    try:
+        return order_id, client.order.payments(order_id).get("items", []), None
+    except Exception as e:
+        return order_id, None, str(e)
+
+
+def _apply_chunk(ids, outcomes, report, dry_run):
+    """Lock the chunk's payments and move those the gateway settled; rows changed since the fetch are re-checked."""
+    from ..models import Payment
+    from .audit_track import audit_scope
+    from .outbound import notification_batch
+
+    with audit_scope(), notification_batch(), transaction.atomic():
+        payments = list(Payment.objects.select_for_update().filter(pk__in=ids).select_related("user").order_by("id"))
+        now = timezone.now()
+        before = {}
+        for payment in payments:
+            target, payment_id, detail = outcomes[payment.order_id]
+            entry = {"payment": payment.pk, "order_id": payment.order_id, "status": payment.status, "detail": detail}
+            if target is None:
+                report["refunded" if detail == REFUNDED_DETAIL else "unchanged"] += 1
+            elif reason := check_transition(payment, target):
+                entry["detail"] = reason
+                report["unchanged"] += 1
+            else:
+                entry["to"] = target
+                report["success" if target == "Success" else "failed"] += 1
+                if not dry_run:
+                    move_payment(payment, target, payment_id, before, now)
+            report["payments"].append(entry)
+        save_payment_transitions(payments, before)
+
+
+def reconcile_pending_payments(chunk_size=RECONCILE_CHUNK_SIZE, workers=RECONCILE_WORKERS, rate=RECONCILE_RATE,
+                               min_age=RECONCILE_MIN_AGE, max_age=RECONCILE_MAX_AGE,
+                               abandon_after=RECONCILE_ABANDON_AFTER, dry_run=False, client=None):
+    """
+    Settle Pending payments created between ``max_age`` and ``min_age`` ago
+    from the gateway's record of their orders.
+
+    Payments are paged by id ``chunk_size`` at a time; each page's orders are
+    looked up concurrently on a pool of ``workers`` threads, together held to
+    ``rate`` requests per second, and the outcomes are written with one
+    ``bulk_update`` per page. Orders the gateway cannot answer for are
+    reported and left Pending. Only one run proceeds at a time (the lock
+    lives in the cache); others return ``None``. Returns the report, which is
+    also written as JSON under MEDIA_ROOT/reports.
+    """
+    token = uuid.uuid4().hex
+    if not cache.add(RECONCILE_LOCK_KEY, token, timeout=RECONCILE_LOCK_TIMEOUT):
+        logger.info("Payment reconciliation already running; skipped")
+        return None
+    try:
+        return _reconcile(chunk_size, workers, rate, min_age, max_age, abandon_after, dry_run, client)
+    finally:
+        if cache.get(RECONCILE_LOCK_KEY) == token:
+            cache.delete(RECONCILE_LOCK_KEY)
+
+
+def _reconcile(chunk_size, workers, rate, min_age, max_age, abandon_after, dry_run, client):
+    from ..models import Payment
+
+    client = client or get_gateway_client()
+    limiter = RateLimiter(rate)
+    started_at = timezone.now()
+    report = {
+        "started_at": started_at.isoformat(),
+        "dry_run": dry_run,
+        "checked": 0,
+        "success": 0,
+        "failed": 0,
+        "refunded": 0,
+        "unchanged": 0,
+        "errors": [],
+        "payments": [],
+    }
+
+    pending = Payment.objects.filter(
+        status="Pending", created_at__lt=started_at - min_age, created_at__gte=started_at - max_age,
+    ).order_by("id")
+    abandoned_before = started_at - abandon_after
+    last_id = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            chunk = list(pending.filter(id__gt=last_id).values_list("id", "order_id", "created_at")[:chunk_size])
+            if not chunk:
+                break
+            last_id = chunk[-1][0]
+            abandoned = {order_id: created_at < abandoned_before for _, order_id, created_at in chunk}
+            outcomes = {}
+            for order_id, items, error in pool.map(lambda order_id: _fetch(client, limiter, order_id), abandoned):
+                if error is None:
+                    outcomes[order_id] = gateway_outcome(items, abandoned[order_id])
+                else:
+                    report["errors"].append({"order_id": order_id, "error": error})
+            report["checked"] += len(chunk)
+            ids = [pk for pk, order_id, _ in chunk if order_id in outcomes]
+            if ids:
+                _apply_chunk(ids, outcomes, report, dry_run)
+
+    report["finished_at"] = timezone.now().isoformat()
+    report["report_file"] = _write_report(report, started_at)
+    logger.info(
+        f"Reconciled {report['checked']} pending payments: {report['success']} succeeded, "
+        f"{report['failed']} failed, {report['refunded']} refunded, {report['unchanged']} unchanged, "
+        f"{len(report['errors'])} errors"
+    )
+    return report
+
+
+def _write_report(report, started_at):
+    relative = os.path.join(
+        RECONCILIATION_DIR, f"reconciliation-{timezone.localtime(started_at):%Y%m%d-%H%M%S}.json",
+    )
+    path = os.path.join(settings.MEDIA_ROOT, relative)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    return relative
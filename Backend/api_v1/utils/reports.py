@@ -0,0 +1,257 @@
+import hashlib
+import json
+import logging
+import os
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from .export_data import EXPORT_FORMATS, export_rows, write_csv, write_excel, write_pdf
+
+logger = logging.getLogger(__name__)
+
+REPORT_DIR = "reports"
+REPORT_PROGRESS_EVERY = 1000
+# A queued job not picked up by then is dispatched again (its enqueue may have
+# been lost); a running job without a progress update by then lost its worker.
+REPORT_QUEUED_STALE_AFTER = timedelta(minutes=10)
+REPORT_RUNNING_STALE_AFTER = timedelta(minutes=30)
+# Report files are deleted this long after they were written; requesting the
+# same report again afterwards generates it anew.
+REPORT_FILE_MAX_AGE = timedelta(days=1)
+MEMBER_REPORT_EXCLUDED_FIELDS = ("password", "last_login", "is_superuser")
+
+_binary_writers = {"excel": write_excel, "pdf": write_pdf}
+
+
+def member_report_fields():
+    from ..models import User
+
+    return [
+        f.name for f in User._meta.get_fields()
+        if not f.is_relation and f.name not in MEMBER_REPORT_EXCLUDED_FIELDS
+    ]
+
+
+def clean_member_report(requested_fields, params):
+    """
+    Validate the requested columns and filters of a member report.
+    Returns ``(fields, filters)``; raises ``ValueError`` with a client-facing message.
+    """
+    all_fields = member_report_fields()
+    if requested_fields:
+        if not isinstance(requested_fields, list):
+            raise ValueError("Fields must be a list.")
+        for field in requested_fields:
+            if field not in all_fields:
+                raise ValueError(f"Invalid field '{field}'.")
+        fields = list(requested_fields)
+    else:
+        fields = all_fields
+
+    filters = {}
+    if params.get("name"):
+        filters["name"] = params["name"]
+    for key in ("start_date", "end_date"):
+        value = params.get(key)
+        if not value:
+            continue
+        try:
+            parsed = parse_date(value)
+        except ValueError as e:
+            raise ValueError(f"Invalid date format. Use YYYY-MM-DD. Error: {str(e)}")
+        if parsed:
+            filters[key] = parsed.isoformat()
+    return fields, filters
+
+
+def member_report_queryset(filters):
+    from ..models import User
+
+    queryset = User.objects.all()
+    if filters.get("name"):
+        queryset = queryset.filter(name__icontains=filters["name"])
+    if filters.get("start_date"):
+        queryset = queryset.filter(created_at__gte=parse_date(filters["start_date"]))
+    if filters.get("end_date"):
+        queryset = queryset.filter(created_at__lte=parse_date(filters["end_date"]))
+    return queryset.order_by("created_at", "id")
+
+
+def report_data_version(queryset):
+    """
+    Cheap fingerprint of the rows a report covers: their count and latest
+    ``updated_at``, which any insert, delete or save of a matching row
+    changes, plus the model's ``bulk_write_sequence`` for ``update()`` and
+    ``bulk_update()`` writes, which leave ``updated_at`` alone. Reports only
+    read the model's own columns, so no other table is part of it.
+    """
+    from ..managers import bulk_write_sequence
+    from ..models import SequenceCounter
+
+    stats = queryset.order_by().aggregate(rows=Count("pk"), last=Max("updated_at"))
+    last = stats["last"].isoformat() if stats["last"] else ""
+    bulk_writes = SequenceCounter.objects.filter(
+        name=bulk_write_sequence(queryset.model),
+    ).values_list("value", flat=True).first()
+    return f"{stats['rows']}:{last}:{bulk_writes or 0}"
+
+
+def report_cache_key(report_type, export_format, fields, filters, data_version):
+    payload = json.dumps(
+        [report_type, export_format, fields, filters, data_version],
+        sort_keys=True, separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def report_artifact(cache_key, export_format):
+    """Media-relative path of the artifact for a cache key."""
+    ext, _ = EXPORT_FORMATS[export_format]
+    return os.path.join(REPORT_DIR, f"{cache_key}.{ext}")
+
+
+def report_file_path(job):
+    if not job.report_file:
+        return None
+    path = os.path.join(settings.MEDIA_ROOT, job.report_file)
+    return path if os.path.exists(path) else None
+
+
+def request_member_report(user, export_format, fields, filters):
+    """
+    Find or create the job producing this report. A completed job whose file
+    is still on disk, or one queued or running that has not gone stale, with
+    the same cache key is returned as-is; otherwise a new job is queued for
+    the worker. Returns ``(job, created)``.
+    """
+    from ..models import ReportJob
+    from ..tasks import generate_report
+
+    queryset = member_report_queryset(filters)
+    cache_key = report_cache_key("members", export_format, fields, filters, report_data_version(queryset))
+
+    now = timezone.now()
+    existing = ReportJob.objects.filter(cache_key=cache_key).filter(
+        Q(status="completed")
+        | Q(status="queued", updated_at__gte=now - REPORT_QUEUED_STALE_AFTER)
+        | Q(status="running", updated_at__gte=now - REPORT_RUNNING_STALE_AFTER)
+    )
+    for job in existing.order_by("-created_at"):
+        if job.status != "completed" or report_file_path(job):
+            return job, False
+
+    job = ReportJob.objects.create(
+        requested_by=user,
+        report_type="members",
+        format=export_format,
+        fields=fields,
+        filters=filters,
+        cache_key=cache_key,
+    )
+    transaction.on_commit(lambda: generate_report.delay(job.pk), robust=True)
+    return job, True
+
+
+def requeue_stale_report_jobs():
+    """
+    Dispatch queued jobs again once their enqueue looks lost, and fail running
+    jobs whose worker stopped reporting progress. Returns ``(requeued, failed)``.
+    """
+    from ..models import ReportJob
+    from ..tasks import generate_report
+
+    now = timezone.now()
+    failed = ReportJob.objects.filter(
+        status="running", updated_at__lt=now - REPORT_RUNNING_STALE_AFTER,
+    ).update(status="failed", error="The worker generating this report stopped.", updated_at=now)
+
+    stale = ReportJob.objects.filter(status="queued", updated_at__lt=now - REPORT_QUEUED_STALE_AFTER)
+    requeued = 0
+    for job_id in stale.values_list("pk", flat=True).iterator():
+        # Restart the clock so the job is not dispatched again every run while it waits.
+        ReportJob.objects.filter(pk=job_id, status="queued").update(updated_at=now)
+        generate_report.delay(job_id)
+        requeued += 1
+    if failed or requeued:
+        logger.warning(f"Report jobs: {requeued} requeued, {failed} failed as stale")
+    return requeued, failed
+
+
+def purge_report_files(max_age=REPORT_FILE_MAX_AGE):
+    """
+    Delete report files, and partial files a lost worker left behind, written
+    more than ``max_age`` ago, and clear ``report_file`` on the jobs that
+    pointed at them. Returns the number of files deleted.
+    """
+    from ..models import ReportJob
+
+    directory = os.path.join(settings.MEDIA_ROOT, REPORT_DIR)
+    if not os.path.isdir(directory):
+        return 0
+    cutoff = (timezone.now() - max_age).timestamp()
+    removed = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.is_file() or entry.stat().st_mtime >= cutoff:
+                continue
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+            removed.append(os.path.join(REPORT_DIR, entry.name))
+    if removed:
+        ReportJob.objects.filter(report_file__in=removed).update(report_file=None, updated_at=timezone.now())
+        logger.info(f"Report files: {len(removed)} older than {max_age} deleted")
+    return len(removed)
+
+
+def _counted(job, rows):
+    from ..models import ReportJob
+
+    for row in rows:
+        yield row
+        job.row_count += 1
+        if job.row_count % REPORT_PROGRESS_EVERY == 0:
+            # updated_at doubles as the heartbeat requeue_stale_report_jobs watches.
+            ReportJob.objects.filter(pk=job.pk).update(row_count=job.row_count, updated_at=timezone.now())
+
+
+def run_report_job(job):
+    """Generate the job's file under MEDIA_ROOT/reports, recording progress as rows are written."""
+    queryset = member_report_queryset(job.filters)
+    job.status = "running"
+    job.total_rows = queryset.count()
+    job.row_count = 0
+    job.save(update_fields=["status", "total_rows", "row_count", "updated_at"])
+
+    relative = report_artifact(job.cache_key, job.format)
+    path = os.path.join(settings.MEDIA_ROOT, relative)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = f"{path}.{job.pk}.partial"
+
+    try:
+        rows = _counted(job, export_rows(queryset, job.fields))
+        if job.format == "csv":
+            with open(partial, "w", newline="", encoding="utf-8") as file:
+                write_csv(rows, job.fields, file)
+        else:
+            with open(partial, "wb") as file:
+                _binary_writers[job.format](rows, job.fields, file)
+        os.replace(partial, path)
+    except Exception as exc:
+        logger.exception(f"Report job {job.pk} failed")
+        if os.path.exists(partial):
+            os.remove(partial)
+        job.status = "failed"
+        job.error = str(exc)
+        job.save(update_fields=["status", "error", "updated_at"])
+        return job
+
+    job.status = "completed"
+    job.report_file = relative
+    job.completed_at = timezone.now()
+    job.save(update_fields=["status", "row_count", "report_file", "completed_at", "updated_at"])
+    return job
@@ -0,0 +1,100 @@
+import os
+import threading
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+_blocks = {}
+_blocks_lock = threading.Lock()
+
+
+def reserve_values(name, count=1, initial=None):
+    """
+    Advance sequence ``name`` by ``count`` and return the first of the
+    reserved values. The increment is a single ``UPDATE ... SET value = value + n``,
+    which row-locks the counter until the surrounding transaction ends, so
+    concurrent callers never see the same value and a rolled-back caller
+    hands its values back.
+
+    ``initial`` is a callable giving the value to start after when the
+    counter does not exist yet (e.g. the number of rows issued before the
+    sequence was introduced); it runs once per sequence.
+    """
+    from ..models import SequenceCounter
+
+    with transaction.atomic():
+        counters = SequenceCounter.objects.filter(name=name)
+        if not counters.update(value=F("value") + count):
+            try:
+                with transaction.atomic():
+                    SequenceCounter.objects.create(name=name, value=(initial() if initial else 0) + count)
+            except IntegrityError:
+                # Another caller created the counter first; take the next values from it.
+                counters.update(value=F("value") + count)
+        value = counters.values_list("value", flat=True).get()
+    return value - count + 1
+
+
+def advance_to(name, value, initial=None):
+    """
+    Move sequence ``name`` forward to at least ``value`` so it never hands
+    out values issued by other means (e.g. imported). Never moves it back.
+    """
+    from ..models import SequenceCounter
+
+    with transaction.atomic():
+        counters = SequenceCounter.objects.filter(name=name)
+        if not counters.update(value=Greatest(F("value"), value)):
+            try:
+                with transaction.atomic():
+                    SequenceCounter.objects.create(name=name, value=max(initial() if initial else 0, value))
+            except IntegrityError:
+                counters.update(value=Greatest(F("value"), value))
+
+
+def next_value(name, initial=None):
+    return reserve_values(name, 1, initial)
+
+
+class SequenceBlock:
+    """
+    Values of one sequence reserved ``block_size`` at a time and handed out
+    from memory, so a process touches the counter row once per block instead
+    of once per value. Values stay unique but are no longer gap-free or in
+    global order: whatever is left of a block when the process exits is skipped.
+    """
+
+    def __init__(self, name, block_size, initial=None):
+        self.name = name
+        self.block_size = block_size
+        self.initial = initial
+        self._next = self._end = 0
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def next(self):
+        # A block reserved inside the caller's transaction would be handed
+        # back by its rollback while this process still holds it.
+        if connection.in_atomic_block:
+            return next_value(self.name, self.initial)
+        with self._lock:
+            if self._pid != os.getpid():
+                # Forked after reserving: the parent still owns what is left.
+                self._pid, self._next, self._end = os.getpid(), 0, 0
+            if self._next >= self._end:
+                self._next = reserve_values(self.name, self.block_size, self.initial)
+                self._end = self._next + self.block_size
+            value = self._next
+            self._next += 1
+            return value
+
+
+def allocate(name, block_size=1, initial=None):
+    """Next value of sequence ``name``; reserved in per-process blocks when ``block_size`` > 1."""
+    if block_size <= 1:
+        return next_value(name, initial)
+    with _blocks_lock:
+        block = _blocks.get(name)
+        if block is None or block.block_size != block_size:
+            block = _blocks[name] = SequenceBlock(name, block_size, initial)
+    return block.next()
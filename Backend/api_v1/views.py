@@ -1,10 +1,12 @@
 import io
 import re
 import json
+import asyncio
 import pdfkit
 import logging
 import random
 import string
+import uuid
 import pandas as pd
 import razorpay, time
 from io import BytesIO
@@ -19,15 +21,17 @@ from django.templatetags.static import static
 
 
 from django.conf import settings
-from django.core.mail import EmailMessage, send_mail
 from django.core.paginator import Paginator
 from django.db import transaction
-from django.db.models import Q
-from django.http import HttpResponse
+from django.db.models import Count, F, Q
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
 from django.shortcuts import get_object_or_404,render
 from django.template.loader import render_to_string
 from django.utils import timezone
-from django.utils.dateparse import parse_date
+from django.utils.dateparse import parse_date, parse_datetime
 from django.utils.encoding import force_bytes, force_str
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.contrib.auth.hashers import make_password
@@ -42,7 +46,7 @@ from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
-from rest_framework.pagination import LimitOffsetPagination, PageNumberPagination
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination, PageNumberPagination
 from rest_framework.authtoken.models import Token
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.token_blacklist.models import OutstandingToken, BlacklistedToken
@@ -57,13 +61,29 @@ from .utils.eligibility import calculate_age, total_experience_years, has_valid_
 from .utils.notification import *
 from .utils.payment_verify import *
 from .utils.export_data import *
+from .utils.dashboard_stats import add_stat_rows, dashboard_stats
+from .utils.reports import clean_member_report, member_report_queryset, report_file_path, request_member_report
 from .utils.receipt_no import *
+from .utils.membership_ids import allocate_membership_id, allocate_membership_ids, claim_membership_ids
+from .utils.payment_gateway import (
+    get_gateway_client, parse_webhook, record_webhook_event, settle_payment, verify_webhook_signature,
+)
 from .utils.proposer_email import send_proposer_invitation
+from .utils.outbound import notification_batch, queue_email, queue_sms
+from .thread import get_request_ip, get_request_user
+from .utils.applications import (
+    applicant_queryset, parse_user_id, with_dossier_relations, with_summary_relations, filter_applicants,
+    build_applicant_dossier, build_applicant_summary,
+)
 from .helper import *
+from .backends import bump_permission_version
+from .authentication import STREAM_TICKET_TIMEOUT, ClaimsAuthenticationMixin, authenticate_stream_request, issue_stream_ticket
+from .utils.pubsub import get_broker, publish_to_users, user_channel
+from .utils.audit_track import search_audit_logs
 
 
 logger = logging.getLogger(__name__)
-razorpay_client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
+razorpay_client = get_gateway_client()
 
 
 class CustomPageNumberPagination(PageNumberPagination):
@@ -71,13 +91,34 @@ class CustomPageNumberPagination(PageNumberPagination):
     page_size_query_param = 'page_size'
     max_page_size = 100
 
+
+class ApplicationCursorPagination(CursorPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+
+
+class AuditLogCursorPagination(CursorPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('-timestamp', '-id')
+
+
+class NotificationCursorPagination(CursorPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-timestamp', '-id')
+
 def send_email_otp(email, otp_code):
     subject = "Your OTP Code"
     message = f"Your OTP for verification is: {otp_code}. It is valid for 5 minutes."
     from_email = settings.DEFAULT_FROM_EMAIL
     recipient_list = [email]
 
-    send_mail(subject, message, from_email, recipient_list)
+    queue_email(subject, message, from_email, recipient_list)
     
 
 def check_permission_and_get_access(request, codename):
@@ -205,6 +246,7 @@ class RoleAPIView(GenericAPIView):
                 group, created = Group.objects.get_or_create(name=group_name)
                 role.group = group  # Set the group's one-to-one relationship with role
                 role.save()
+                bump_permission_version()
 
                 return Response({"message": "Role created successfully", "data": serializer.data}, status=status.HTTP_200_OK)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -237,9 +279,14 @@ class RoleAPIView(GenericAPIView):
         with transaction.atomic():
             role.name = new_name
             group_name = f"{role.id}_{new_name}"
-            group, _ = Group.objects.get_or_create(name=group_name)
-            role.group = group
+            # Rename the linked group in place so the role keeps its permissions.
+            if role.group:
+                role.group.name = group_name
+                role.group.save(update_fields=["name"])
+            else:
+                role.group, _ = Group.objects.get_or_create(name=group_name)
             role.save()
+            bump_permission_version()
 
             return Response({
                 "message": "Role name updated successfully.",
@@ -283,6 +330,7 @@ class RoleAPIView(GenericAPIView):
             if role.group_id and Group.objects.filter(id=role.group_id).exists():
                 Group.objects.get(id=role.group_id).delete()
             role.delete()
+            bump_permission_version()
 
         return Response({
             "message": "Role deleted successfully.",
@@ -310,6 +358,13 @@ class PermissionMatrixView(APIView):
             .distinct()
         )
 
+    def get_role_group(self, role):
+        if role.group is None:
+            group, _ = Group.objects.get_or_create(name=f"{role.id}_{role.name}")
+            role.group = group
+            role.save(update_fields=["group"])
+        return role.group
+
     def get(self, request):
         user,error_response = check_permission_and_get_access(request, "api_v1.view_permission")
         if error_response:
@@ -319,9 +374,27 @@ class PermissionMatrixView(APIView):
         permissions = Permission.objects.select_related("content_type").filter(
             content_type__model__in=allowed_models
         )
-        roles = Role.objects.all()
+        roles = list(Role.objects.only("id", "name"))
         permissions_data = []
 
+        # Role permissions live on the role's linked Group: one join gives every
+        # (role, permission) pair.
+        granted = set(
+            Role.objects.filter(
+                group__permissions__content_type__model__in=allowed_models,
+            ).values_list("id", "group__permissions")
+        )
+        # Grants held directly by some members of a role (e.g. those the role
+        # group migration left on users), counted per (role, permission).
+        user_grants = {
+            (role_id, permission_id): holders
+            for role_id, permission_id, holders in User.user_permissions.through.objects.filter(
+                user__role__isnull=False, permission__content_type__model__in=allowed_models,
+            ).values("user__role_id", "permission_id").annotate(holders=Count("user_id")).values_list(
+                "user__role_id", "permission_id", "holders",
+            )
+        }
+
         for perm in permissions:
             category = perm.content_type.model
             codename = perm.codename
@@ -329,17 +402,18 @@ class PermissionMatrixView(APIView):
             permission_id = f"{category}-{codename}"
 
             role_assignments = {}
+            role_user_grants = {}
             for role in roles:
-                users = User.objects.filter(role=role)
-                # Check if any user has the permission
-                has_permission = any(user.user_permissions.filter(id=perm.id).exists() for user in users)
-                role_assignments[role.name] = has_permission
+                role_assignments[role.name] = (role.id, perm.id) in granted
+                if (role.id, perm.id) in user_grants:
+                    role_user_grants[role.name] = user_grants[(role.id, perm.id)]
 
             permissions_data.append({
                 "id": permission_id,
                 "name": readable_name,
                 "category": category,
-                "roles": role_assignments
+                "roles": role_assignments,
+                "user_grants": role_user_grants,
             })
 
         return Response({"permissions": permissions_data}, status=200)
@@ -366,14 +440,14 @@ class PermissionMatrixView(APIView):
                 codename=codename,
                 content_type__model=category
             )
-            role = Role.objects.get(name=role_name)
+            role = Role.objects.select_related("group").get(name=role_name)
 
-            users = User.objects.filter(role=role)
-            for user in users:
-                if value:
-                    user.user_permissions.add(permission)
-                else:
-                    user.user_permissions.remove(permission)
+            group = self.get_role_group(role)
+            if value:
+                group.permissions.add(permission)
+            else:
+                group.permissions.remove(permission)
+            bump_permission_version()
 
             return Response({"success": True}, status=200)
 
@@ -393,9 +467,9 @@ class PermissionMatrixView(APIView):
 
         allowed_models = self.get_allowed_models(request)
         try:
-            role = Role.objects.get(name=role_name)
-            users = User.objects.filter(role=role)
+            role = Role.objects.select_related("group").get(name=role_name)
 
+            requested = {}
             for permission_id, value in permissions_dict.items():
                 if "-" not in permission_id or value not in [True, False]:
                     continue
@@ -403,19 +477,24 @@ class PermissionMatrixView(APIView):
                 category, codename = permission_id.split("-", 1)
                 if category not in allowed_models:
                     continue
+                requested[(category, codename)] = value
 
-                try:
-                    permission = Permission.objects.select_related("content_type").get(
-                        codename=codename,
-                        content_type__model=category
-                    )
-                    for user in users:
-                        if value:
-                            user.user_permissions.add(permission)
-                        else:
-                            user.user_permissions.remove(permission)
-                except Permission.DoesNotExist:
-                    continue
+            if requested:
+                lookup = Q()
+                for category, codename in requested:
+                    lookup |= Q(content_type__model=category, codename=codename)
+
+                grant, revoke = [], []
+                for permission in Permission.objects.select_related("content_type").filter(lookup):
+                    key = (permission.content_type.model, permission.codename)
+                    (grant if requested[key] else revoke).append(permission)
+
+                group = self.get_role_group(role)
+                if grant:
+                    group.permissions.add(*grant)
+                if revoke:
+                    group.permissions.remove(*revoke)
+                bump_permission_version()
 
             return Response({"success": True}, status=200)
 
@@ -527,7 +606,7 @@ class VerifyOTPAPIView(APIView):
         from_email = settings.DEFAULT_FROM_EMAIL
         recipient_list = [user.email]
 
-        send_mail(subject, message, from_email, recipient_list)
+        queue_email(subject, message, from_email, recipient_list)
 
         return Response({
             "message": "OTP verified. Signup complete. Application ID has been sent to your email.",
@@ -584,37 +663,16 @@ class DashboardStatsAPIView(APIView):
         user,error_response = check_permission_and_get_access(request, "api_v1.view_user")
         if error_response:
             return error_response
-        # Basic Stats
-        total_users = User.objects.count()
-        active_users = User.objects.filter(is_active=True).count()
-        total_revenue = Payment.objects.filter(status="Success").aggregate(total=Sum("amount"))["total"] or 0
-
-        today = now().date()
-        first_of_this_month = today.replace(day=1)
-        last_month_day = first_of_this_month - timedelta(days=1)
-        first_of_last_month = last_month_day.replace(day=1)
+        # Totals come from the daily rollups (see utils/dashboard_stats.py)
+        stats = dashboard_stats()
+        total_users = stats["total_users"]
+        last_month_users = stats["last_month_users"]
 
         # Growth Rate
-        last_month_users = User.objects.filter(
-            created_at__gte=first_of_last_month,
-            created_at__lt=first_of_this_month
-        ).count()
-
         growth_rate = 0
         if last_month_users > 0:
             growth_rate = round(((total_users - last_month_users) / last_month_users) * 100, 2)
 
-        # New Users This Month
-        new_users_this_month = User.objects.filter(created_at__gte=first_of_this_month).count()
-
-        # Revenue Split by Membership Type & Status
-        revenue_breakdown = (
-            Payment.objects
-            .values("membership_type", "status")
-            .annotate(total_amount=Sum("amount"), count=Count("id"))
-            .order_by("membership_type", "status")
-        )
-
         # Recent Signups (latest 5 users)
         recent_users = list(
             User.objects.order_by("-created_at")
@@ -623,11 +681,11 @@ class DashboardStatsAPIView(APIView):
 
         return Response({
             "total_users": total_users,
-            "active_users": active_users,
-            "total_revenue": total_revenue,
+            "active_users": stats["active_users"],
+            "total_revenue": stats["total_revenue"],
             "growth_rate": growth_rate,
-            "new_users_this_month": new_users_this_month,
-            "revenue_breakdown": revenue_breakdown,
+            "new_users_this_month": stats["new_users_this_month"],
+            "revenue_breakdown": stats["revenue_breakdown"],
             "recent_signups": recent_users,
         })    
     
@@ -921,12 +979,11 @@ class RequestPasswordResetAPIView(APIView):
         reset_url = f"{settings.FRONTEND_URL}/reset-password/?uid={uid}&token={token}"
 
         # Send email with reset link
-        send_mail(
+        queue_email(
             subject="Password Reset Request",
             message=f"Click the link to reset your password: {reset_url}",
             from_email=settings.DEFAULT_FROM_EMAIL,
             recipient_list=[email],
-            fail_silently=True,
         )
 
         return Response({"message": "Password reset link sent to your email."}, status=status.HTTP_200_OK)
@@ -1044,42 +1101,35 @@ class AddMember(APIView):
             if is_bulk:
                 serializer = EmployeeSerializer(data=records, many=True)
                 if serializer.is_valid():
-                    last_numbers = {}
                     instances = []
+                    pending = {}
 
                     for raw_item in serializer.validated_data:
                         item = deepcopy(raw_item)
+                        instance = User(**item)
+                        instances.append(instance)
 
-                        if 'membership_id' in item and item['membership_id']:
+                        if item.get('membership_id'):
                             continue
 
                         role = item['role']
-                        role_name = role.name
                         prefix = self.get_role_prefix(role)
 
                         if not prefix:
-                            raise ValueError(f"No prefix configured for role: {role_name}")
-
-                        if prefix not in last_numbers:
-                            last_user = User.objects.filter(membership_id__startswith=f"{prefix}-") .order_by('-membership_id').first()
-                            if last_user:
-                                try:
-                                    number_part = last_user.membership_id.split('-')[1]
-                                    last_numbers[prefix] = int(number_part)
-                                except (IndexError, ValueError):
-                                    last_numbers[prefix] = 0
-                            else:
-                                last_numbers[prefix] = 0
-
-                        while True:
-                            last_numbers[prefix] += 1
-                            potential_id = f"{prefix}-{last_numbers[prefix]:06d}"
-                            if not User.objects.filter(membership_id=potential_id).exists():
-                                item['membership_id'] = potential_id
-                                break
-
-                        instances.append(User(**item))
-                    User.objects.bulk_create(instances)
+                            raise ValueError(f"No prefix configured for role: {role.name}")
+
+                        pending.setdefault(prefix, []).append(instance)
+
+                    # Imported ids move their counters first; then one counter update
+                    # per prefix. The transaction undoes both if the insert fails.
+                    with transaction.atomic():
+                        claim_membership_ids(instance.membership_id for instance in instances if instance.membership_id)
+                        for prefix, members in pending.items():
+                            for instance, membership_id in zip(members, allocate_membership_ids(prefix, len(members))):
+                                instance.membership_id = membership_id
+                        User.objects.bulk_create(instances)
+                        # bulk_create skips the signals that keep the dashboard rollups.
+                        add_stat_rows("User", instances)
                     return Response(EmployeeSerializer(instances, many=True).data, status=201)
 
                 return Response(serializer.errors, status=400)
@@ -1550,7 +1600,7 @@ class ProposerActionAPIView(APIView):
         # Notify applicant
         subject = "Membership Proposer Response"
         msg = f"Your proposer {proposer.name} has {proposer.status} your membership request."
-        send_mail(subject, msg, settings.DEFAULT_FROM_EMAIL, [proposer.user.email])
+        queue_email(subject, msg, settings.DEFAULT_FROM_EMAIL, [proposer.user.email])
 
         # return Response({"detail": f"Proposer {proposer.status} successfully."}, status=200)
         return Response({
@@ -1872,7 +1922,7 @@ class MembershipFeeDetailAPIView(GenericAPIView):
 
 #=========================payment================
 
-razorpay_client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
+razorpay_client = get_gateway_client()
 
 class CreateOrderAPIView(APIView):
     def post(self, request):
@@ -2047,49 +2097,16 @@ class VerifyPaymentAPIView(APIView):
                 "razorpay_payment_id": razorpay_payment_id,
                 "razorpay_signature": razorpay_signature,
             })
-
-            payment = Payment.objects.get(order_id=razorpay_order_id)
-            payment.status = "Success"
-            payment.payment_id = razorpay_payment_id
-            payment.save()
-
-            # Send success confirmation email
-            if payment.user and payment.user.email:
-                try:
-                    subject = "Payment Confirmation"
-                    message = (
-                        f"Dear {payment.user.name or 'Valued Member'},\n\n"
-                        f"Thank you for your payment. Your membership application has been successfully processed.\n\n"
-                        f"Payment Details:\n"
-                        f"- Amount: {payment.amount} {payment.currency}\n"
-                        f"- Membership Type: {payment.membership_type}\n"
-                        f"- Order ID: {payment.order_id}\n"
-                        f"- Payment ID: {payment.payment_id}\n\n"
-                        f"If you have any questions, please contact us at {settings.DEFAULT_FROM_EMAIL}.\n\n"
-                        f"Best regards,\nYour Organization Team"
-                    )
-                    send_mail(
-                        subject=subject,
-                        message=message,
-                        from_email=settings.DEFAULT_FROM_EMAIL,
-                        recipient_list=[payment.user.email],
-                        fail_silently=True,
-                    )
-                    logger.info(f"Sent success email to {payment.user.email} for order {razorpay_order_id}")
-                except Exception as e:
-                    logger.error(f"Failed to send success email to {payment.user.email}: {str(e)}")
-
-            return Response({"message": "Payment successful!", "status": status.HTTP_200_OK}, status=200)
-
         except razorpay.errors.SignatureVerificationError:
             try:
-                payment = Payment.objects.get(order_id=razorpay_order_id)
-                payment.status = "Failed"
-                payment.payment_id = razorpay_payment_id
-                payment.save()
+                # A captured payment is final: a forged or stale verify call must not undo it.
+                payment, changed = settle_payment(
+                    razorpay_order_id, "Failed", razorpay_payment_id,
+                    user=get_request_user(), ip_address=get_request_ip(),
+                )
 
                 # Send failure notification email
-                if payment.user and payment.user.email:
+                if changed and payment.user and payment.user.email:
                     try:
                         subject = "Payment Failure Notification"
                         message = (
@@ -2102,26 +2119,36 @@ class VerifyPaymentAPIView(APIView):
                             f"Please try again or contact us at {settings.DEFAULT_FROM_EMAIL} for assistance.\n\n"
                             f"Best regards,\nYour Organization Team"
                         )
-                        send_mail(
+                        queue_email(
                             subject=subject,
                             message=message,
                             from_email=settings.DEFAULT_FROM_EMAIL,
                             recipient_list=[payment.user.email],
-                            fail_silently=True,
                         )
-                        logger.info(f"Sent failure email to {payment.user.email} for order {razorpay_order_id}")
+                        logger.info(f"Queued failure email to {payment.user.email} for order {razorpay_order_id}")
                     except Exception as e:
-                        logger.error(f"Failed to send failure email to {payment.user.email}: {str(e)}")
+                        logger.error(f"Failed to queue failure email to {payment.user.email}: {str(e)}")
             except Payment.DoesNotExist:
-                pass  # Handled in the outer except block
+                logger.warning(f"Payment record not found for order {razorpay_order_id}")
 
             return Response({"message": "Payment verification failed!"}, status=400)
 
+        try:
+            # The confirmation email is queued with the transition, and only
+            # if the webhook has not already recorded the capture.
+            payment, changed = settle_payment(
+                razorpay_order_id, "Success", razorpay_payment_id,
+                user=get_request_user(), ip_address=get_request_ip(),
+            )
         except Payment.DoesNotExist:
             # Log for admin review, no user email
             logger.warning(f"Payment record not found for order {razorpay_order_id}")
             return Response({"message": "Payment record not found!"}, status=404)
 
+        if changed:
+            logger.info(f"Payment {payment.pk} for order {razorpay_order_id} verified")
+        return Response({"message": "Payment successful!", "status": status.HTTP_200_OK}, status=200)
+
 #=========================documents====================================
 class DocumentAPIView(APIView):
     permission_classes = [IsAuthenticated]
@@ -2307,12 +2334,12 @@ class ApplicationPreviewAPIView(APIView):
             }
         }, status=status.HTTP_200_OK)
     
-class PaymentStatusAPIView(APIView):
+class PaymentStatusAPIView(ClaimsAuthenticationMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         try:
-            payment = Payment.objects.filter(user=request.user).latest("created_at")
+            payment = Payment.objects.filter(user_id=request.user.id).latest("created_at")
             return Response({
                 "paymentCompleted": payment.status == "Success",
                 "status": payment.status
@@ -2321,21 +2348,74 @@ class PaymentStatusAPIView(APIView):
             return Response({"paymentCompleted": False, "status": "Pending"})
         
    
+def _audit_log_bound(value, name, end_of_day=False):
+    # Dates first: parse_datetime would read a bare date as its midnight.
+    try:
+        day = parse_date(value)
+        moment = None if day else parse_datetime(value)
+    except ValueError:
+        day = moment = None
+    if day is not None:
+        moment = datetime.combine(day, datetime.max.time() if end_of_day else datetime.min.time())
+    elif moment is None:
+        raise ValidationError({name: "Must be an ISO 8601 date or timestamp."})
+    return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+
+def route_audit_logs(params):
+    """
+    Pick the audit periods a log query has to touch: an explicit ``since``/
+    ``until`` range or ``period=YYYYMM``, ``period=all`` for everything still in
+    the table, and otherwise only the hot periods (AUDIT_HOT_MONTHS).
+    """
+    logs = AuditLog.objects.all()
+    since, until = params.get("since"), params.get("until")
+    if since or until:
+        return logs.between(
+            _audit_log_bound(since, "since") if since else None,
+            _audit_log_bound(until, "until", end_of_day=True) if until else None,
+        )
+
+    period = params.get("period")
+    if period == "all":
+        return logs
+    if period:
+        if not (period.isdigit() and len(period) == 6):
+            raise ValidationError({"period": "Must be YYYYMM or 'all'."})
+        return logs.filter(period=int(period))
+    return logs.hot()
+
+
 class AuditLogListAPIView(APIView):
     permission_classes = [IsAdminUser]
 
     def get(self, request):
-        logs = AuditLog.objects.all().order_by('-timestamp')
-
-        # ✅ Search filter
-        search = request.GET.get('search')
+        logs = route_audit_logs(request.GET).select_related('user').order_by('-timestamp')
+
+        # ✅ Structured filters (exact or prefix, all index-backed)
+        params = request.GET
+        if params.get('model_name'):
+            logs = logs.filter(model_name=params['model_name'])
+        if params.get('model_prefix'):
+            logs = logs.filter(model_name__startswith=params['model_prefix'])
+        if params.get('action'):
+            logs = logs.filter(action=params['action'])
+        if params.get('object_id'):
+            logs = logs.filter(object_id=params['object_id'])
+        if params.get('user'):
+            try:
+                logs = logs.filter(user_id=uuid.UUID(params['user']))
+            except ValueError:
+                raise ValidationError({"user": "Must be a user id."})
+        if params.get('user_email'):
+            logs = logs.filter(user__email=params['user_email'])
+        if params.get('ip_address'):
+            logs = logs.filter(ip_address=params['ip_address'])
+
+        # ✅ Search filter over the tokenized model, action, object id, IP, user and changes
+        search = params.get('search')
         if search:
-            logs = logs.filter(
-                Q(user__username__icontains=search) |
-                Q(model_name__icontains=search) |
-                Q(action__icontains=search) |
-                Q(ip_address__icontains=search)
-            )
+            logs = search_audit_logs(logs, search)
 
         # ✅ Ordering
         ordering = request.GET.get('ordering')
@@ -2344,7 +2424,10 @@ class AuditLogListAPIView(APIView):
 
         # ✅ Pagination
         page = request.GET.get('page', 1)
-        page_size = int(request.GET.get('page_size', 20))
+        try:
+            page_size = min(int(request.GET.get('page_size', 20)), 100)
+        except ValueError:
+            raise ValidationError({"page_size": "Must be an integer."})
         paginator = Paginator(logs, page_size)
         current_page = paginator.get_page(page)
 
@@ -2359,108 +2442,116 @@ class AuditLogListAPIView(APIView):
     
 
 class AdminLogListAPIView(APIView):
+    """
+    Cursor-paginated audit log. ``?export=ndjson`` streams every matching
+    entry as newline-delimited JSON instead, reading the table in chunks so
+    memory stays flat however many rows match.
+    """
     permission_classes=[IsAdminUser]
+    export_chunk_size = 2000
+    export_fields = ("id", "user_id", "action", "model_name", "object_id", "changes", "ip_address", "timestamp")
+
     def get(self, request):
-        logs = AuditLog.objects.select_related('user').order_by('-timestamp')
-        serializer = AuditLogSerializer(logs, many=True)
-        return Response(serializer.data)
-    
+        logs = route_audit_logs(request.GET)
 
+        if request.GET.get('export') == 'ndjson':
+            return self.export_ndjson(logs)
 
-class MemberReportView(APIView):
-    permission_classes = [IsAuthenticated,IsAdminUser]
-    
-    def get(self, request, *args, **kwargs):
-        export_format = request.query_params.get("type")
+        paginator = AuditLogCursorPagination()
+        page = paginator.paginate_queryset(logs.select_related('user'), request, view=self)
+        serializer = AuditLogSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
-        ext = {
-            "csv": "csv",
-            "excel": "xlsx",
-            "pdf": "pdf"
-        }[export_format]
+    def export_ndjson(self, logs):
+        rows = keyset_values(
+            logs, ('-timestamp', '-id'), self.export_chunk_size,
+            *self.export_fields, user_name=F('user__name'), user_email=F('user__email'),
+        )
 
-        file_path = os.path.join(settings.MEDIA_ROOT, "reports", f"members.{ext}")
-        print(file_path)
+        def lines():
+            for row in rows:
+                yield json.dumps(row, cls=DjangoJSONEncoder) + "\n"
 
-        if not os.path.exists(file_path):
-            return Response({"detail": f"No file found for format '{export_format}'."}, status=404)
+        response = StreamingHttpResponse(lines(), content_type="application/x-ndjson")
+        response["Content-Disposition"] = f'attachment; filename="audit-log-{timezone.now():%Y%m%d%H%M%S}.ndjson"'
+        return response
+    
 
-        content_type = {
-            "csv": "text/csv",
-            "excel": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            "pdf": "application/pdf"
-        }[export_format]
 
+class MemberReportView(APIView):
+    permission_classes = [IsAuthenticated,IsAdminUser]
+    
+    def get(self, request, *args, **kwargs):
+        """Download the file of a completed report job (``?job=<id>``)."""
+        try:
+            job = ReportJob.objects.filter(pk=uuid.UUID(request.query_params.get("job", "")), status="completed").first()
+        except ValueError:
+            job = None
+        file_path = report_file_path(job) if job else None
+        if not file_path:
+            return Response({"detail": "No completed report found for this job."}, status=404)
+
+        ext, content_type = EXPORT_FORMATS[job.format]
         return FileResponse(
             open(file_path, "rb"),
             content_type=content_type,
             as_attachment=True,
-            filename=f"members.{ext}"
+            filename=f"members_{timezone.localtime(job.completed_at):%Y%m%d_%H%M%S}.{ext}"
         )
     
     def post(self, request, *args, **kwargs):
         export_format = request.data.get("format")
-        requested_fields = request.data.get("fields", [])
-        
-        all_fields = [
-            f.name for f in User._meta.get_fields()
-            if not f.is_relation and f.name not in ["password", "last_login", "is_superuser"]
-        ]
+        try:
+            fields, filters = clean_member_report(request.data.get("fields", []), request.query_params)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=400)
+        queryset = member_report_queryset(filters)
+
+        if export_format not in EXPORT_FORMATS:
+            return Response({"detail": "Invalid format. Use 'csv', 'excel' or 'pdf'."}, status=400)
 
-        if requested_fields:
-            if not isinstance(requested_fields, list):
-                return Response({"detail": "Fields must be a list."}, status=400)
-            for field in requested_fields:
-                if field not in all_fields:
-                    return Response({"detail": f"Invalid field '{field}'."}, status=400)
-            fields = requested_fields
+        ext, content_type = EXPORT_FORMATS[export_format]
+        rows = export_rows(queryset, fields)
+
+        if export_format == "csv":
+            response = StreamingHttpResponse(stream_csv(rows, fields), content_type=content_type)
         else:
-            fields = all_fields
+            response = FileResponse(export_to_tempfile(rows, fields, export_format), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename={get_filename(ext)}'
+        return response
 
-        name_filter = request.query_params.get("name")
-        queryset = User.objects.all()
-        if name_filter:
-            queryset = queryset.filter(name__icontains=name_filter)
-            
-        start_date = request.query_params.get("start_date")
-        end_date = request.query_params.get("end_date")
 
+class ReportJobAPIView(APIView):
+    """
+    Queue a member report for the worker instead of building it in the
+    request. Takes the same ``format``/``fields`` body and query filters as
+    ``MemberReportView.post``; an identical report over unchanged data is
+    answered with the existing job and its file.
+    """
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def post(self, request):
+        export_format = request.data.get("format")
+        if export_format not in EXPORT_FORMATS:
+            return Response({"detail": "Invalid format. Use 'csv', 'excel' or 'pdf'."}, status=400)
         try:
-            if start_date:
-                start_date_obj = parse_date(start_date)
-                if start_date_obj:
-                    queryset = queryset.filter(created_at__gte=start_date_obj)
-
-            if end_date:
-                end_date_obj = parse_date(end_date)
-                if end_date_obj:
-                    queryset = queryset.filter(created_at__lte=end_date_obj)
-        except Exception as e:
-            return Response({"detail": f"Invalid date format. Use YYYY-MM-DD. Error: {str(e)}"}, status=400)
+            fields, filters = clean_member_report(request.data.get("fields", []), request.query_params)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=400)
 
+        job, created = request_member_report(request.user, export_format, fields, filters)
+        serializer = ReportJobSerializer(job, context={"request": request})
+        return Response(serializer.data, status=202 if job.status != "completed" else 200)
 
-        if export_format not in ["csv", "excel", "pdf"]:
-            return Response({"detail": "Invalid format. Use 'csv', 'excel' or 'pdf'."}, status=400)
-            
-        if export_format == "csv":
-            buffer = generate_csv_response(queryset, fields)
-            response = HttpResponse(buffer, content_type="text/csv")
-            response['Content-Disposition'] = 'attachment; filename=members.csv'
-            return response
-
-        elif export_format == "excel":
-            buffer = generate_excel_response(queryset, fields)
-            response = HttpResponse(buffer, content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-            response['Content-Disposition'] = 'attachment; filename=members.xlsx'
-            return response
-        
-        elif export_format == "pdf":
-            buffer = generate_pdf_response(queryset, fields)
-            response = HttpResponse(buffer, content_type="application/pdf")
-            response['Content-Disposition'] = f'attachment; filename=members.pdf'
-            return response
 
-        return Response({"detail": "Invalid format. Use 'csv' or 'excel'."}, status=400)
+class ReportJobStatusAPIView(APIView):
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def get(self, request, pk):
+        job = ReportJob.objects.filter(pk=pk).first()
+        if not job:
+            return Response({"detail": "Report job not found."}, status=404)
+        return Response(ReportJobSerializer(job, context={"request": request}).data)
 
 
 #-------------------Multi-Leval configuration API----------------------------------
@@ -2626,6 +2717,7 @@ def build_role_chain_from_bottom(roles):
 class ApproveMembershipAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @notification_batch()
     def post(self, request):
         applicant_id = request.data.get("applicant_id")
         config_type = request.data.get("type", "membership")
@@ -2674,6 +2766,15 @@ class ApproveMembershipAPIView(APIView):
         threshold = config.approval_prsnt
         finalize = False
 
+        vote_event = {
+            "applicant_id": applicant_key,
+            "voter_id": user_key,
+            "voter": request.user.name,
+            "approved": bool(approved),
+            "approval_percent": round(approval_percent, 2),
+        }
+        transaction.on_commit(lambda: publish_to_users([u.id for u in approvers], "approval_vote", vote_event))
+
         # Step 3: Hierarchy approval logic
         if config.heirarchy:
             role_to_users = {}
@@ -2742,22 +2843,8 @@ class ApproveMembershipAPIView(APIView):
                 if applicant.membership_id:
                     membership_id = applicant.membership_id
                 else:
-                    prefix = "".join(word[0].upper() for word in re.findall(r'\b\w+', membership_type)) + "-"
-                    latest_user = (
-                        User.objects
-                        .filter(membership_id__startswith=prefix)
-                        .exclude(membership_id__isnull=True)
-                        .order_by("-membership_id")
-                        .first()
-                    )
-                    last_number = 0
-                    if latest_user and latest_user.membership_id:
-                        try:
-                            last_number = int(latest_user.membership_id.split("-")[1])
-                        except (IndexError, ValueError):
-                            last_number = 0
-                    new_number = last_number + 1
-                    membership_id = f"{prefix}{new_number:06d}"
+                    prefix = "".join(word[0].upper() for word in re.findall(r'\b\w+', membership_type))
+                    membership_id = allocate_membership_id(prefix)
                     applicant.membership_id = membership_id
 
                 try:
@@ -2852,162 +2939,29 @@ class ApplicationListAPIView(APIView):
         
         
         
-        applicants = User.objects.filter(is_active=True, membership_id__isnull=True).order_by('-created_at')
+        # Full dossier of a single applicant, fetched on demand from the list view.
+        user_id = request.query_params.get("user_id")
+        if user_id:
+            applicants = filter_applicants(applicant_queryset(), request.query_params)
+            applicant = get_object_or_404(with_dossier_relations(applicants), id=parse_user_id(user_id))
+            return Response(build_applicant_dossier(applicant))
 
-        result = []
+        applicants = filter_applicants(applicant_queryset(), request.query_params).order_by('-created_at', '-id')
 
-        for applicant in applicants:
-            approval = ApproveMembership.objects.filter(applicant=applicant).first()
-            doc = Document.objects.filter(user=applicant).first()
-            qualifications = Qualification.objects.filter(user=applicant)
-            experiences = Experience.objects.filter(user=applicant)
-            proposers = Proposer.objects.filter(user=applicant)
+        if request.query_params.get("mode") == "summary":
+            applicants = with_summary_relations(applicants)
+            build = build_applicant_summary
+        else:
+            applicants = with_dossier_relations(applicants)
+            build = build_applicant_dossier
 
-            payment_details = applicant.payment_details or {}
-            transaction_id = payment_details.get("txn_id")
-            payment_status = payment_details.get("status", "Pending")
+        # Keyset pagination when the client asks for it; the bare call keeps returning the full list.
+        if "cursor" in request.query_params or "page_size" in request.query_params:
+            paginator = ApplicationCursorPagination()
+            page = paginator.paginate_queryset(applicants, request, view=self)
+            return paginator.get_paginated_response([build(applicant) for applicant in page])
 
-            try:
-                verification = ApplicationVerificationStatus.objects.get(user=applicant)
-            except ApplicationVerificationStatus.DoesNotExist:
-                verification = None
-
-            result.append({
-                "id": applicant.application_id,
-                "user_id": str(applicant.id),
-                "name": applicant.name,
-                "email": applicant.email,
-                "phone": applicant.mobile_number,
-                "address": f"{applicant.address1 or ''}, {applicant.address2 or ''}, {applicant.address3 or ''}".strip(', '),
-                "gender": applicant.gender,
-                "date_of_birth": str(applicant.date_of_birth) if applicant.date_of_birth else None,
-                "city": applicant.city,
-                "state": applicant.state,
-                "country": applicant.country,
-                "pincode": applicant.pincode,
-                "from_india": applicant.from_india,
-                "spouse_name": applicant.spouse_name,
-                "father_name": applicant.father_name,
-                "mother_name": applicant.mother_name,
-
-                "academic": [
-                    {
-                        "degree": q.qualification_type.name if q.qualification_type else "",
-                        "branch": q.qualification_branch.name if q.qualification_branch else "",
-                        "institute": q.institute_name,
-                        "board": q.board_university,
-                        "year": q.year_of_passing,
-                        "percentage_cgpa": q.percentage_cgpa,
-                        "document": q.document.url if q.document else ""
-                    } for q in qualifications
-                ],
-                "experience": [
-                    {
-                        "organization_name": e.organization_name,
-                        "job_title": e.job_title,
-                        "employee_type": e.employee_type,
-                        "work_type": e.work_type,
-                        "start_date": str(e.start_date),
-                        "end_date": str(e.end_date) if e.end_date else None,
-                        "currently_working": e.currently_working,
-                        "total_experience": e.total_experience,
-                    } for e in experiences
-                ],
-                "proposers": [
-                    {
-                        "name": p.name,
-                        "email": p.email,
-                        "mobile_no": p.mobile_no,
-                        "membership_no": p.membership_no,
-                    } for p in proposers
-                ],
-                "membership": {
-                    "plan": applicant.membership_fee.membership_type if applicant.membership_fee else "N/A",
-                    "startDate": str(applicant.created_at.date())
-                },
-                "documents": [
-                    {
-                        "name": "Aadhar Front",
-                        "url": doc.aadhar_front.url if doc and doc.aadhar_front else "",
-                        "uploadedAt": str(doc.updated_at.date()) if doc and doc.aadhar_front else None
-                    },
-                    {
-                        "name": "Aadhar Back",
-                        "url": doc.aadhar_back.url if doc and doc.aadhar_back else "",
-                        "uploadedAt": str(doc.updated_at.date()) if doc and doc.aadhar_back else None
-                    },
-                    {
-                        "name": "Passport",
-                        "url": doc.passport.url if doc and doc.passport else "",
-                        "uploadedAt": str(doc.updated_at.date()) if doc and doc.passport else None
-                    },
-                    {
-                        "name": "Profile Photo",
-                        "url": doc.profile_photo.url if doc and doc.profile_photo else "",
-                        "uploadedAt": str(doc.updated_at.date()) if doc and doc.profile_photo else None
-                    },
-                    {
-                        "name": "Signature",
-                        "url": doc.signature.url if doc and doc.signature else "",
-                        "uploadedAt": str(doc.updated_at.date()) if doc and doc.signature else None
-                    },
-                ],
-                "eligibility": {
-                    "status": (
-                        "Approved" if approval and approval.approved else
-                        "Rejected" if approval and approval.rejected else
-                        "Pending"
-                    ),
-                    "notes": applicant.eligibility or ""
-                },
-                "payment": {
-                    "status": payment_status,
-                    "transaction_id": transaction_id,
-                    "amount": payment_details.get("amount"),
-                    "method": payment_details.get("method"),
-                    "timestamp": str(applicant.updated_at),
-                },
-                "applicationSteps": {
-                    "personalDetails": {
-                        "completed": verification.personal_details if verification else False,
-                        "timestamp": str(applicant.created_at)
-                    },
-                    "qualification": {
-                        "completed": verification.qualification if verification else False,
-                        "timestamp": str(qualifications.latest("created_at").created_at) if qualifications.exists() else None
-                    },
-                    "experience": {
-                        "completed": verification.experience if verification else False,
-                        "timestamp": str(experiences.latest("created_at").created_at) if experiences.exists() else None
-                    },
-                    "proposer": {
-                        "completed": verification.proposer if verification else False,
-                        "timestamp": None
-                    },
-                    "membershipSelection": {
-                        "completed": verification.membership if verification else False,
-                        "timestamp": str(applicant.updated_at)
-                    },
-                    "documents": {
-                        "completed": verification.documents if verification else False,
-                        "timestamp": str(doc.updated_at) if doc else None
-                    },
-                    "eligibilityCheck": {
-                        "completed": verification.eligibility if verification else False,
-                        "timestamp": str(approval.updated_at) if approval else None
-                    },
-                    "payment": {
-                        "completed": verification.payment if verification else False,
-                        "timestamp": str(applicant.updated_at),
-                        "status": payment_status,
-                        "transactionId": transaction_id
-                    },
-                    "formPreview": {
-                        "completed": False,
-                        "timestamp": None
-                    }
-                }
-            })
+        result = [build(applicant) for applicant in applicants]
 
         return Response(result)
 
@@ -3122,9 +3076,9 @@ class CertificateView(APIView):
                 reverse("view-certificate", kwargs={"user_id": user.id})
             )
 
-            email = EmailMessage(
+            queue_email(
                 subject="Your Membership Certificate",
-                body=(
+                message=(
                     f"Dear {user.name},\n\n"
                     f"Your membership certificate is ready!\n\n"
                     f"View and print it here:\n{certificate_url}\n\n"
@@ -3132,9 +3086,8 @@ class CertificateView(APIView):
                     "Thank you."
                 ),
                 from_email="noreply@yourdomain.com",
-                to=[user.email],
+                recipient_list=[user.email],
             )
-            email.send()
 
             return Response({
                 "user_id": user.id,
@@ -3295,13 +3248,35 @@ def send_payment_receipt_email(user, payment, request):
         <p>Regards,<br><strong>IETE Finance Team</strong></p>
     """
 
-    email = EmailMessage(
+    queue_email(
         subject=subject,
-        body=strip_tags(html_content), 
-        to=[payment.user.email],
+        message=strip_tags(html_content),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        recipient_list=[payment.user.email],
+        html_message=html_content,
     )
-    email.content_subtype = "html"
-    email.send()
+
+
+class RazorpayWebhookAPIView(APIView):
+    """
+    Razorpay webhook receiver. Verifies the signature, stores each event once
+    (by event id) and leaves applying it to the batch task, so the gateway
+    gets its 200 without waiting on payment updates or email.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        body = request.body
+        if not verify_webhook_signature(body, request.headers.get("X-Razorpay-Signature")):
+            return Response({"detail": "Invalid signature."}, status=400)
+        try:
+            fields = parse_webhook(body, request.headers.get("X-Razorpay-Event-Id"))
+        except ValueError:
+            return Response({"detail": "Invalid payload."}, status=400)
+
+        event, created = record_webhook_event(fields)
+        return Response({"status": "queued" if created else "duplicate"})
 
 
 class PendingPaymentsAPIView(APIView):
@@ -3349,6 +3324,7 @@ class PendingPaymentsAPIView(APIView):
 class PaymentReceiptsAPIView(APIView):
     permission_classes = [IsAuthenticated, IsAdminUser]
 
+    @notification_batch()
     def post(self, request):
         payment_ids = request.data.get("payment_ids",[])
         send_email = request.data.get("send_email", False)
@@ -3402,11 +3378,13 @@ class PaymentReceiptsAPIView(APIView):
 
             if send_email:
                 try:
-                    subject = "Your Payment Receipt"
-                    email = EmailMessage(subject, "", to=[payment.user.email])
-                    email.content_subtype = "html"
-                    email.body = receipt_html
-                    email.send()
+                    queue_email(
+                        subject="Your Payment Receipt",
+                        message="",
+                        from_email=settings.DEFAULT_FROM_EMAIL,
+                        recipient_list=[payment.user.email],
+                        html_message=receipt_html,
+                    )
                 except Exception as e:
                     failures.append({"payment_id": pid, "reason": "Email failed", "error": str(e)})
                     continue
@@ -3443,10 +3421,8 @@ class SendOTPAPIView(APIView):
         #     }, status=429)
 
         otp = generate_otp()
-        response = send_verification_otp(phone, otp)
-
-        if response.get("status") == "error":
-            return Response({"error": response.get("message")}, status=500)
+        # Delivered by the outbound workers, which retry gateway failures.
+        queue_sms(phone, verification_otp_message(otp), settings.SMS_API_CONFIG["TEMPLATE_ID"])
 
         set_otp_in_cache(phone, otp)
         return Response({"message": "OTP sent successfully","ip address": ip}, status=200)
@@ -3470,7 +3446,7 @@ class VerifyOTPAPIView(APIView):
         return Response({"message": "OTP verified successfully"})
 
 
-class ApplicationTrackerAPIView(APIView):
+class ApplicationTrackerAPIView(ClaimsAuthenticationMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
@@ -3478,16 +3454,16 @@ class ApplicationTrackerAPIView(APIView):
 
         try:
             # Fetch related data for the user
-            doc = Document.objects.filter(user=user).first()
-            approval = ApproveMembership.objects.filter(applicant=user).first()
-            qualifications = Qualification.objects.filter(user=user)
-            experiences = Experience.objects.filter(user=user)
-            proposers = Proposer.objects.filter(user=user)
-            payment = Payment.objects.filter(user=user).order_by('-created_at').first()
+            doc = Document.objects.filter(user_id=user.id).first()
+            approval = ApproveMembership.objects.filter(applicant_id=user.id).first()
+            qualifications = Qualification.objects.filter(user_id=user.id)
+            experiences = Experience.objects.filter(user_id=user.id)
+            proposers = Proposer.objects.filter(user_id=user.id)
+            payment = Payment.objects.filter(user_id=user.id).order_by('-created_at').first()
 
             # Determine verification status
             try:
-                verification = ApplicationVerificationStatus.objects.get(user=user)
+                verification = ApplicationVerificationStatus.objects.get(user_id=user.id)
             except ApplicationVerificationStatus.DoesNotExist:
                 verification = None
 
@@ -3566,3 +3542,152 @@ class ApplicationTrackerAPIView(APIView):
 
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)        
+
+
+class NotificationInboxAPIView(ClaimsAuthenticationMixin, APIView):
+    """
+    Inbox of the requesting user, newest first with cursor pagination.
+
+    ``?since_id=<id>`` switches to delta mode: rows with a higher id are
+    returned, oldest first, with the ``since_id`` to send on the next poll.
+    That cursor stops short of rows younger than ``delta_safety_lag``, since
+    a transaction that took a lower id may still commit; clients will see
+    those recent rows again and should de-duplicate by id.
+    """
+    permission_classes = [IsAuthenticated]
+    delta_limit = 200
+    delta_safety_lag = timedelta(seconds=30)
+
+    def get(self, request):
+        notifications = Notification.objects.filter(recipient_id=request.user.id)
+        if request.query_params.get("unread") in ("1", "true"):
+            notifications = notifications.filter(is_read=False)
+
+        since_id = request.query_params.get("since_id")
+        if since_id is not None:
+            return self.delta(request, notifications, since_id)
+
+        paginator = NotificationCursorPagination()
+        page = paginator.paginate_queryset(notifications, request, view=self)
+        response = paginator.get_paginated_response(NotificationSerializer(page, many=True).data)
+        response.data["unread_count"] = get_unread_count(request.user.id)
+        return response
+
+    def delta(self, request, notifications, since_id):
+        try:
+            since_id = int(since_id)
+        except ValueError:
+            raise ValidationError({"since_id": "Must be an integer id."})
+
+        rows = list(notifications.filter(id__gt=since_id).order_by("id")[:self.delta_limit])
+        settled_before = timezone.now() - self.delta_safety_lag
+        cursor = since_id
+        for row in rows:
+            if row.timestamp > settled_before:
+                break
+            cursor = row.id
+        return Response({
+            "results": NotificationSerializer(rows, many=True).data,
+            "since_id": cursor,
+            "has_more": len(rows) == self.delta_limit and cursor != since_id,
+            "unread_count": get_unread_count(request.user.id),
+        })
+
+
+class NotificationUnreadCountAPIView(ClaimsAuthenticationMixin, APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response({"unread_count": get_unread_count(request.user.id)})
+
+
+class NotificationMarkReadAPIView(ClaimsAuthenticationMixin, APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        notifications = Notification.objects.filter(recipient_id=request.user.id, is_read=False)
+        if request.data.get("all") is not True:
+            ids = request.data.get("ids")
+            if not isinstance(ids, list) or not ids or not all(str(i).isdigit() for i in ids):
+                return Response({"detail": "Provide a list of notification 'ids' or 'all': true."}, status=400)
+            notifications = notifications.filter(id__in=ids)
+
+        updated = notifications.update(is_read=True, updated_at=timezone.now())
+        if updated:
+            invalidate_unread_count(request.user.id)
+        return Response({
+            "updated": updated,
+            "unread_count": get_unread_count(request.user.id),
+        })
+
+
+class NotificationBroadcastAPIView(APIView):
+    """Send an in-app notification to every user of a role."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        user, error_response = check_permission_and_get_access(request, "api_v1.add_notification")
+        if error_response:
+            return error_response
+
+        role_name = request.data.get("role")
+        message = (request.data.get("message") or "").strip()
+        if not role_name or not message:
+            return Response({"detail": "'role' and 'message' are required."}, status=400)
+
+        role = Role.objects.filter(name=role_name).first()
+        if role is None:
+            return Response({"detail": f"Role '{role_name}' not found."}, status=404)
+
+        recipients = notify_users_for_role(role, message, sender=user)
+        return Response({"role": role.name, "recipients": recipients}, status=201)
+
+
+SSE_HEARTBEAT_SECONDS = 15
+
+
+def _sse_event(event_type, data):
+    return f"event: {event_type}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+
+class NotificationStreamTicketAPIView(ClaimsAuthenticationMixin, APIView):
+    """Issue the short-lived ticket an EventSource passes as ``?ticket=`` to open the stream."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        return Response({"ticket": issue_stream_ticket(request.user), "expires_in": STREAM_TICKET_TIMEOUT})
+
+
+async def notification_stream(request):
+    """
+    Server-sent events stream of the requesting user's new notifications and
+    approval-vote events. Only served under ASGI, where each open stream
+    holds a coroutine; a WSGI worker would be tied up for as long as the
+    client stays connected, so there the stream is refused and clients keep
+    polling the inbox.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {"detail": "Live notifications are only available from the ASGI server."}, status=503,
+        )
+    user = await sync_to_async(authenticate_stream_request)(request)
+    if user is None:
+        return JsonResponse({"detail": "Authentication credentials were not provided or are invalid."}, status=401)
+
+    unread_count = await sync_to_async(get_unread_count)(user.id)
+
+    async def events():
+        async with get_broker().subscribe(user_channel(user.id)) as queue:
+            yield _sse_event("ready", {"unread_count": unread_count})
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _sse_event(event["type"], event["data"])
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response